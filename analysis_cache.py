@@ -0,0 +1,199 @@
+# analysis_cache.py - スクリーンショット解析結果のディスクキャッシュ（同じ画像の再アップロード対策）
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+# キャッシュの保存先ディレクトリ
+ANALYSIS_CACHE_DIR = os.environ.get('MAHJONG_ANALYSIS_CACHE_DIR', '.analysis_cache')
+
+# キャッシュ全体の容量上限（MB）
+ANALYSIS_CACHE_MAX_BYTES = int(os.environ.get('MAHJONG_ANALYSIS_CACHE_MB', '50')) * 1024 * 1024
+
+# 有効期限（時間）
+ANALYSIS_CACHE_TTL_SECONDS = float(os.environ.get('MAHJONG_ANALYSIS_CACHE_TTL_HOURS', '168')) * 3600
+
+# 知覚ハッシュ（dHash）で再圧縮・リサイズされた同じ画像も照合するか（結果画面はレイアウトが共通で別の対局でも
+# ハッシュがほぼ一致するため既定では無効。有効にしてもOCRのテキストが一致した場合のみ再利用する）
+ANALYSIS_CACHE_PERCEPTUAL = os.environ.get('MAHJONG_ANALYSIS_CACHE_PERCEPTUAL', '0').lower() in ('1', 'true', 'yes')
+
+# 同一画像とみなすdHashのハミング距離
+PERCEPTUAL_MAX_DISTANCE = 4
+
+# 解析プロンプトや結果形式を変えた場合に上げる（古いエントリは無視される）
+ANALYSIS_CACHE_VERSION = 2
+
+_lock = threading.Lock()
+
+def content_hash(payload) -> str:
+    """画像内容のSHA-256（元のアップロードがあればそのバイト列、なければ画素データ）"""
+    hasher = hashlib.sha256()
+    if payload.original_bytes:
+        hasher.update(payload.original_bytes)
+    else:
+        image = payload.image
+        hasher.update(f"{image.mode}:{image.size}".encode('utf-8'))
+        hasher.update(image.tobytes())
+    return hasher.hexdigest()
+
+def perceptual_hash(payload) -> str:
+    """画像のdHash（64bit、16進数）"""
+    from PIL import Image
+    
+    try:
+        resample = Image.Resampling.LANCZOS
+    except AttributeError:
+        # 古いPillowバージョン対応
+        resample = Image.LANCZOS
+    
+    small = payload.image.convert('L').resize((9, 8), resample)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+def _entry_path(sha256: str, cache_dir: str = ANALYSIS_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, f"{sha256}.json")
+
+def _is_entry_name(name: str) -> bool:
+    return name.endswith('.json') and not name.startswith('.')
+
+def _read_entry(path: str) -> Optional[Dict]:
+    """有効なエントリを読み込み（期限切れ・形式違いは削除してNone）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except Exception:
+        return None
+    
+    if (entry.get('version') != ANALYSIS_CACHE_VERSION or
+            time.time() - entry.get('created_at', 0) > ANALYSIS_CACHE_TTL_SECONDS):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return entry
+
+def _touch(path: str):
+    """最終利用時刻を更新（LRU判定に使用、実際に返したエントリのみ）"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def lookup(payload, cache_dir: str = ANALYSIS_CACHE_DIR) -> Optional[Dict]:
+    """元のバイト列が同一の画像のキャッシュ済み解析結果を取得"""
+    path = _entry_path(content_hash(payload), cache_dir)
+    entry = _read_entry(path)
+    if entry is None:
+        return None
+    _touch(path)
+    return dict(entry['result'], cached=True, cache_match='exact')
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r'\s+', '', text or '')
+
+def lookup_similar(payload, extracted_text: str, cache_dir: str = ANALYSIS_CACHE_DIR) -> Optional[Dict]:
+    """知覚ハッシュが近く、OCRのテキストも一致する画像の解析結果を取得（オプトイン）"""
+    if not ANALYSIS_CACHE_PERCEPTUAL or not _normalize_text(extracted_text) or not os.path.isdir(cache_dir):
+        return None
+    
+    dhash = int(perceptual_hash(payload), 16)
+    text = _normalize_text(extracted_text)
+    try:
+        names = [name for name in os.listdir(cache_dir) if _is_entry_name(name)]
+    except OSError:
+        return None
+    
+    best = None
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        entry = _read_entry(path)
+        if entry is None or not entry.get('dhash'):
+            continue
+        distance = bin(dhash ^ int(entry['dhash'], 16)).count('1')
+        if distance > PERCEPTUAL_MAX_DISTANCE or (best is not None and distance >= best[0]):
+            continue
+        # レイアウトが同じ別の対局を取り違えないよう、読み取った文字列が同じ場合のみ採用
+        if _normalize_text(entry['result'].get('extracted_text', '')) != text:
+            continue
+        best = (distance, entry, path)
+    
+    if best is None:
+        return None
+    _touch(best[2])
+    return dict(best[1]['result'], cached=True, cache_match='perceptual')
+
+def store(payload, result: Dict, cache_dir: str = ANALYSIS_CACHE_DIR) -> bool:
+    """解析結果を保存（成功した結果のみ）"""
+    if not result.get('success'):
+        return False
+    
+    sha256 = content_hash(payload)
+    try:
+        dhash = perceptual_hash(payload) if ANALYSIS_CACHE_PERCEPTUAL else ''
+    except Exception:
+        dhash = ''
+    
+    entry = {
+        'version': ANALYSIS_CACHE_VERSION,
+        'created_at': time.time(),
+        'dhash': dhash,
+        # 計測値はその回限りのものなので保存しない
+        'result': {key: value for key, value in result.items() if key not in ('encoding_stats', 'cached', 'cache_match')}
+    }
+    
+    # 途中で落ちても壊れないよう一時ファイル経由で置き換え
+    try:
+        with _lock:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix='.entry_', suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, _entry_path(sha256, cache_dir))
+            _evict_locked(cache_dir)
+        return True
+    except Exception:
+        return False
+
+def _evict_locked(cache_dir: str):
+    """期限切れのエントリと、容量上限を超えた分を最終利用の古い順に削除（ロック取得済みで呼ぶ）"""
+    now = time.time()
+    files = []
+    with os.scandir(cache_dir) as scanner:
+        for item in scanner:
+            if not _is_entry_name(item.name):
+                continue
+            stat = item.stat()
+            files.append((stat.st_mtime, stat.st_size, item.path))
+    
+    files.sort()
+    total_bytes = sum(size for _, size, _ in files)
+    for mtime, size, path in files:
+        expired = now - mtime > ANALYSIS_CACHE_TTL_SECONDS
+        if not expired and total_bytes <= ANALYSIS_CACHE_MAX_BYTES:
+            continue
+        try:
+            os.remove(path)
+            total_bytes -= size
+        except OSError:
+            pass
+
+def clear(cache_dir: str = ANALYSIS_CACHE_DIR):
+    """キャッシュを全て削除"""
+    if not os.path.isdir(cache_dir):
+        return
+    with _lock:
+        for name in os.listdir(cache_dir):
+            if _is_entry_name(name):
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
@@ -0,0 +1,93 @@
+# analysis_schema.py - ChatGPTの解析結果のJSONスキーマと型付きの検証
+import json
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List
+
+# 1回の対局の最大人数
+MAX_PLAYERS = 4
+
+# 点数として受け付ける範囲
+SCORE_LIMIT = 200000
+
+# Structured Outputs用のスキーマ（strictモードでは全項目必須・追加項目なし）
+ANALYSIS_JSON_SCHEMA = {
+    'name': 'mahjong_result',
+    'strict': True,
+    'schema': {
+        'type': 'object',
+        'properties': {
+            'players': {
+                'type': 'array',
+                'description': '順位順のプレイヤー（4名未満の場合は空のnicknameで埋める）',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'nickname': {'type': 'string'},
+                        'score': {'type': 'integer'}
+                    },
+                    'required': ['nickname', 'score'],
+                    'additionalProperties': False
+                }
+            },
+            'confidence': {'type': 'number', 'description': '0から1の信頼度'},
+            'notes': {'type': 'string'}
+        },
+        'required': ['players', 'confidence', 'notes'],
+        'additionalProperties': False
+    }
+}
+
+class SchemaValidationError(ValueError):
+    """応答がスキーマを満たさない"""
+
+@dataclass
+class PlayerScore:
+    nickname: str
+    score: int
+
+@dataclass
+class ScoreAnalysis:
+    players: List[PlayerScore] = field(default_factory=list)
+    confidence: float = 0.0
+    notes: str = ''
+    
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+def _require(condition: bool, message: str):
+    if not condition:
+        raise SchemaValidationError(message)
+
+def parse_analysis(content: str) -> ScoreAnalysis:
+    """応答のJSONを検証して型付きの結果に変換"""
+    try:
+        data = json.loads(content)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise SchemaValidationError(f"JSONとして解析できません: {e}")
+    
+    _require(isinstance(data, dict), "トップレベルがオブジェクトではありません")
+    missing = {'players', 'confidence', 'notes'} - set(data)
+    _require(not missing, f"必須項目がありません: {', '.join(sorted(missing))}")
+    
+    raw_players = data['players']
+    _require(isinstance(raw_players, list), "playersが配列ではありません")
+    _require(1 <= len(raw_players) <= MAX_PLAYERS, f"playersの人数が不正です: {len(raw_players)}")
+    
+    players = []
+    for index, raw_player in enumerate(raw_players, start=1):
+        _require(isinstance(raw_player, dict), f"players[{index}]がオブジェクトではありません")
+        nickname = raw_player.get('nickname')
+        score = raw_player.get('score')
+        _require(isinstance(nickname, str), f"players[{index}].nicknameが文字列ではありません")
+        _require(isinstance(score, int) and not isinstance(score, bool), f"players[{index}].scoreが整数ではありません")
+        _require(abs(score) <= SCORE_LIMIT, f"players[{index}].scoreが範囲外です: {score}")
+        players.append(PlayerScore(nickname=nickname.strip(), score=score))
+    
+    _require(any(player.nickname for player in players), "プレイヤー名が1つも読み取れていません")
+    
+    confidence = data['confidence']
+    _require(isinstance(confidence, (int, float)) and not isinstance(confidence, bool) and 0 <= confidence <= 1,
+             f"confidenceが0〜1の数値ではありません: {confidence}")
+    _require(isinstance(data['notes'], str), "notesが文字列ではありません")
+    
+    return ScoreAnalysis(players=players, confidence=float(confidence), notes=data['notes'])
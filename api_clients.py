@@ -0,0 +1,109 @@
+# api_clients.py - 外部APIクライアントをプロセス全体で共有（TLS接続・認証の再利用）
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Union
+from urllib.parse import urlsplit
+
+# 共有HTTPセッションの接続プールの大きさ（一括解析の同時実行数以上にする）
+HTTP_POOL_SIZE = int(os.environ.get('MAHJONG_HTTP_POOL_SIZE', '16'))
+
+_lock = threading.Lock()
+_http_session = None
+_vision_clients: Dict[str, object] = {}
+_vision_credentials: Dict[str, object] = {}
+_openai_clients: Dict[str, object] = {}
+_warmed_up = set()
+
+_warmup_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='api-warmup')
+
+def _secret_key(secret: str) -> str:
+    """キャッシュのキーにする際は秘密情報そのものを保持しない"""
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+def _service_account_key(credentials_info: Dict) -> str:
+    return f"{credentials_info.get('client_email', '')}:{credentials_info.get('private_key_id', '')}"
+
+def get_http_session():
+    """keep-alive接続をプールする共有セッション"""
+    global _http_session
+    with _lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+        return _http_session
+
+def get_vision_client(credentials_info: Dict):
+    """サービスアカウントごとのVision APIクライアント（gRPCチャネルをスレッド間で共有）"""
+    cache_key = _service_account_key(credentials_info)
+    with _lock:
+        client = _vision_clients.get(cache_key)
+        if client is None:
+            from google.cloud import vision
+            from google.oauth2 import service_account
+            
+            credentials = service_account.Credentials.from_service_account_info(credentials_info)
+            client = vision.ImageAnnotatorClient(credentials=credentials)
+            _vision_clients[cache_key] = client
+            _vision_credentials[cache_key] = credentials
+        return client
+
+def get_openai_client(api_key: str):
+    """APIキーごとのOpenAIクライアント（内部のHTTP接続プールを再利用）"""
+    cache_key = _secret_key(api_key)
+    with _lock:
+        client = _openai_clients.get(cache_key)
+        if client is None:
+            import openai
+            
+            client = openai.OpenAI(api_key=api_key)
+            _openai_clients[cache_key] = client
+        return client
+
+def warm_up(vision_credentials: Union[Dict, str], openai_api_key: str):
+    """初回の解析より前に、クライアント作成・認証・TLS接続をバックグラウンドで済ませる"""
+    if isinstance(vision_credentials, str):
+        vision_key = f"vision:{_secret_key(vision_credentials)}"
+    else:
+        vision_key = f"vision:{_service_account_key(vision_credentials)}"
+    openai_key = f"openai:{_secret_key(openai_api_key)}"
+    
+    with _lock:
+        targets = [key for key in (vision_key, openai_key) if key not in _warmed_up]
+        _warmed_up.update(targets)
+    
+    if vision_key in targets:
+        _warmup_executor.submit(_warm_up_vision, vision_credentials)
+    if openai_key in targets:
+        _warmup_executor.submit(_warm_up_openai, openai_api_key)
+
+def _warm_up_vision(vision_credentials: Union[Dict, str]):
+    try:
+        if isinstance(vision_credentials, str):
+            # REST（APIキー認証）はエンドポイントへの接続をプールに確保しておく
+            from score_extractor import VISION_ANNOTATE_ENDPOINT
+            
+            parts = urlsplit(VISION_ANNOTATE_ENDPOINT)
+            get_http_session().head(f"{parts.scheme}://{parts.netloc}/", timeout=5)
+        else:
+            # クライアントを作成し、アクセストークンを先に取得しておく
+            from google.auth.transport.requests import Request
+            
+            get_vision_client(vision_credentials)
+            _vision_credentials[_service_account_key(vision_credentials)].refresh(Request())
+    except Exception:
+        pass
+
+def _warm_up_openai(openai_api_key: str):
+    try:
+        # 軽量なAPI呼び出しで接続と認証を確立しておく
+        get_openai_client(openai_api_key).with_options(timeout=5, max_retries=0).models.retrieve('gpt-4o')
+    except Exception:
+        pass
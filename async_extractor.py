@@ -0,0 +1,282 @@
+# async_extractor.py - スクリーンショット解析の非同期版（1つのイベントループで多数の解析を並行実行）
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+from image_encoding import ImagePayload
+from perf_monitor import phase
+from analysis_schema import SchemaValidationError
+from score_extractor import MahjongScoreExtractor, STRUCTURED_OUTPUT_RETRIES, VISION_ANNOTATE_ENDPOINT
+
+# 段階ごとのタイムアウト（秒）
+DEFAULT_STAGE_TIMEOUTS = {
+    'prepare': 10.0,
+    'vision': 30.0,
+    'chatgpt': 60.0
+}
+
+# 同時に解析する画像数の既定値
+DEFAULT_CONCURRENCY = int(os.environ.get('MAHJONG_BATCH_WORKERS', '4'))
+
+VISION_SCOPES = ['https://www.googleapis.com/auth/cloud-vision']
+
+class StageTimeoutError(Exception):
+    """解析の段階が制限時間内に完了しなかった"""
+
+class AsyncMahjongScoreExtractor(MahjongScoreExtractor):
+    """MahjongScoreExtractorの非同期版（非同期のメソッドは先頭にaを付けた別名、HTTP接続はaclose()で閉じる）"""
+    
+    def __init__(self, vision_credentials: Union[Dict, str], openai_api_key: str,
+                 stage_timeouts: Optional[Dict[str, float]] = None):
+        self.stage_timeouts = dict(DEFAULT_STAGE_TIMEOUTS, **(stage_timeouts or {}))
+        self._http_client = None
+        self._openai_client = None
+        self._google_credentials = None
+        super().__init__(vision_credentials, openai_api_key)
+    
+    def _initialize_vision_client(self):
+        """サービスアカウントの認証情報を準備（トークンは初回の呼び出し時に取得）"""
+        from google.oauth2 import service_account
+        
+        # 継承した同期版のメソッドからも使えるようにクライアントを用意
+        super()._initialize_vision_client()
+        self._google_credentials = service_account.Credentials.from_service_account_info(
+            self.vision_credentials,
+            scopes=VISION_SCOPES
+        )
+    
+    async def __aenter__(self) -> 'AsyncMahjongScoreExtractor':
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def aclose(self):
+        """HTTP接続を閉じる"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        if self._openai_client is not None:
+            await self._openai_client.close()
+            self._openai_client = None
+    
+    def _get_http_client(self):
+        if self._http_client is None:
+            import httpx
+            from api_clients import HTTP_POOL_SIZE
+            
+            self._http_client = httpx.AsyncClient(
+                timeout=self.stage_timeouts['vision'],
+                limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+            )
+        return self._http_client
+    
+    def _get_openai_client(self):
+        if self._openai_client is None:
+            from openai import AsyncOpenAI
+            
+            self._openai_client = AsyncOpenAI(api_key=self.openai_api_key)
+        return self._openai_client
+    
+    async def _run_stage(self, stage: str, awaitable):
+        """段階ごとのタイムアウトを適用して実行（キャンセルはそのまま呼び出し元に伝わる）"""
+        timeout = self.stage_timeouts[stage]
+        try:
+            with phase(f"async.{stage}", 'api'):
+                return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise StageTimeoutError(f"{stage}が{timeout:g}秒以内に完了しませんでした")
+    
+    async def _vision_auth(self) -> Dict:
+        """Vision API（REST）の認証パラメータ"""
+        if self.use_api_key:
+            return {'params': {'key': self.vision_api_key}}
+        
+        if not self._google_credentials.valid:
+            from google.auth.transport.requests import Request
+            await asyncio.to_thread(self._google_credentials.refresh, Request())
+        return {'headers': {'Authorization': f"Bearer {self._google_credentials.token}"}}
+    
+    async def aannotate_images(self, images_bytes: List[bytes]) -> List[Union[Dict, Exception]]:
+        """Vision API（REST）に複数画像を1リクエストで送信し、画像ごとの結果を返す"""
+        import httpx
+        
+        auth = await self._vision_auth()
+        try:
+            response = await self._get_http_client().post(
+                VISION_ANNOTATE_ENDPOINT,
+                json=self._build_annotate_body(images_bytes),
+                **auth
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise Exception(f"Vision API リクエストエラー: {e}")
+        
+        return self._parse_annotate_response(response.json(), len(images_bytes))
+    
+    async def _annotate_payload_async(self, payload: ImagePayload) -> Dict:
+        image_bytes = await self._run_stage('prepare', asyncio.to_thread(payload.vision_bytes))
+        annotation = (await self.aannotate_images([image_bytes]))[0]
+        if isinstance(annotation, Exception):
+            raise annotation
+        return self._normalize_annotation(payload, annotation)
+    
+    async def aextract_annotations_with_vision_api(self, image) -> Dict:
+        """Vision APIでテキストと単語ごとの位置を抽出（結果パネルを切り出してから送信）"""
+        import panel_cropper
+        
+        payload = self._as_payload(image)
+        from_layout = await self._run_stage('prepare', asyncio.to_thread(self._prepare_vision_crop, payload))
+        annotation = await self._annotate_payload_async(payload)
+        
+        # 過去のパネル位置で切り出して点数が読めなければ、画像全体で読み直す
+        if from_layout and self._needs_full_image(annotation):
+            panel_cropper.forget_layout(payload.image.size)
+            payload.set_crop(None)
+            annotation = await self._annotate_payload_async(payload)
+        return annotation
+    
+    async def aanalyze_with_chatgpt(self, extracted_text: str, image_data_url: str) -> Dict:
+        """ChatGPT API（非同期クライアント）で画像とテキストを解析"""
+        try:
+            request = self._build_chatgpt_request(extracted_text, image_data_url)
+            
+            # 形式が不正な応答は1回だけ出力し直してもらう
+            for attempt in range(STRUCTURED_OUTPUT_RETRIES + 1):
+                response = await self._get_openai_client().chat.completions.create(**request)
+                result_text = self._read_chatgpt_message(response)
+                try:
+                    return self._parse_chatgpt_response(result_text)
+                except SchemaValidationError as e:
+                    if attempt == STRUCTURED_OUTPUT_RETRIES:
+                        raise
+                    request = self._build_retry_request(request, result_text, e)
+        except Exception as e:
+            raise Exception(f"ChatGPT API エラー: {e}")
+    
+    async def aanalyze_image(self, image, use_cache: bool = True, vision_annotation: Optional[Dict] = None) -> Dict:
+        """メイン解析関数（非同期版）"""
+        import analysis_cache
+        
+        payload = self._as_payload(image)
+        
+        # 同じ画像を解析済みならAPIを呼ばずに返す
+        if use_cache:
+            cached_result = await asyncio.to_thread(self._lookup_cached_result, payload)
+            if cached_result is not None:
+                return cached_result
+        
+        result = await self._analyze_payload_async(payload, vision_annotation, use_cache)
+        
+        if use_cache:
+            await asyncio.to_thread(analysis_cache.store, payload, result)
+        return result
+    
+    async def _analyze_payload_async(self, payload: ImagePayload, vision_annotation: Optional[Dict] = None,
+                                     use_cache: bool = True) -> Dict:
+        """Vision APIとChatGPTで解析（各段階にタイムアウトを適用）"""
+        from rate_limiter import get_openai_limiter, get_vision_limiter
+        
+        try:
+            # Step 1: Google Vision APIでテキスト抽出
+            if vision_annotation is None:
+                await asyncio.to_thread(get_vision_limiter().acquire)
+                vision_annotation = await self._run_stage('vision', self.aextract_annotations_with_vision_api(payload))
+            extracted_text = vision_annotation['text']
+            
+            if not extracted_text.strip():
+                return self._no_text_result(payload)
+            
+            if use_cache:
+                similar_result = await asyncio.to_thread(self._lookup_similar_result, payload, extracted_text)
+                if similar_result is not None:
+                    return similar_result
+            
+            # Step 2: 単語の位置から名前と点数を組み合わせ、点数合計が合えばGPTを省略
+            ai_result = self._parse_vision_annotation(vision_annotation)
+            method = 'ocr'
+            
+            if ai_result is None:
+                # Step 3: 結果パネルを切り出したGPT用画像を作成
+                image_data_url = await self._run_stage(
+                    'prepare', asyncio.to_thread(self._prepare_gpt_image, payload, vision_annotation)
+                )
+                
+                # Step 4: ChatGPT APIで解析
+                await asyncio.to_thread(get_openai_limiter().acquire)
+                ai_result = await self._run_stage('chatgpt', self.aanalyze_with_chatgpt(extracted_text, image_data_url))
+                method = 'gpt'
+            
+            return self._build_result(ai_result, extracted_text, method, payload)
+        
+        except Exception as e:
+            return self.error_result(e)
+
+async def analyze_as_completed(extractor: AsyncMahjongScoreExtractor, images: List,
+                               concurrency: int = DEFAULT_CONCURRENCY,
+                               use_cache: bool = True) -> AsyncIterator[Tuple[int, Dict]]:
+    """複数画像を同時に解析し、完了した順に(入力の番号, 結果)を返す"""
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run(index: int, image) -> Tuple[int, Dict]:
+        async with semaphore:
+            return index, await extractor.aanalyze_image(image, use_cache=use_cache)
+    
+    tasks = [asyncio.ensure_future(run(index, image)) for index, image in enumerate(images)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 途中で打ち切られた場合は残りの解析をキャンセル
+        for task in tasks:
+            task.cancel()
+
+async def analyze_many(extractor: AsyncMahjongScoreExtractor, images: List,
+                       concurrency: int = DEFAULT_CONCURRENCY, use_cache: bool = True) -> List[Dict]:
+    """複数画像を同時に解析し、入力と同じ順序で結果を返す"""
+    results: List[Optional[Dict]] = [None] * len(images)
+    async for index, result in analyze_as_completed(extractor, images, concurrency, use_cache):
+        results[index] = result
+    return results
+
+def _load_cli_credentials() -> Tuple[Union[Dict, str, None], Optional[str]]:
+    """コマンドライン実行時の認証情報（環境変数から取得）"""
+    vision_credentials = os.environ.get('GOOGLE_VISION_API_KEY')
+    credentials_file = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+    if not vision_credentials and credentials_file and os.path.exists(credentials_file):
+        with open(credentials_file, 'r', encoding='utf-8') as f:
+            vision_credentials = json.load(f)
+    return vision_credentials, os.environ.get('OPENAI_API_KEY')
+
+async def _run_cli(paths: List[str], concurrency: int, use_cache: bool) -> int:
+    vision_credentials, openai_api_key = _load_cli_credentials()
+    if not vision_credentials or not openai_api_key:
+        print("GOOGLE_VISION_API_KEY（またはGOOGLE_APPLICATION_CREDENTIALS）とOPENAI_API_KEYを設定してください", file=sys.stderr)
+        return 2
+    
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    
+    failures = 0
+    async with AsyncMahjongScoreExtractor(vision_credentials, openai_api_key) as extractor:
+        async for index, result in analyze_as_completed(extractor, images, concurrency, use_cache):
+            result.pop('encoding_stats', None)
+            print(json.dumps({'file': paths[index], **result}, ensure_ascii=False), flush=True)
+            failures += 0 if result.get('success') else 1
+    return 1 if failures else 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """スクリーンショットを一括解析し、結果をJSON Linesで出力"""
+    parser = argparse.ArgumentParser(description="雀魂のスクリーンショットを非同期で一括解析")
+    parser.add_argument('images', nargs='+', help="解析する画像ファイル")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="同時に解析する画像数")
+    parser.add_argument('--no-cache', action='store_true', help="解析結果キャッシュを使わない")
+    args = parser.parse_args(argv)
+    return asyncio.run(_run_cli(args.images, args.concurrency, not args.no_cache))
+
+if __name__ == '__main__':
+    sys.exit(main())
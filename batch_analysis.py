@@ -0,0 +1,88 @@
+# batch_analysis.py - 複数スクリーンショットの並列解析
+import os
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# 同時に解析する画像数（実際のAPI呼び出し頻度はプロバイダーごとのレート制限で調整）
+BATCH_MAX_WORKERS = int(os.environ.get('MAHJONG_BATCH_WORKERS', '4'))
+
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix='batch-analysis')
+
+def _finish(future: Future, result: Dict, started: float):
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    future.set_result(result)
+
+def _analyze_one(extractor, payload, vision_annotation: Optional[Dict], future: Future, started: float):
+    """OCR済みの1枚をChatGPTで解析（例外も失敗結果として返す）"""
+    try:
+        result = extractor.analyze_image(payload, vision_annotation=vision_annotation)
+    except Exception as e:
+        result = extractor.error_result(e)
+    _finish(future, result, started)
+
+def _analyze_chunk(extractor, jobs: List[Tuple[bytes, Future]], started: float):
+    """Vision APIは複数枚を1リクエストにまとめ、ChatGPTでの解析は画像ごとに並列実行"""
+    from image_encoding import ImagePayload
+    
+    try:
+        uncached = []
+        for image_bytes, future in jobs:
+            payload = ImagePayload.from_upload(image_bytes)
+            cached_result = extractor.get_cached_result(payload)
+            if cached_result is not None:
+                _finish(future, cached_result, started)
+            else:
+                uncached.append((payload, future))
+        
+        annotations = extractor.extract_texts_with_vision_api([payload for payload, _ in uncached]) if uncached else []
+        for (payload, future), annotation in zip(uncached, annotations):
+            if isinstance(annotation, Exception):
+                _finish(future, extractor.error_result(annotation), started)
+            else:
+                _batch_executor.submit(_analyze_one, extractor, payload, annotation, future, started)
+    except Exception as e:
+        for _, future in jobs:
+            if not future.done():
+                _finish(future, extractor.error_result(e), started)
+
+def submit_batch(extractor, files: List[Tuple[str, bytes]]) -> List[Dict]:
+    """画像をまとめて解析キューに投入し、レビューキューの項目を返す"""
+    from score_extractor import VISION_BATCH_SIZE
+    
+    started = time.perf_counter()
+    items = []
+    for name, image_bytes in files:
+        items.append({
+            'id': uuid.uuid4().hex[:12],
+            'name': name,
+            'image_bytes': image_bytes,
+            'status': 'pending',
+            'result': None,
+            'future': Future()
+        })
+    
+    # Vision APIのリクエスト単位でまとめて投入（結果は画像ごとのFutureに振り分ける）
+    for start in range(0, len(items), VISION_BATCH_SIZE):
+        chunk = items[start:start + VISION_BATCH_SIZE]
+        _batch_executor.submit(_analyze_chunk, extractor, [(item['image_bytes'], item['future']) for item in chunk], started)
+    return items
+
+def collect_finished(queue: List[Dict]) -> int:
+    """完了した解析結果をキューに取り込み、新たに完了した件数を返す（メインスレッドで呼ぶ）"""
+    finished = 0
+    for item in queue:
+        future = item.get('future')
+        if future is None or not future.done():
+            continue
+        result = future.result()
+        item['result'] = result
+        item['status'] = 'done' if result.get('success') else 'failed'
+        item['future'] = None
+        finished += 1
+    return finished
+
+def pending_count(queue: List[Dict]) -> int:
+    """解析中の件数"""
+    return sum(1 for item in queue if item['status'] == 'pending')
@@ -0,0 +1,87 @@
+# bench_startup_imports.py - 起動時のimport時間ベンチマーク
+"""
+起動時に読み込まれるモジュールのimport時間を計測する。
+
+    python bench_startup_imports.py [--runs 5]
+
+各計測は新しいPythonプロセスで行い、中央値を表示する。
+「遅延読み込み」はアプリ起動時と同じくmain.pyが読み込むモジュールのみ、
+「一括読み込み」は解析・グラフ・Google API系の重い依存もあわせて読み込んだ場合。
+Streamlit本体がimport時に読み込む依存（plotlyなど）はアプリ側では遅延できないため、
+読み込み済みの一覧からは除き、別に表示する。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 機能を初めて使うときまで読み込みを遅らせている依存
+HEAVY_MODULES = [
+    'plotly.graph_objects',
+    'openai',
+    'google.cloud.vision',
+    'googleapiclient.discovery'
+]
+
+STARTUP_MODULES = ['ui_components', 'tab_pages']
+
+# アプリのモジュールを読み込む前からStreamlit本体が読み込んでいるかの確認用
+FRAMEWORK_MODULES = ['streamlit']
+
+MEASURE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    try:
+        __import__(name)
+    except ImportError:
+        pass
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'elapsed': elapsed,
+    'loaded': [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+def measure(modules, runs: int) -> dict:
+    """新しいプロセスでimport時間を計測（中央値）"""
+    script = MEASURE_SCRIPT.format(modules=modules, heavy=HEAVY_MODULES)
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    loaded = []
+    
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result['elapsed'])
+        loaded = result['loaded']
+    
+    return {'median': statistics.median(timings), 'loaded': loaded}
+
+def main():
+    parser = argparse.ArgumentParser(description='起動時のimport時間を計測')
+    parser.add_argument('--runs', type=int, default=5, help='計測回数（中央値を使用）')
+    args = parser.parse_args()
+    
+    framework = measure(FRAMEWORK_MODULES, args.runs)
+    lazy = measure(STARTUP_MODULES, args.runs)
+    eager = measure(STARTUP_MODULES + HEAVY_MODULES, args.runs)
+    
+    def app_loaded(result: dict) -> str:
+        """Streamlit本体が読み込んだものを除いた、アプリが読み込んだ重い依存"""
+        names = [name for name in result['loaded'] if name not in framework['loaded']]
+        return ', '.join(names) or 'なし'
+    
+    print(f"Streamlit本体: {framework['median'] * 1000:.0f} ms"
+          f"（本体が読み込む依存: {', '.join(framework['loaded']) or 'なし'}、両方の計測に含まれる）")
+    print(f"遅延読み込み: {lazy['median'] * 1000:.0f} ms（アプリが読み込んだ依存: {app_loaded(lazy)}）")
+    print(f"一括読み込み: {eager['median'] * 1000:.0f} ms（アプリが読み込んだ依存: {app_loaded(eager)}）")
+    print(f"削減: {(eager['median'] - lazy['median']) * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    main()
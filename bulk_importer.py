@@ -0,0 +1,191 @@
+# bulk_importer.py - 過去対局データ一括インポート
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+import pandas as pd
+from spreadsheet_manager import RECORD_COLUMNS, SCORE_FIELDS, parse_date
+
+# 1回の正規化で処理する行数
+IMPORT_BATCH_SIZE = 1000
+
+# append_rowsで1回に送る行数
+APPEND_CHUNK_SIZE = 500
+
+# シートのヘッダー名もアプリのフィールド名も受け付ける
+COLUMN_ALIASES = {header: field for header, field in RECORD_COLUMNS}
+
+GAME_TYPES = ["四麻東風", "四麻半荘", "三麻東風", "三麻半荘"]
+
+# 結果に表示する行番号の上限
+MAX_REPORTED_ROWS = 20
+
+def iter_import_rows(file_obj, file_name: str) -> Iterator[Dict]:
+    """CSV / JSON Linesのエクスポートを1行ずつ読み出す（ファイル全体をメモリに載せない）"""
+    lower_name = file_name.lower()
+    if not lower_name.endswith(('.csv', '.jsonl')):
+        # JSON配列はストリームで読めないため、JSON Linesに変換してもらう
+        raise ValueError(f"対応していないファイル形式です（CSVまたはJSON Linesを指定してください）: {file_name}")
+    
+    if isinstance(file_obj, (bytes, bytearray)):
+        file_obj = io.BytesIO(file_obj)
+    
+    text_stream = io.TextIOWrapper(file_obj, encoding='utf-8-sig', newline='')
+    try:
+        if lower_name.endswith('.csv'):
+            for row in csv.DictReader(text_stream):
+                yield row
+        else:
+            for line in text_stream:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    finally:
+        # ラッパーの破棄で呼び出し元のファイルが閉じられないよう切り離す
+        text_stream.detach()
+
+def iter_batches(rows: Iterator[Dict], batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[List[Dict]]:
+    """行ストリームをバッチに分割"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def normalize_batch(batch: List[Dict], default_game_type: str = "四麻半荘", first_row: int = 1) -> Dict:
+    """バッチをまとめて検証・正規化（pandasでベクトル演算、first_rowはバッチ先頭の行番号）"""
+    df = pd.DataFrame(batch).rename(columns=COLUMN_ALIASES)
+    
+    for _, field in RECORD_COLUMNS:
+        if field not in df.columns:
+            df[field] = 0 if field in SCORE_FIELDS else ''
+    df = df[[field for _, field in RECORD_COLUMNS]]
+    
+    # 点数: カンマ区切りや空欄を数値に変換
+    for field in SCORE_FIELDS:
+        scores = df[field].astype(str).str.replace(',', '', regex=False).str.strip()
+        df[field] = pd.to_numeric(scores, errors='coerce').fillna(0).round().astype(int)
+    
+    # 文字列列: 欠損を空文字にして前後の空白を除去
+    text_fields = [field for _, field in RECORD_COLUMNS if field not in SCORE_FIELDS]
+    df[text_fields] = df[text_fields].fillna('').astype(str).apply(lambda col: col.str.strip())
+    
+    # 対局日: シートの読み込みと同じ規則で形式を統一し、解析できない行は無効
+    df['date'] = df['date'].str.split(' ').str[0].map(parse_date)
+    dates = pd.to_datetime(df['date'], format='%Y-%m-%d', errors='coerce')
+    
+    df.loc[~df['game_type'].isin(GAME_TYPES), 'game_type'] = default_game_type
+    
+    name_fields = [f'player{i}_name' for i in range(1, 5)]
+    has_player = (df[name_fields] != '').any(axis=1)
+    valid = dates.notna() & has_player
+    row_numbers = pd.RangeIndex(first_row, first_row + len(df))
+    
+    valid_df = df[valid].copy()
+    valid_df.loc[valid_df['timestamp'] == '', 'timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    player_names = pd.unique(valid_df[name_fields].values.ravel())
+    
+    # 失敗時に元ファイルの行を示せるよう行番号を保持（シートには書き込まれない）
+    records = valid_df.to_dict('records')
+    for record, row_number in zip(records, row_numbers[valid.values]):
+        record['source_row'] = int(row_number)
+    
+    return {
+        'records': records,
+        'player_names': [name for name in player_names if name],
+        'invalid_count': int((~valid).sum()),
+        'invalid_rows': [int(row_number) for row_number in row_numbers[~valid.values]]
+    }
+
+def import_game_logs(file_obj, file_name: str, sheet_manager, config_sheet_manager=None,
+                     default_game_type: str = "四麻半荘",
+                     progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """過去の対局ログをストリーム処理でシーズンシートに一括登録"""
+    start_time = time.perf_counter()
+    imported_count = 0
+    duplicate_count = 0
+    invalid_rows = []
+    failed_rows = []
+    error = None
+    player_names = set()
+    pending = []
+    next_row = 1
+    
+    # 登録済みの記録は最初に1回だけ読み込み、以降のチャンクでは追加分を反映して使い回す
+    existing_keys = sheet_manager.get_existing_record_keys()
+    
+    def report():
+        if progress_callback:
+            elapsed = time.perf_counter() - start_time
+            progress_callback({
+                'imported': imported_count,
+                'invalid': len(invalid_rows),
+                'elapsed': elapsed,
+                'rows_per_sec': imported_count / elapsed if elapsed > 0 else 0.0
+            })
+    
+    def append(chunk: List[Dict]) -> bool:
+        """チャンクを追記し、失敗した場合は未登録の行を記録してFalse"""
+        nonlocal imported_count, duplicate_count, error
+        result = sheet_manager.add_records(chunk, chunk_size=APPEND_CHUNK_SIZE, existing_keys=existing_keys)
+        imported_count += result['added']
+        duplicate_count += result['duplicates']
+        report()
+        if result['error']:
+            failed_rows.extend(record['source_row'] for record in result['failed_records'])
+            error = result['error']
+            return False
+        return True
+    
+    for batch in iter_batches(iter_import_rows(file_obj, file_name)):
+        normalized = normalize_batch(batch, default_game_type, first_row=next_row)
+        next_row += len(batch)
+        invalid_rows.extend(normalized['invalid_rows'])
+        player_names.update(normalized['player_names'])
+        pending.extend(normalized['records'])
+        
+        # チャンク単位でシートに追記（失敗したら以降の行は登録しない）
+        while len(pending) >= APPEND_CHUNK_SIZE and error is None:
+            chunk, pending = pending[:APPEND_CHUNK_SIZE], pending[APPEND_CHUNK_SIZE:]
+            append(chunk)
+        if error is not None:
+            break
+    
+    if error is not None:
+        # 中断した時点で未処理の行も未登録として報告
+        failed_rows.extend(record['source_row'] for record in pending)
+    elif pending:
+        append(pending)
+    
+    # 書き込んだシーズンは変更検知とキャッシュを破棄して次の読み込みで取り直す
+    if imported_count > 0:
+        from sheet_change_probe import invalidate_probe
+        from season_cache import invalidate
+        
+        invalidate_probe(sheet_manager.spreadsheet_id)
+        invalidate(sheet_manager.credentials_dict, sheet_manager.spreadsheet_id)
+    
+    # 未登録プレイヤーはマスタシートへ1回でまとめて登録
+    registered_players = []
+    if config_sheet_manager and player_names:
+        registered_players = config_sheet_manager.add_players(sorted(player_names))
+    
+    elapsed = time.perf_counter() - start_time
+    return {
+        'imported': imported_count,
+        'duplicates': duplicate_count,
+        'invalid': len(invalid_rows),
+        'invalid_rows': invalid_rows[:MAX_REPORTED_ROWS],
+        'failed': len(failed_rows),
+        'failed_rows': failed_rows[:MAX_REPORTED_ROWS],
+        'error': error,
+        'registered_players': registered_players,
+        'elapsed': elapsed,
+        'rows_per_sec': imported_count / elapsed if elapsed > 0 else 0.0
+    }
@@ -0,0 +1,156 @@
+# career_stats.py - 全シーズン通算成績の集計
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+import pandas as pd
+from scoring_config import SCORING_CONFIG, calculate_game_score, get_player_count_from_game_type
+
+# シーズン取得の同時実行数（実際の呼び出し頻度はレート制限で調整）
+CAREER_FETCH_WORKERS = 4
+
+CAREER_COLUMNS = ['season', 'game_index', 'date', 'game_type', 'player_name', 'score']
+
+def fetch_all_seasons(sheets_creds: Dict, seasons: Dict,
+                      progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, Dict]:
+    """全シーズンの列データを並列取得（変更のないシーズンはキャッシュを使用）"""
+    from rate_limiter import get_sheets_read_limiter
+    from season_cache import fetch_season_columns
+    
+    limiter = get_sheets_read_limiter(sheets_creds.get('client_email', ''))
+    targets = {
+        season_key: info['spreadsheet_id']
+        for season_key, info in seasons.items()
+        if info.get('spreadsheet_id')
+    }
+    
+    def fetch(spreadsheet_id: str) -> Optional[Dict]:
+        try:
+            result = fetch_season_columns(sheets_creds, spreadsheet_id, limiter=limiter)
+        except Exception:
+            return None
+        if result is not None:
+            result['spreadsheet_id'] = spreadsheet_id
+        return result
+    
+    results = {}
+    with ThreadPoolExecutor(max_workers=CAREER_FETCH_WORKERS, thread_name_prefix='career-fetch') as executor:
+        futures = {season_key: executor.submit(fetch, spreadsheet_id) for season_key, spreadsheet_id in targets.items()}
+        for done_count, (season_key, future) in enumerate(futures.items(), start=1):
+            results[season_key] = future.result()
+            if progress_callback:
+                progress_callback(done_count, len(futures))
+    
+    return results
+
+def build_season_frame(season_key: str, columns: Dict[str, list]) -> pd.DataFrame:
+    """1シーズンの列データを1行1プレイヤーの縦持ちデータに変換（順位・スコア計算済み）"""
+    game_count = len(columns.get('date', []))
+    if game_count == 0:
+        return pd.DataFrame(columns=CAREER_COLUMNS + ['rank', 'game_score'])
+    
+    seats = []
+    for seat in range(1, 5):
+        seats.append(pd.DataFrame({
+            'season': season_key,
+            'game_index': range(game_count),
+            'date': columns.get('date', [''] * game_count),
+            'game_type': columns.get('game_type', [''] * game_count),
+            'seat': seat,
+            'player_name': columns.get(f'player{seat}_name', [''] * game_count),
+            'score': columns.get(f'player{seat}_score', [0] * game_count)
+        }))
+    frame = pd.concat(seats, ignore_index=True)
+    frame['score'] = pd.to_numeric(frame['score'], errors='coerce').fillna(0)
+    
+    # 順位: 同じ対局内で自分より点棒が多い席の数 + 1（空席も含めて比較）
+    frame['rank'] = frame.groupby('game_index')['score'].rank(ascending=False, method='min').astype(int)
+    
+    frame = frame[frame['player_name'].astype(str).str.strip() != '']
+    frame = frame.sort_values(['game_index', 'seat']).drop_duplicates(['game_index', 'player_name'])
+    
+    # 点数は終了時点棒について線形なので、点棒0のときの点数（開始点棒・ウマ・参加得点の分）を
+    # ゲームタイプと順位の組み合わせごとにcalculate_game_scoreで求め、点棒の分を足す
+    frame['game_type'] = frame['game_type'].astype(str)
+    offsets = {
+        (game_type, rank): calculate_game_score(0, game_type, rank, get_player_count_from_game_type(game_type))
+        for game_type, rank in frame[['game_type', 'rank']].drop_duplicates().itertuples(index=False)
+    }
+    offset = pd.MultiIndex.from_arrays([frame['game_type'], frame['rank']]).map(offsets)
+    frame['game_score'] = frame['score'] / SCORING_CONFIG['point_divisor'] + offset.to_numpy(dtype=float)
+    
+    return frame.drop(columns='seat').reset_index(drop=True)
+
+def build_career_frame(season_data: Dict[str, Optional[Dict]], sheets_creds: Optional[Dict] = None) -> pd.DataFrame:
+    """全シーズンを1つの縦持ちデータに結合（シーズンごとの変換結果はシーズンキャッシュでメモ化）"""
+    from season_cache import get_derived
+    
+    frames = []
+    for season_key, data in season_data.items():
+        if not data:
+            continue
+        if sheets_creds is not None and data.get('spreadsheet_id'):
+            frame = get_derived(
+                sheets_creds, data['spreadsheet_id'], data['fingerprint'], f"career_frame:{season_key}",
+                lambda: build_season_frame(season_key, data['columns'])
+            )
+        else:
+            frame = build_season_frame(season_key, data['columns'])
+        frames.append(frame)
+    
+    if not frames:
+        return pd.DataFrame(columns=CAREER_COLUMNS + ['rank', 'game_score'])
+    return pd.concat(frames, ignore_index=True)
+
+def compute_leaderboards(career_df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """シーズン別と通算のランキングを1回の集計から作成"""
+    if career_df.empty:
+        return {'lifetime': pd.DataFrame(), 'per_season': pd.DataFrame()}
+    
+    df = career_df.assign(first_place=(career_df['rank'] == 1).astype(int))
+    
+    # シーズン×プレイヤーで1回だけ集計し、通算はその結果を再集計
+    per_season = df.groupby(['season', 'player_name']).agg(
+        games=('game_score', 'size'),
+        total_score=('game_score', 'sum'),
+        raw_total=('score', 'sum'),
+        rank_total=('rank', 'sum'),
+        first_places=('first_place', 'sum'),
+        max_score=('score', 'max'),
+        min_score=('score', 'min')
+    ).reset_index()
+    
+    lifetime = per_season.groupby('player_name').agg(
+        seasons=('season', 'nunique'),
+        games=('games', 'sum'),
+        total_score=('total_score', 'sum'),
+        raw_total=('raw_total', 'sum'),
+        rank_total=('rank_total', 'sum'),
+        first_places=('first_places', 'sum'),
+        max_score=('max_score', 'max'),
+        min_score=('min_score', 'min')
+    ).reset_index()
+    
+    return {
+        'lifetime': _format_leaderboard(lifetime, ['プレイヤー名', 'シーズン数']),
+        'per_season': _format_leaderboard(per_season, ['シーズン', 'プレイヤー名'])
+    }
+
+def _format_leaderboard(stats: pd.DataFrame, key_labels: list) -> pd.DataFrame:
+    """集計結果を表示用の表に整形"""
+    key_columns = ['player_name', 'seasons'] if 'seasons' in stats.columns else ['season', 'player_name']
+    
+    table = stats[key_columns].copy()
+    table.columns = key_labels
+    table['対局数'] = stats['games']
+    table['合計スコア'] = stats['total_score'].round(1)
+    table['平均スコア'] = (stats['total_score'] / stats['games']).round(2)
+    table['平均点棒'] = (stats['raw_total'] / stats['games']).round(1)
+    table['平均順位'] = (stats['rank_total'] / stats['games']).round(2)
+    table['1位率'] = (stats['first_places'] / stats['games'] * 100).map(lambda rate: f"{rate:.1f}%")
+    table['最高点棒'] = stats['max_score'].astype(int)
+    table['最低点棒'] = stats['min_score'].astype(int)
+    
+    sort_columns = ['平均スコア'] if key_labels[0] == 'プレイヤー名' else ['シーズン', '平均スコア']
+    ascending = [False] if key_labels[0] == 'プレイヤー名' else [True, False]
+    table = table.sort_values(sort_columns, ascending=ascending).reset_index(drop=True)
+    table.index = table.index + 1
+    return table
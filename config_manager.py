@@ -1,8 +1,88 @@
 # config_manager.py - 設定スプレッドシート対応版
 import json
 import os
-from typing import Dict, Optional, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
 import streamlit as st
+from config_snapshot import load_snapshot, save_snapshot
+from perf_monitor import timed
+
+# スプレッドシートとのバックグラウンド照合用
+_reconcile_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='config-reconcile')
+
+# Google APIの認証情報とディスカバリ文書（Streamlitは再実行ごとにスレッドが変わるためプロセス全体で共有）
+_google_credentials: Dict[tuple, object] = {}
+_discovery_documents: Dict[tuple, str] = {}
+_google_api_lock = threading.Lock()
+
+GOOGLE_API_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive'
+]
+
+def _get_google_service(creds_dict: Dict, api: str, version: str):
+    """共有の認証情報と同梱のディスカバリ文書からAPIサービスを構築（HTTPトランスポートはスレッドセーフでないため呼び出しごと）"""
+    from googleapiclient.discovery import build_from_document
+    
+    with _google_api_lock:
+        credentials_key = (creds_dict.get('client_email', ''), creds_dict.get('private_key_id', ''))
+        credentials = _google_credentials.get(credentials_key)
+        if credentials is None:
+            from google.oauth2 import service_account
+            
+            credentials = service_account.Credentials.from_service_account_info(
+                creds_dict,
+                scopes=GOOGLE_API_SCOPES
+            )
+            _google_credentials[credentials_key] = credentials
+        
+        document = _discovery_documents.get((api, version))
+        if document is None:
+            from googleapiclient.discovery_cache import get_static_doc
+            
+            document = get_static_doc(api, version)
+            _discovery_documents[(api, version)] = document
+    
+    # 文書の解析結果はサービス構築時に書き換えられるため、共有するのは文字列まで
+    return build_from_document(document, credentials=credentials)
+
+def _fetch_user_config(sheets_creds: Dict, include_players: bool = False,
+                       errors: Optional[List[str]] = None) -> Optional[Dict]:
+    """設定スプレッドシートからシーズン設定（とプレイヤー一覧）を取得（セッション状態には触れない）"""
+    from config_spreadsheet_manager import ConfigSpreadsheetManager
+    
+    config_manager = ConfigSpreadsheetManager(sheets_creds, error_sink=errors)
+    if not config_manager.connect():
+        return None
+    
+    user_seasons = config_manager.load_user_seasons()
+    if not user_seasons:
+        return None
+    
+    # プレイヤー一覧の取得に失敗した場合は空の一覧ではなくNone（取得できなかった項目）にする
+    master_players = None
+    if include_players:
+        error_count = len(errors) if errors is not None else 0
+        players = config_manager.get_all_players()
+        if errors is None or len(errors) == error_count:
+            master_players = players
+    
+    return {
+        'seasons': user_seasons.get('seasons', {}),
+        'current_season': user_seasons.get('current_season', ''),
+        'master_players': master_players
+    }
+
+def _reconcile_user_config(sheets_creds: Dict) -> Dict:
+    """バックグラウンドでスプレッドシートと照合（画面に表示できないエラーは結果に含めて返す）"""
+    errors: List[str] = []
+    try:
+        config = _fetch_user_config(sheets_creds, include_players=True, errors=errors)
+    except Exception as e:
+        errors.append(f"設定の同期エラー: {e}")
+        config = None
+    return {'config': config, 'errors': errors}
 
 class ConfigManager:
     """設定ファイルを管理するクラス（設定スプレッドシート対応）"""
@@ -15,6 +95,9 @@ class ConfigManager:
             st.session_state['config_data'] = self.load_config()
         
         self.config = st.session_state['config_data']
+        
+        # バックグラウンド照合が終わっていれば結果を反映
+        self.apply_reconciled_config()
     
     def load_config(self) -> Dict:
         """設定ファイルまたはStreamlit Secretsから設定を読み込み"""
@@ -33,8 +116,9 @@ class ConfigManager:
             else:
                 base_config = self.get_default_config()
         
-        # 設定スプレッドシートからシーズン情報を読み込み
-        self._load_seasons_from_spreadsheet(base_config)
+        # スナップショットがあれば即座に使い、スプレッドシートとの照合はバックグラウンドで実行
+        if not self._load_seasons_from_snapshot(base_config):
+            self._load_seasons_from_spreadsheet(base_config)
         
         return base_config
     
@@ -46,32 +130,122 @@ class ConfigManager:
             if not sheets_creds:
                 return
             
-            from config_spreadsheet_manager import ConfigSpreadsheetManager
-            
-            config_manager = ConfigSpreadsheetManager(sheets_creds)
-            if config_manager.connect():
-                user_seasons = config_manager.load_user_seasons()
+            # シーズン設定の取得中にプレイヤーマスタの取得も並行して開始
+            if 'master_players' not in st.session_state:
+                from startup_loader import fetch_master_players, submit_prefetch
+                st.session_state['startup_players_future'] = submit_prefetch(fetch_master_players, sheets_creds)
+            
+            user_seasons = _fetch_user_config(sheets_creds)
+            if user_seasons:
+                save_snapshot(
+                    sheets_creds.get('client_email', ''),
+                    user_seasons['seasons'],
+                    user_seasons['current_season']
+                )
                 
-                if user_seasons:
-                    # Google Sheetsの設定をローカル設定に統合
-                    if "google_sheets" not in config:
-                        config["google_sheets"] = {}
-                    
-                    config["google_sheets"]["seasons"] = user_seasons.get('seasons', {})
-                    config["google_sheets"]["current_season"] = user_seasons.get('current_season', '')
-                    
-                    # セッション状態に保存（設定スプレッドシートとの同期済みフラグ）
-                    st.session_state['config_synced_with_spreadsheet'] = True
-                else:
-                    # 設定スプレッドシートにデータがない場合はローカル設定を維持
-                    if "google_sheets" not in config:
-                        config["google_sheets"] = {"seasons": {}, "current_season": ""}
+                # Google Sheetsの設定をローカル設定に統合
+                if "google_sheets" not in config:
+                    config["google_sheets"] = {}
+                
+                config["google_sheets"]["seasons"] = user_seasons['seasons']
+                config["google_sheets"]["current_season"] = user_seasons['current_season']
+                
+                # セッション状態に保存（設定スプレッドシートとの同期済みフラグ）
+                st.session_state['config_synced_with_spreadsheet'] = True
+            else:
+                # 設定スプレッドシートにデータがない場合はローカル設定を維持
+                if "google_sheets" not in config:
+                    config["google_sheets"] = {"seasons": {}, "current_season": ""}
                     
         except Exception as e:
             # エラーが発生してもローカル設定は維持
             if "google_sheets" not in config:
                 config["google_sheets"] = {"seasons": {}, "current_season": ""}
     
+    def _load_seasons_from_snapshot(self, config: Dict) -> bool:
+        """スナップショットからシーズン設定とプレイヤー一覧を復元し、照合を開始"""
+        sheets_creds = self._get_sheets_credentials_dict(config)
+        if not sheets_creds:
+            return False
+        
+        snapshot = load_snapshot(sheets_creds.get('client_email', ''))
+        if not snapshot:
+            return False
+        
+        google_sheets = config.setdefault("google_sheets", {})
+        google_sheets["seasons"] = snapshot['seasons']
+        google_sheets["current_season"] = snapshot['current_season']
+        
+        if 'master_players' not in st.session_state:
+            st.session_state['master_players'] = list(snapshot['master_players'])
+        
+        # 照合が終わるまではスナップショットの内容であることを表示
+        st.session_state['config_snapshot_stale'] = True
+        st.session_state['config_reconcile_future'] = _reconcile_executor.submit(
+            _reconcile_user_config, sheets_creds
+        )
+        return True
+    
+    def is_reconcile_pending(self) -> bool:
+        """スプレッドシートとの照合が実行中か"""
+        future = st.session_state.get('config_reconcile_future')
+        return future is not None and not future.done()
+    
+    def apply_reconciled_config(self) -> bool:
+        """完了した照合結果を設定に反映（内容が変わった場合True）"""
+        future = st.session_state.get('config_reconcile_future')
+        if future is None or not future.done():
+            return False
+        
+        del st.session_state['config_reconcile_future']
+        
+        try:
+            reconciled = future.result()
+        except Exception as e:
+            reconciled = {'config': None, 'errors': [f"設定の同期エラー: {e}"]}
+        
+        # バックグラウンドで発生したエラーはここで表示
+        for message in reconciled['errors']:
+            st.error(message)
+        
+        # 照合に失敗した場合はスナップショットのまま（古い可能性ありの表示を継続）
+        result = reconciled['config']
+        if not result:
+            return False
+        
+        # 取得できなかった項目（プレイヤー一覧）はスナップショットの値を維持
+        players_loaded = result['master_players'] is not None
+        st.session_state['config_snapshot_stale'] = not players_loaded
+        st.session_state['config_synced_with_spreadsheet'] = True
+        
+        google_sheets = self.config.setdefault("google_sheets", {})
+        previous_season = google_sheets.get("current_season", "")
+        changed = (
+            google_sheets.get("seasons", {}) != result['seasons'] or
+            previous_season != result['current_season'] or
+            (players_loaded and st.session_state.get('master_players') != result['master_players'])
+        )
+        
+        google_sheets["seasons"] = result['seasons']
+        google_sheets["current_season"] = result['current_season']
+        if players_loaded:
+            st.session_state['master_players'] = result['master_players']
+        
+        sheets_creds = self._get_sheets_credentials_dict(self.config)
+        if sheets_creds:
+            save_snapshot(
+                sheets_creds.get('client_email', ''),
+                google_sheets.get("seasons", {}),
+                google_sheets.get("current_season", ""),
+                result['master_players']
+            )
+        
+        # 現在のシーズンが変わっていたら対局データを読み直す
+        if google_sheets.get("current_season", "") != previous_season:
+            st.session_state['last_sync_time'] = 0
+        
+        return changed
+    
     def _get_sheets_credentials_dict(self, config: Dict) -> Optional[Dict]:
         """Google Sheets認証情報を取得"""
         # まずStreamlit Secretsから読み込みを試行
@@ -114,6 +288,7 @@ class ConfigManager:
         
         return None
     
+    @timed('secrets.parse', 'startup')
     def load_from_secrets(self) -> Dict:
         """Streamlit Secretsから設定を読み込み"""
         try:
@@ -202,16 +377,16 @@ class ConfigManager:
                 seasons = config.get("google_sheets", {}).get("seasons", {})
                 current_season = config.get("google_sheets", {}).get("current_season", "")
                 
-                # 各シーズンを設定スプレッドシートに保存
-                for season_key, season_info in seasons.items():
-                    is_current = (season_key == current_season)
-                    config_manager.save_season_config(
-                        season_key=season_key,
-                        season_name=season_info.get('name', season_key),
-                        spreadsheet_id=season_info.get('spreadsheet_id', ''),
-                        spreadsheet_url=season_info.get('url', ''),
-                        is_current=is_current
-                    )
+                # 変更のあったシーズンだけを1回の一括更新で保存
+                config_manager.save_season_configs(seasons, current_season)
+                
+                # 次回起動用のスナップショットも更新
+                save_snapshot(
+                    sheets_creds.get('client_email', ''),
+                    seasons,
+                    current_season,
+                    st.session_state.get('master_players')
+                )
                 
         except Exception as e:
             # エラーが発生してもローカル設定は保存
@@ -409,9 +584,6 @@ class ConfigManager:
     def _create_new_spreadsheet(self, title: str) -> Dict:
         """新しいスプレッドシートを自動作成（公開設定）"""
         try:
-            from google.oauth2 import service_account
-            from googleapiclient.discovery import build
-            
             # 認証情報を取得
             creds_dict = self.load_sheets_credentials()
             if not creds_dict:
@@ -420,32 +592,14 @@ class ConfigManager:
                     'error': "Google Sheets認証情報が見つかりません"
                 }
             
-            # サービスアカウント認証
-            credentials = service_account.Credentials.from_service_account_info(
-                creds_dict,
-                scopes=[
-                    'https://www.googleapis.com/auth/spreadsheets',
-                    'https://www.googleapis.com/auth/drive'
-                ]
-            )
-            
-            # Google Sheets APIサービス
-            sheets_service = build('sheets', 'v4', credentials=credentials)
-            drive_service = build('drive', 'v3', credentials=credentials)
+            sheets_service = _get_google_service(creds_dict, 'sheets', 'v4')
+            drive_service = _get_google_service(creds_dict, 'drive', 'v3')
             
-            # スプレッドシート作成
-            spreadsheet_body = {
-                'properties': {
-                    'title': title
-                },
-                'sheets': [{
-                    'properties': {
-                        'title': 'Sheet1'
-                    }
-                }]
-            }
-            
-            response = sheets_service.spreadsheets().create(body=spreadsheet_body).execute()
+            # ヘッダー行・書式・ゲームID列の非表示を含めて1回で作成
+            response = sheets_service.spreadsheets().create(
+                body=self._build_spreadsheet_body(title),
+                fields='spreadsheetId'
+            ).execute()
             spreadsheet_id = response['spreadsheetId']
             url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
             
@@ -457,16 +611,12 @@ class ConfigManager:
                 }
                 drive_service.permissions().create(
                     fileId=spreadsheet_id,
-                    body=permission
+                    body=permission,
+                    fields='id'
                 ).execute()
             except Exception as e:
                 st.warning(f"公開設定に失敗しましたが、スプレッドシートは作成されました: {e}")
             
-            # ヘッダー行を追加
-            header_result = self._initialize_spreadsheet_headers(sheets_service, spreadsheet_id)
-            if not header_result['success']:
-                st.warning(f"ヘッダー初期化に問題がありました: {header_result.get('warning', '')}")
-            
             return {
                 'success': True,
                 'spreadsheet_id': spreadsheet_id,
@@ -485,84 +635,49 @@ class ConfigManager:
                 'error': f"スプレッドシート作成エラー: {str(e)}"
             }
     
-    def _initialize_spreadsheet_headers(self, sheets_service, spreadsheet_id: str) -> Dict:
-        """スプレッドシートにヘッダー行を追加"""
-        try:
-            headers = [
-                "対局日", "対局時刻", "対局タイプ",
-                "プレイヤー1名", "プレイヤー1点数",
-                "プレイヤー2名", "プレイヤー2点数", 
-                "プレイヤー3名", "プレイヤー3点数",
-                "プレイヤー4名", "プレイヤー4点数",
-                "メモ", "登録日時"
-            ]
-            
-            # ヘッダー行を追加
-            body = {
-                'values': [headers]
+    def _build_spreadsheet_body(self, title: str) -> Dict:
+        """ヘッダー行と書式を含むスプレッドシート作成リクエストの本文"""
+        from spreadsheet_manager import RECORD_COLUMNS, GAME_ID_COLUMN
+        
+        header_format = {
+            'backgroundColor': {
+                'red': 0.9,
+                'green': 0.9,
+                'blue': 0.9
+            },
+            'textFormat': {
+                'bold': True
             }
-            
-            sheets_service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id,
-                range='A1:M1',
-                valueInputOption='RAW',
-                body=body
-            ).execute()
-            
-            # スプレッドシートの詳細情報を取得して正しいシートIDを取得
-            try:
-                spreadsheet = sheets_service.spreadsheets().get(
-                    spreadsheetId=spreadsheet_id
-                ).execute()
-                
-                # 最初のシートのIDを取得
-                sheet_id = spreadsheet['sheets'][0]['properties']['sheetId']
-                
-                # ヘッダー行のフォーマット設定
-                format_body = {
-                    'requests': [{
-                        'repeatCell': {
-                            'range': {
-                                'sheetId': sheet_id,
-                                'startRowIndex': 0,
-                                'endRowIndex': 1
-                            },
-                            'cell': {
-                                'userEnteredFormat': {
-                                    'backgroundColor': {
-                                        'red': 0.9,
-                                        'green': 0.9,
-                                        'blue': 0.9
-                                    },
-                                    'textFormat': {
-                                        'bold': True
-                                    }
-                                }
-                            },
-                            'fields': 'userEnteredFormat(backgroundColor,textFormat)'
-                        }
-                    }]
-                }
-                
-                sheets_service.spreadsheets().batchUpdate(
-                    spreadsheetId=spreadsheet_id,
-                    body=format_body
-                ).execute()
-                
-            except Exception as format_error:
-                # フォーマット設定に失敗してもヘッダーは追加されているので警告のみ
-                return {
-                    'success': True,
-                    'warning': f"ヘッダー追加は成功しましたが、フォーマット設定に失敗: {format_error}"
-                }
-            
-            return {'success': True}
-            
-        except Exception as e:
-            return {
-                'success': False,
-                'warning': f"ヘッダー初期化に失敗しましたが、スプレッドシートは作成されました: {e}"
+        }
+        
+        header_cells = [
+            {
+                'userEnteredValue': {'stringValue': header},
+                'userEnteredFormat': header_format
             }
+            for header, _ in RECORD_COLUMNS
+        ]
+        
+        # ゲームID列（N列）は非表示
+        column_metadata = [{} for _ in RECORD_COLUMNS]
+        column_metadata[GAME_ID_COLUMN - 1] = {'hiddenByUser': True}
+        
+        return {
+            'properties': {
+                'title': title
+            },
+            'sheets': [{
+                'properties': {
+                    'title': 'Sheet1'
+                },
+                'data': [{
+                    'startRow': 0,
+                    'startColumn': 0,
+                    'rowData': [{'values': header_cells}],
+                    'columnMetadata': column_metadata
+                }]
+            }]
+        }
     
     def get_config_status(self) -> Dict:
         """設定状況を確認"""
@@ -0,0 +1,107 @@
+# config_snapshot.py - 設定スナップショット（起動高速化用のローカルキャッシュ）
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# スナップショットの保存先（認証情報は保存しない）
+SNAPSHOT_FILE = os.environ.get('MAHJONG_CONFIG_SNAPSHOT', '.config_snapshot.json')
+
+SNAPSHOT_VERSION = 1
+
+# 同じファイルへの読み込み〜置き換えを直列化（複数セッションの同時保存で更新が失われないように）
+_snapshot_lock = threading.Lock()
+
+@contextmanager
+def _locked_snapshot(snapshot_file: str):
+    """スナップショットの更新を排他（プロセス内はロック、プロセス間はロックファイル）"""
+    with _snapshot_lock:
+        try:
+            import fcntl
+        except ImportError:
+            # ファイルロックのない環境ではプロセス内の排他のみ
+            fcntl = None
+        
+        if fcntl is None:
+            yield
+            return
+        
+        with open(f"{snapshot_file}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def load_snapshot(user_id: str, snapshot_file: str = SNAPSHOT_FILE) -> Optional[Dict]:
+    """ユーザーの最新スナップショットを読み込み（なければNone）"""
+    if not user_id or not os.path.exists(snapshot_file):
+        return None
+    
+    try:
+        with open(snapshot_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception:
+        return None
+    
+    if data.get('version') != SNAPSHOT_VERSION:
+        return None
+    
+    snapshot = data.get('users', {}).get(user_id)
+    if not isinstance(snapshot, dict):
+        return None
+    
+    return {
+        'seasons': snapshot.get('seasons', {}),
+        'current_season': snapshot.get('current_season', ''),
+        'master_players': snapshot.get('master_players', []),
+        'saved_at': snapshot.get('saved_at', 0)
+    }
+
+def save_snapshot(user_id: str, seasons: Dict, current_season: str,
+                  master_players: Optional[List[str]] = None,
+                  snapshot_file: str = SNAPSHOT_FILE) -> bool:
+    """シーズン設定とプレイヤー一覧をスナップショットに保存"""
+    if not user_id:
+        return False
+    
+    try:
+        with _locked_snapshot(snapshot_file):
+            data = {'version': SNAPSHOT_VERSION, 'users': {}}
+            if os.path.exists(snapshot_file):
+                try:
+                    with open(snapshot_file, 'r', encoding='utf-8') as f:
+                        existing = json.load(f)
+                    if existing.get('version') == SNAPSHOT_VERSION:
+                        data['users'] = existing.get('users', {})
+                except Exception:
+                    pass
+            
+            previous = data['users'].get(user_id, {})
+            data['users'][user_id] = {
+                'seasons': seasons,
+                'current_season': current_season,
+                # プレイヤー一覧が未取得の場合は前回の値を維持
+                'master_players': master_players if master_players is not None else previous.get('master_players', []),
+                'saved_at': time.time()
+            }
+            
+            _replace_snapshot(snapshot_file, data)
+        return True
+    except Exception:
+        return False
+
+def _replace_snapshot(snapshot_file: str, data: Dict):
+    """途中で落ちても壊れないよう一時ファイル経由で置き換え"""
+    directory = os.path.dirname(os.path.abspath(snapshot_file))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.config_snapshot_', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, snapshot_file)
+    except Exception:
+        os.unlink(temp_path)
+        raise
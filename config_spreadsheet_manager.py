@@ -1,16 +1,79 @@
-# config_spreadsheet_manager.py - プレイヤーマスタ管理機能完全版
+# config_spreadsheet_manager.py - プレイヤーマスタ管理機能完全版（ユーザー別シート対応）
+import argparse
 import gspread
 from google.oauth2.service_account import Credentials
 from typing import Dict, List, Optional
 import streamlit as st
+import hashlib
 import json
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
 from datetime import datetime
+from perf_monitor import timed
+
+# プレイヤーマスタキャッシュの有効期間（秒）
+PLAYER_CACHE_TTL_SECONDS = 300
+
+# (設定スプレッドシートID, ユーザーID) -> {'loaded_at': 読込時刻, 'index': 正規化名 -> プレイヤー情報}
+# プロセス内の全セッションで共有する
+_player_cache: Dict[tuple, Dict] = {}
+_player_cache_lock = threading.Lock()
+
+# シーズン設定スナップショットの有効期間（秒）
+SEASON_CACHE_TTL_SECONDS = 300
+
+# シーズン設定シートの列構成
+SEASON_HEADERS = [
+    "user_id", "season_key", "season_name", "spreadsheet_id",
+    "spreadsheet_url", "is_current", "created_at", "updated_at"
+]
+
+# プレイヤーマスタシートの列構成
+PLAYER_HEADERS = ["user_id", "player_name", "created_at", "updated_at"]
+
+# ユーザーごとのシート割り当てを管理するインデックスシート
+USER_INDEX_SHEET_TITLE = 'ユーザーインデックス'
+USER_INDEX_HEADERS = ["user_id", "season_sheet", "player_sheet", "created_at"]
+
+# 旧レイアウト（全ユーザー共有）のプレイヤーマスタシート
+LEGACY_PLAYER_SHEET_TITLE = 'プレイヤーマスタ'
+
+# 旧レイアウトの行をユーザー専用シートへ移行済みとして記録する列（各シートの既存列の次に追加）
+LEGACY_MIGRATED_HEADER = "migrated_at"
+
+# is_current列で「現在のシーズン」とみなす値
+CURRENT_FLAG_VALUES = ("TRUE", "true", "True")
+
+# (設定スプレッドシートID, ユーザーID) -> {'loaded_at': 読込時刻, 'rows': season_key -> 行情報}
+_season_cache: Dict[tuple, Dict] = {}
+_season_cache_lock = threading.Lock()
+
+# (設定スプレッドシートID, ユーザーID) -> 検証済みのクライアントとワークシート
+_bootstrap_cache: Dict[tuple, Dict] = {}
+_bootstrap_lock = threading.Lock()
+_bootstrap_key_locks: Dict[tuple, threading.Lock] = {}
+
+def normalize_player_name(player_name: str) -> str:
+    """プレイヤー名を照合用に正規化（全角/半角の揺れと前後の空白を吸収）"""
+    return unicodedata.normalize('NFKC', str(player_name)).strip()
+
+def parse_updated_start_row(response: Dict) -> Optional[int]:
+    """append系APIの応答から書き込まれた先頭行番号を取得"""
+    updated_range = (response or {}).get('updates', {}).get('updatedRange', '')
+    match = re.search(r'![A-Z]+(\d+)', updated_range)
+    return int(match.group(1)) if match else None
 
 class ConfigSpreadsheetManager:
-    """設定用スプレッドシート管理クラス（プレイヤーマスタ対応）"""
+    """設定用スプレッドシート管理クラス（プレイヤーマスタ・ユーザー別シート対応）"""
     
-    def __init__(self, credentials_dict: Dict = None):
+    def __init__(self, credentials_dict: Dict = None, error_sink: Optional[List[str]] = None):
         self.credentials_dict = credentials_dict
+        # エラーの通知先（Noneなら画面に表示、リストを渡すとそこに追加）
+        self.error_sink = error_sink
         self.client = None
         self.config_sheet = None
         self.player_sheet = None
@@ -24,86 +87,254 @@ class ConfigSpreadsheetManager:
             'https://www.googleapis.com/auth/drive'
         ]
     
+    def _report_error(self, message: str):
+        """エラーを画面に表示（スクリプト外のスレッドで実行する場合は呼び出し元に返すため記録）"""
+        if self.error_sink is not None:
+            self.error_sink.append(message)
+        else:
+            st.error(message)
+    
+    def _bootstrap_key(self) -> tuple:
+        """接続ブートストラップのキャッシュキー"""
+        return (self.config_spreadsheet_id, self.get_user_id())
+    
+    @timed('sheets.config_connect', 'sheets')
     def connect(self) -> bool:
-        """設定用スプレッドシートに接続"""
+        """設定用スプレッドシートに接続（スキーマ検証はプロセスごとに1回）"""
         try:
             if not self.credentials_dict:
                 return False
-                
-            # サービスアカウント認証情報から認証オブジェクト作成
-            credentials = Credentials.from_service_account_info(
-                self.credentials_dict,
-                scopes=self.scopes
-            )
-            
-            # gspreadクライアント初期化
-            self.client = gspread.authorize(credentials)
-            
-            # 設定用スプレッドシートを開く
-            spreadsheet = self.client.open_by_key(self.config_spreadsheet_id)
-            
-            # シーズン設定シート（既存）
-            self.config_sheet = spreadsheet.sheet1
-            
-            # プレイヤーマスタシートを取得または作成
-            try:
-                self.player_sheet = spreadsheet.worksheet('プレイヤーマスタ')
-            except gspread.WorksheetNotFound:
-                # プレイヤーマスタシートが存在しない場合は作成
-                self.player_sheet = spreadsheet.add_worksheet(title='プレイヤーマスタ', rows=1000, cols=5)
-                self._initialize_player_sheet()
-            
-            # 初回アクセス時にヘッダーを設定
-            self._initialize_headers()
             
-            return True
+            with _bootstrap_lock:
+                key_lock = _bootstrap_key_locks.setdefault(self._bootstrap_key(), threading.Lock())
+            
+            # 同じユーザーの初期化は直列化（並行して呼ばれた場合は先の結果を再利用）
+            with key_lock:
+                # 検証済みのワークシートハンドルがあれば再利用
+                with _bootstrap_lock:
+                    handles = _bootstrap_cache.get(self._bootstrap_key())
+                if handles:
+                    self.client = handles['client']
+                    self.config_sheet = handles['config_sheet']
+                    self.player_sheet = handles['player_sheet']
+                    return True
+                
+                # サービスアカウント認証情報から認証オブジェクト作成
+                credentials = Credentials.from_service_account_info(
+                    self.credentials_dict,
+                    scopes=self.scopes
+                )
+                
+                # gspreadクライアント初期化
+                self.client = gspread.authorize(credentials)
+                
+                # 設定用スプレッドシートを開く
+                spreadsheet = self.client.open_by_key(self.config_spreadsheet_id)
+                worksheets = spreadsheet.worksheets()
+                
+                # ユーザー専用のシーズン設定・プレイヤーマスタシートを取得（なければ作成して移行）
+                self.config_sheet, self.player_sheet = self._resolve_user_partition(
+                    spreadsheet, worksheets, self.get_user_id()
+                )
+                
+                # ヘッダーを検証（必要なら設定）
+                if not self._initialize_headers():
+                    return False
+                
+                with _bootstrap_lock:
+                    _bootstrap_cache[self._bootstrap_key()] = {
+                        'client': self.client,
+                        'config_sheet': self.config_sheet,
+                        'player_sheet': self.player_sheet
+                    }
+                
+                return True
             
         except Exception as e:
-            st.error(f"設定スプレッドシート接続エラー: {e}")
+            self._report_error(f"設定スプレッドシート接続エラー: {e}")
             return False
     
-    def _initialize_headers(self) -> bool:
-        """設定スプレッドシートのヘッダーを初期化"""
+    def _partition_titles(self, user_id: str) -> tuple:
+        """ユーザー専用ワークシートのタイトル（シーズン設定, プレイヤーマスタ）"""
+        digest = hashlib.sha1(user_id.encode('utf-8')).hexdigest()[:12]
+        return f"シーズン設定_{digest}", f"プレイヤーマスタ_{digest}"
+    
+    def _get_index_sheet(self, spreadsheet, worksheets: List):
+        """ユーザーインデックスシートを取得または作成"""
+        for worksheet in worksheets:
+            if worksheet.title == USER_INDEX_SHEET_TITLE:
+                return worksheet
+        
+        index_sheet = spreadsheet.add_worksheet(
+            title=USER_INDEX_SHEET_TITLE, rows=100, cols=len(USER_INDEX_HEADERS)
+        )
+        index_sheet.append_row(USER_INDEX_HEADERS)
+        return index_sheet
+    
+    def _resolve_user_partition(self, spreadsheet, worksheets: List, user_id: str) -> tuple:
+        """インデックスからユーザー専用シートを解決（未作成なら作成して既存データを移行）"""
+        by_title = {worksheet.title: worksheet for worksheet in worksheets}
+        index_sheet = self._get_index_sheet(spreadsheet, worksheets)
+        
+        for row in index_sheet.get_all_values()[1:]:
+            if len(row) >= 3 and row[0] == user_id and row[1] in by_title and row[2] in by_title:
+                return by_title[row[1]], by_title[row[2]]
+        
+        return self._create_user_partition(spreadsheet, worksheets, index_sheet, user_id)
+    
+    def _create_user_partition(self, spreadsheet, worksheets: List, index_sheet, user_id: str) -> tuple:
+        """ユーザー専用シートを作成し、共有シートにある既存の行をコピー"""
+        by_title = {worksheet.title: worksheet for worksheet in worksheets}
+        season_title, player_title = self._partition_titles(user_id)
+        
+        season_sheet = by_title.get(season_title)
+        if season_sheet is None:
+            season_sheet = spreadsheet.add_worksheet(title=season_title, rows=100, cols=len(SEASON_HEADERS))
+            season_sheet.append_row(SEASON_HEADERS)
+        
+        player_sheet = by_title.get(player_title)
+        if player_sheet is None:
+            player_sheet = spreadsheet.add_worksheet(title=player_title, rows=1000, cols=len(PLAYER_HEADERS))
+            player_sheet.append_row(PLAYER_HEADERS)
+        
+        # 旧レイアウト（全ユーザー共有シート）からこのユーザーの行を移行
+        self._copy_legacy_rows(worksheets, season_sheet, player_sheet, user_id)
+        
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        index_sheet.append_row([user_id, season_title, player_title, current_time])
+        
+        return season_sheet, player_sheet
+    
+    @staticmethod
+    def _is_legacy_sheet(worksheet) -> bool:
+        """旧レイアウトの共有シートか（ユーザー専用シート・インデックスシートは除く）"""
+        if worksheet is None or worksheet.title == USER_INDEX_SHEET_TITLE:
+            return False
+        return not worksheet.title.startswith(("シーズン設定_", "プレイヤーマスタ_"))
+    
+    def _legacy_sheets(self, worksheets: List, season_sheet=None, player_sheet=None) -> List[tuple]:
+        """旧レイアウトの共有シートと移行先シートの組（旧シート, 移行先, 列数）"""
+        by_title = {worksheet.title: worksheet for worksheet in worksheets}
+        pairs = [
+            (worksheets[0] if worksheets else None, season_sheet, len(SEASON_HEADERS)),
+            (by_title.get(LEGACY_PLAYER_SHEET_TITLE), player_sheet, len(PLAYER_HEADERS))
+        ]
+        return [pair for pair in pairs if self._is_legacy_sheet(pair[0])]
+    
+    def _copy_legacy_rows(self, worksheets: List, season_sheet, player_sheet, user_id: str) -> int:
+        """共有シートにあるユーザーの未移行の行をコピーし、元の行に移行日時を記録"""
+        copied = 0
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        for legacy_sheet, partition_sheet, width in self._legacy_sheets(worksheets, season_sheet, player_sheet):
+            all_values = legacy_sheet.get_all_values()
+            rows = []
+            marks = []
+            for row_number, row in enumerate(all_values[1:], start=2):
+                already_migrated = len(row) > width and row[width]
+                if row and row[0] == user_id and not already_migrated:
+                    rows.append((row + [''] * width)[:width])
+                    marks.append({
+                        'range': gspread.utils.rowcol_to_a1(row_number, width + 1),
+                        'values': [[current_time]]
+                    })
+            if not rows:
+                continue
+            
+            partition_sheet.append_rows(rows, insert_data_option='INSERT_ROWS')
+            
+            # 同じ行を再度コピーしないよう、移行済みの印を元の行に付ける
+            headers = all_values[0] if all_values else []
+            if len(headers) <= width or headers[width] != LEGACY_MIGRATED_HEADER:
+                marks.append({
+                    'range': gspread.utils.rowcol_to_a1(1, width + 1),
+                    'values': [[LEGACY_MIGRATED_HEADER]]
+                })
+            if legacy_sheet.col_count <= width:
+                legacy_sheet.add_cols(1)
+            legacy_sheet.batch_update(marks)
+            copied += len(rows)
+        
+        return copied
+    
+    def migrate_all_users(self) -> List[str]:
+        """共有シートに未移行の行があるユーザーをユーザー専用シートへ移行（移行したユーザーIDを返す）"""
         try:
-            # 既存のヘッダーをチェック
-            existing_headers = self.config_sheet.row_values(1)
-            
-            if not existing_headers or len(existing_headers) < 7:
-                # ヘッダー行を設定
-                headers = [
-                    "user_id",           # ユーザーID（サービスアカウントのemail）
-                    "season_key",        # シーズンキー
-                    "season_name",       # シーズン名
-                    "spreadsheet_id",    # スプレッドシートID
-                    "spreadsheet_url",   # スプレッドシートURL
-                    "is_current",        # 現在のシーズンかどうか
-                    "created_at",        # 作成日時
-                    "updated_at"         # 更新日時
-                ]
-                self.config_sheet.clear()
-                self.config_sheet.append_row(headers)
-                
-            return True
+            if not self.client:
+                if not self.connect():
+                    return []
+            return self._migrate_all_users()
             
         except Exception as e:
-            st.error(f"設定ヘッダー初期化エラー: {e}")
-            return False
+            self._report_error(f"設定データ移行エラー: {e}")
+            return []
     
-    def _initialize_player_sheet(self) -> bool:
-        """プレイヤーマスタシートのヘッダーを初期化"""
+    def _migrate_all_users(self) -> List[str]:
+        """全ユーザーの移行処理（失敗時は例外）"""
+        spreadsheet = self.client.open_by_key(self.config_spreadsheet_id)
+        worksheets = spreadsheet.worksheets()
+        by_title = {worksheet.title: worksheet for worksheet in worksheets}
+        index_sheet = self._get_index_sheet(spreadsheet, worksheets)
+        
+        partitions = {
+            row[0]: (by_title[row[1]], by_title[row[2]])
+            for row in index_sheet.get_all_values()[1:]
+            if len(row) >= 3 and row[1] in by_title and row[2] in by_title
+        }
+        
+        # 移行済みの印がない行を持つユーザーを抽出
+        legacy_users = []
+        for legacy_sheet, _, width in self._legacy_sheets(worksheets):
+            for row in legacy_sheet.get_all_values()[1:]:
+                already_migrated = len(row) > width and row[width]
+                if row and row[0] and not already_migrated and row[0] not in legacy_users:
+                    legacy_users.append(row[0])
+        
+        for user_id in legacy_users:
+            if user_id in partitions:
+                # 専用シートの作成後に共有シートへ追加された行だけをコピー
+                season_sheet, player_sheet = partitions[user_id]
+                self._copy_legacy_rows(worksheets, season_sheet, player_sheet, user_id)
+            else:
+                self._create_user_partition(spreadsheet, worksheets, index_sheet, user_id)
+                # 新しく作成したシートも以降の解決対象に含める
+                worksheets = spreadsheet.worksheets()
+            
+            # 移行したユーザーのキャッシュは次回読み込み時に作り直す
+            with _player_cache_lock:
+                _player_cache.pop((self.config_spreadsheet_id, user_id), None)
+            with _season_cache_lock:
+                _season_cache.pop((self.config_spreadsheet_id, user_id), None)
+        
+        return legacy_users
+    
+    def _reset_bootstrap(self):
+        """エラー発生時にブートストラップを破棄し、次回接続時に再検証させる"""
+        with _bootstrap_lock:
+            _bootstrap_cache.pop(self._bootstrap_key(), None)
+    
+    def _initialize_headers(self) -> bool:
+        """シーズン設定・プレイヤーマスタシートのヘッダー行を検証（不足していればヘッダー行だけを書き込む）"""
         try:
-            headers = [
-                "user_id",           # ユーザーID（サービスアカウントのemail）
-                "player_name",       # プレイヤー名
-                "created_at",        # 作成日時
-                "updated_at"         # 更新日時
-            ]
-            self.player_sheet.clear()
-            self.player_sheet.append_row(headers)
+            # 移行中の行を消さないよう、シートのクリアはせずヘッダー行だけを書き込む
+            for sheet, headers in ((self.config_sheet, SEASON_HEADERS), (self.player_sheet, PLAYER_HEADERS)):
+                existing_headers = sheet.row_values(1)
+                if existing_headers[:len(headers)] == headers:
+                    continue
+                if not existing_headers or existing_headers[0] == headers[0]:
+                    # 空または列が不足したヘッダー行は上書き
+                    sheet.batch_update([{
+                        'range': f"A1:{gspread.utils.rowcol_to_a1(1, len(headers))}",
+                        'values': [headers]
+                    }])
+                else:
+                    # 1行目がデータ行の場合はその上にヘッダー行を挿入
+                    sheet.insert_row(headers, 1)
+            
             return True
             
         except Exception as e:
-            st.error(f"プレイヤーシートヘッダー初期化エラー: {e}")
+            self._report_error(f"設定ヘッダー初期化エラー: {e}")
             return False
     
     def get_user_id(self) -> str:
@@ -112,6 +343,90 @@ class ConfigSpreadsheetManager:
             return self.credentials_dict.get('client_email', 'unknown')
         return 'unknown'
     
+    def _player_cache_key(self) -> tuple:
+        """プレイヤーマスタキャッシュのキー"""
+        return (self.config_spreadsheet_id, self.get_user_id())
+    
+    @timed('sheets.player_master', 'sheets')
+    def _get_player_index(self, force_reload: bool = False) -> Dict[str, Dict]:
+        """正規化名 -> プレイヤー情報（行番号付き）の索引を取得（TTLキャッシュ）"""
+        cache_key = self._player_cache_key()
+        now = time.time()
+        
+        if not force_reload:
+            with _player_cache_lock:
+                cached = _player_cache.get(cache_key)
+            if cached and now - cached['loaded_at'] < PLAYER_CACHE_TTL_SECONDS:
+                return cached['index']
+        
+        if not self.player_sheet:
+            if not self.connect():
+                return {}
+        
+        # シート全体を1回だけ読み込み、行番号付きで索引化
+        all_values = self.player_sheet.get_all_values()
+        headers = all_values[0] if all_values else []
+        positions = {header: i for i, header in enumerate(headers)}
+        user_id = self.get_user_id()
+        
+        def cell(row, header):
+            col_idx = positions.get(header)
+            return row[col_idx] if col_idx is not None and col_idx < len(row) else ''
+        
+        index = {}
+        for row_number, row in enumerate(all_values[1:], start=2):
+            player_name = cell(row, 'player_name')
+            if cell(row, 'user_id') == user_id and player_name:
+                index[normalize_player_name(player_name)] = {
+                    'name': player_name,
+                    'row': row_number,
+                    'created_at': cell(row, 'created_at'),
+                    'updated_at': cell(row, 'updated_at')
+                }
+        
+        with _player_cache_lock:
+            _player_cache[cache_key] = {'loaded_at': now, 'index': index}
+        return index
+    
+    def invalidate_player_cache(self):
+        """このユーザーのプレイヤーマスタキャッシュを破棄"""
+        with _player_cache_lock:
+            _player_cache.pop(self._player_cache_key(), None)
+    
+    def _verify_player_row(self, entry: Dict) -> bool:
+        """キャッシュ上の行番号が実シートでも同じプレイヤーか確認"""
+        row = self.player_sheet.row_values(entry['row'])
+        return len(row) >= 2 and row[0] == self.get_user_id() and row[1] == entry['name']
+    
+    def _find_player_entry(self, player_name: str) -> Optional[Dict]:
+        """実シートの行と照合済みのプレイヤー情報を取得（ずれていれば再読み込み）"""
+        key = normalize_player_name(player_name)
+        entry = self._get_player_index().get(key)
+        if entry and self._verify_player_row(entry):
+            return entry
+        
+        # 他の書き込みで行がずれた可能性があるため読み直す
+        entry = self._get_player_index(force_reload=True).get(key)
+        return entry
+    
+    def _index_appended_players(self, response: Dict, player_names: List[str], current_time: str):
+        """追加した行をキャッシュの索引に反映（行番号が分からなければ破棄）"""
+        first_row = parse_updated_start_row(response)
+        with _player_cache_lock:
+            cached = _player_cache.get(self._player_cache_key())
+            if not cached:
+                return
+            if first_row is None:
+                del _player_cache[self._player_cache_key()]
+                return
+            for offset, player_name in enumerate(player_names):
+                cached['index'][normalize_player_name(player_name)] = {
+                    'name': player_name,
+                    'row': first_row + offset,
+                    'created_at': current_time,
+                    'updated_at': current_time
+                }
+    
     def add_player(self, player_name: str) -> bool:
         """プレイヤーをマスタリストに追加"""
         try:
@@ -122,12 +437,9 @@ class ConfigSpreadsheetManager:
             user_id = self.get_user_id()
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            # 既存チェック
-            all_records = self.player_sheet.get_all_records()
-            for record in all_records:
-                if (record.get('user_id') == user_id and 
-                    record.get('player_name') == player_name):
-                    return False  # 既に存在する
+            # 既存チェック（索引を参照）
+            if normalize_player_name(player_name) in self._get_player_index():
+                return False  # 既に存在する
             
             # 新しいプレイヤーを追加
             new_row_data = [
@@ -137,57 +449,81 @@ class ConfigSpreadsheetManager:
                 current_time
             ]
             
-            self.player_sheet.append_row(new_row_data)
+            response = self.player_sheet.append_row(new_row_data, insert_data_option='INSERT_ROWS')
+            self._index_appended_players(response, [player_name], current_time)
             return True
             
         except Exception as e:
-            st.error(f"プレイヤー追加エラー: {e}")
+            self._reset_bootstrap()
+            self._report_error(f"プレイヤー追加エラー: {e}")
             return False
     
-    def delete_player(self, player_name: str) -> bool:
-        """プレイヤーをマスタリストから削除"""
+    def add_players(self, player_names: List[str]) -> List[str]:
+        """複数のプレイヤーを1回の書き込みでマスタリストに追加"""
         try:
             if not self.player_sheet:
                 if not self.connect():
-                    return False
+                    return []
             
             user_id = self.get_user_id()
-            all_records = self.player_sheet.get_all_records()
+            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            for i, record in enumerate(all_records):
-                if (record.get('user_id') == user_id and 
-                    record.get('player_name') == player_name):
-                    row_index = i + 2  # ヘッダー行を考慮
-                    self.player_sheet.delete_rows(row_index)
-                    return True
+            # 既存チェック（索引を参照）
+            index = self._get_player_index()
             
-            return False
+            new_players = []
+            new_keys = set()
+            for player_name in player_names:
+                name = player_name.strip()
+                key = normalize_player_name(name)
+                if name and key not in index and key not in new_keys:
+                    new_players.append(name)
+                    new_keys.add(key)
+            
+            if new_players:
+                rows = [[user_id, name, current_time, current_time] for name in new_players]
+                response = self.player_sheet.append_rows(rows, insert_data_option='INSERT_ROWS')
+                self._index_appended_players(response, new_players, current_time)
+            
+            return new_players
             
         except Exception as e:
-            st.error(f"プレイヤー削除エラー: {e}")
-            return False
+            self._reset_bootstrap()
+            self._report_error(f"プレイヤー一括追加エラー: {e}")
+            return []
     
-    def get_all_players(self) -> List[str]:
-        """ユーザーの全プレイヤーリストを取得"""
+    def delete_player(self, player_name: str) -> bool:
+        """プレイヤーをマスタリストから削除"""
         try:
             if not self.player_sheet:
                 if not self.connect():
-                    return []
+                    return False
             
-            user_id = self.get_user_id()
-            all_records = self.player_sheet.get_all_records()
+            entry = self._find_player_entry(player_name)
+            if not entry:
+                return False
             
-            players = []
-            for record in all_records:
-                if record.get('user_id') == user_id:
-                    player_name = record.get('player_name')
-                    if player_name:
-                        players.append(player_name)
+            self.player_sheet.delete_rows(entry['row'])
             
-            return sorted(players)
+            # 行番号がずれるためキャッシュを破棄
+            self.invalidate_player_cache()
+            return True
             
         except Exception as e:
-            st.error(f"プレイヤーリスト取得エラー: {e}")
+            self._reset_bootstrap()
+            self.invalidate_player_cache()
+            self._report_error(f"プレイヤー削除エラー: {e}")
+            return False
+    
+    def get_all_players(self) -> List[str]:
+        """ユーザーの全プレイヤーリストを取得"""
+        try:
+            index = self._get_player_index()
+            return sorted(entry['name'] for entry in index.values())
+            
+        except Exception as e:
+            self._reset_bootstrap()
+            self._report_error(f"プレイヤーリスト取得エラー: {e}")
             return []
     
     def update_player(self, old_name: str, new_name: str) -> bool:
@@ -197,74 +533,198 @@ class ConfigSpreadsheetManager:
                 if not self.connect():
                     return False
             
-            user_id = self.get_user_id()
-            all_records = self.player_sheet.get_all_records()
+            entry = self._find_player_entry(old_name)
+            if not entry:
+                return False
             
-            for i, record in enumerate(all_records):
-                if (record.get('user_id') == user_id and 
-                    record.get('player_name') == old_name):
-                    row_index = i + 2  # ヘッダー行を考慮
-                    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    # プレイヤー名と更新日時を更新
-                    self.player_sheet.update_cell(row_index, 2, new_name)      # player_name列
-                    self.player_sheet.update_cell(row_index, 4, current_time)  # updated_at列
-                    
-                    return True
+            row_index = entry['row']
+            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            return False
+            # プレイヤー名（B列）と更新日時（D列）を1回の呼び出しで更新
+            self.player_sheet.batch_update([
+                {'range': f"B{row_index}", 'values': [[new_name]]},
+                {'range': f"D{row_index}", 'values': [[current_time]]}
+            ])
+            
+            # 索引のキーを差し替え
+            with _player_cache_lock:
+                cached = _player_cache.get(self._player_cache_key())
+                if cached:
+                    cached['index'].pop(normalize_player_name(old_name), None)
+                    cached['index'][normalize_player_name(new_name)] = dict(
+                        entry, name=new_name, updated_at=current_time
+                    )
+            
+            return True
             
         except Exception as e:
-            st.error(f"プレイヤー更新エラー: {e}")
+            self._reset_bootstrap()
+            self.invalidate_player_cache()
+            self._report_error(f"プレイヤー更新エラー: {e}")
             return False
     
     def player_exists(self, player_name: str) -> bool:
         """プレイヤーが存在するかチェック"""
         try:
-            if not self.player_sheet:
-                if not self.connect():
-                    return False
-            
-            user_id = self.get_user_id()
-            all_records = self.player_sheet.get_all_records()
-            
-            for record in all_records:
-                if (record.get('user_id') == user_id and 
-                    record.get('player_name') == player_name):
-                    return True
-            
-            return False
+            return normalize_player_name(player_name) in self._get_player_index()
             
         except Exception as e:
-            st.error(f"プレイヤー存在チェックエラー: {e}")
+            self._reset_bootstrap()
+            self._report_error(f"プレイヤー存在チェックエラー: {e}")
             return False
     
     def get_player_info(self, player_name: str) -> Optional[Dict]:
         """プレイヤー情報を取得"""
         try:
-            if not self.player_sheet:
-                if not self.connect():
-                    return None
+            entry = self._get_player_index().get(normalize_player_name(player_name))
+            if not entry:
+                return None
             
-            user_id = self.get_user_id()
-            all_records = self.player_sheet.get_all_records()
-            
-            for record in all_records:
-                if (record.get('user_id') == user_id and 
-                    record.get('player_name') == player_name):
-                    return {
-                        'name': record.get('player_name'),
-                        'created_at': record.get('created_at'),
-                        'updated_at': record.get('updated_at')
-                    }
+            return {
+                'name': entry['name'],
+                'created_at': entry['created_at'],
+                'updated_at': entry['updated_at']
+            }
             
+        except Exception as e:
+            self._reset_bootstrap()
+            self._report_error(f"プレイヤー情報取得エラー: {e}")
             return None
+    
+    # シーズン管理メソッド（キャッシュしたシートのスナップショットから更新を計画）
+    def _season_cache_key(self) -> tuple:
+        """シーズン設定スナップショットのキャッシュキー"""
+        return (self.config_spreadsheet_id, self.get_user_id())
+    
+    @timed('sheets.config_seasons', 'sheets')
+    def _get_season_snapshot(self, force_reload: bool = False) -> Dict[str, Dict]:
+        """season_key -> {'row': 行番号, 'values': 行の値} のスナップショットを取得（TTLキャッシュ）"""
+        cache_key = self._season_cache_key()
+        now = time.time()
+        
+        if not force_reload:
+            with _season_cache_lock:
+                cached = _season_cache.get(cache_key)
+            if cached and now - cached['loaded_at'] < SEASON_CACHE_TTL_SECONDS:
+                return cached['rows']
+        
+        if not self.config_sheet:
+            if not self.connect():
+                return {}
+        
+        all_values = self.config_sheet.get_all_values()
+        user_id = self.get_user_id()
+        
+        rows = {}
+        for row_number, row in enumerate(all_values[1:], start=2):
+            values = (row + [''] * len(SEASON_HEADERS))[:len(SEASON_HEADERS)]
+            if values[0] == user_id and values[1]:
+                rows[values[1]] = {'row': row_number, 'values': values}
+        
+        with _season_cache_lock:
+            _season_cache[cache_key] = {'loaded_at': now, 'rows': rows}
+        return rows
+    
+    def invalidate_season_cache(self):
+        """このユーザーのシーズン設定スナップショットを破棄"""
+        with _season_cache_lock:
+            _season_cache.pop(self._season_cache_key(), None)
+    
+    def _verify_season_rows(self, snapshot: Dict[str, Dict], season_keys: List[str]) -> bool:
+        """更新予定の行が実シートでも同じシーズンか1回の読み取りで確認"""
+        if not season_keys:
+            return True
+        
+        ranges = [f"A{snapshot[key]['row']}:B{snapshot[key]['row']}" for key in season_keys]
+        results = self.config_sheet.batch_get(ranges)
+        user_id = self.get_user_id()
+        
+        for key, result in zip(season_keys, results):
+            row = result[0] if result else []
+            if len(row) < 2 or row[0] != user_id or row[1] != key:
+                return False
+        return True
+    
+    def _apply_season_plan(self, planned_rows: Dict[str, List], new_rows: List[List]) -> bool:
+        """計画した行の更新と追加をまとめて書き込み（行がずれていれば計画し直し）"""
+        snapshot = self._get_season_snapshot()
+        
+        if planned_rows and not self._verify_season_rows(snapshot, list(planned_rows.keys())):
+            # 他の書き込みで行がずれているので、最新の行番号で書き直す
+            snapshot = self._get_season_snapshot(force_reload=True)
+            planned_rows = {key: values for key, values in planned_rows.items() if key in snapshot}
+        
+        if planned_rows:
+            self.config_sheet.batch_update([
+                {
+                    'range': f"A{snapshot[key]['row']}:H{snapshot[key]['row']}",
+                    'values': [values]
+                }
+                for key, values in planned_rows.items()
+            ])
+            with _season_cache_lock:
+                for key, values in planned_rows.items():
+                    snapshot[key]['values'] = values
+        
+        if new_rows:
+            self.config_sheet.append_rows(new_rows, insert_data_option='INSERT_ROWS')
+            self.invalidate_season_cache()
+        
+        return True
+    
+    def _plan_season_rows(self, seasons: Dict[str, Dict], current_season: Optional[str]) -> tuple:
+        """保存したいシーズン情報とスナップショットの差分から書き込み内容を計画"""
+        snapshot = self._get_season_snapshot()
+        user_id = self.get_user_id()
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        planned_rows = {}
+        new_rows = []
+        
+        for season_key, season_info in seasons.items():
+            is_current = "TRUE" if season_key == current_season else "FALSE"
+            existing = snapshot.get(season_key)
+            
+            desired = [
+                user_id,
+                season_key,
+                season_info.get('name', season_key),
+                season_info.get('spreadsheet_id', ''),
+                season_info.get('url', ''),
+                is_current
+            ]
+            
+            if existing:
+                if [str(value) for value in existing['values'][:6]] != [str(value) for value in desired]:
+                    planned_rows[season_key] = desired + [existing['values'][6] or current_time, current_time]
+            else:
+                new_rows.append(desired + [current_time, current_time])
+        
+        # 保存対象外のシーズンの current フラグも外す
+        if current_season is not None:
+            for season_key, existing in snapshot.items():
+                if (season_key not in seasons and season_key != current_season and
+                    existing['values'][5] in CURRENT_FLAG_VALUES):
+                    planned_rows[season_key] = existing['values'][:5] + ["FALSE", existing['values'][6], current_time]
+        
+        return planned_rows, new_rows
+    
+    def save_season_configs(self, seasons: Dict[str, Dict], current_season: str) -> bool:
+        """複数シーズンの設定を差分のみ1回の一括更新で保存"""
+        try:
+            if not self.config_sheet:
+                if not self.connect():
+                    return False
+            
+            planned_rows, new_rows = self._plan_season_rows(seasons, current_season)
+            return self._apply_season_plan(planned_rows, new_rows)
             
         except Exception as e:
-            st.error(f"プレイヤー情報取得エラー: {e}")
-            return None
+            self._reset_bootstrap()
+            self.invalidate_season_cache()
+            self._report_error(f"シーズン設定保存エラー: {e}")
+            return False
     
-    # 既存のシーズン管理メソッド
     def save_season_config(self, season_key: str, season_name: str, 
                           spreadsheet_id: str, spreadsheet_url: str, 
                           is_current: bool = False) -> bool:
@@ -274,92 +734,65 @@ class ConfigSpreadsheetManager:
                 if not self.connect():
                     return False
             
-            user_id = self.get_user_id()
-            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # 既存の記録をチェック
-            all_records = self.config_sheet.get_all_records()
-            existing_row = None
-            row_index = None
-            
-            for i, record in enumerate(all_records):
-                if (record.get('user_id') == user_id and 
-                    record.get('season_key') == season_key):
-                    existing_row = record
-                    row_index = i + 2  # ヘッダー行を考慮
-                    break
+            season_info = {
+                'name': season_name,
+                'spreadsheet_id': spreadsheet_id,
+                'url': spreadsheet_url
+            }
             
-            # 現在のシーズンに設定する場合は、他のシーズンの current フラグを削除
+            # 現在のシーズンに設定する場合は、他のシーズンの current フラグも同じ書き込みで外す
             if is_current:
-                self._unset_current_seasons(user_id)
-            
-            new_row_data = [
-                user_id,
-                season_key,
-                season_name,
-                spreadsheet_id,
-                spreadsheet_url,
-                "TRUE" if is_current else "FALSE",
-                existing_row.get('created_at', current_time) if existing_row else current_time,
-                current_time
-            ]
-            
-            if existing_row and row_index:
-                # 既存の記録を更新
-                for col, value in enumerate(new_row_data, 1):
-                    self.config_sheet.update_cell(row_index, col, value)
+                planned_rows, new_rows = self._plan_season_rows({season_key: season_info}, season_key)
             else:
-                # 新しい記録を追加
-                self.config_sheet.append_row(new_row_data)
+                planned_rows, new_rows = self._plan_season_rows({season_key: season_info}, None)
             
-            return True
+            return self._apply_season_plan(planned_rows, new_rows)
             
         except Exception as e:
-            st.error(f"シーズン設定保存エラー: {e}")
+            self._reset_bootstrap()
+            self.invalidate_season_cache()
+            self._report_error(f"シーズン設定保存エラー: {e}")
             return False
     
     def _unset_current_seasons(self, user_id: str):
         """指定ユーザーの全シーズンの current フラグを削除"""
         try:
-            all_records = self.config_sheet.get_all_records()
+            snapshot = self._get_season_snapshot()
+            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            for i, record in enumerate(all_records):
-                if (record.get('user_id') == user_id and 
-                    record.get('is_current') == True):
-                    row_index = i + 2  # ヘッダー行を考慮
-                    self.config_sheet.update_cell(row_index, 6, "FALSE")  # is_current列
+            planned_rows = {
+                season_key: existing['values'][:5] + ["FALSE", existing['values'][6], current_time]
+                for season_key, existing in snapshot.items()
+                if existing['values'][5] in CURRENT_FLAG_VALUES
+            }
+            self._apply_season_plan(planned_rows, [])
                     
         except Exception as e:
-            st.error(f"current フラグ削除エラー: {e}")
+            self._reset_bootstrap()
+            self.invalidate_season_cache()
+            self._report_error(f"current フラグ削除エラー: {e}")
     
     def load_user_seasons(self) -> Dict:
         """ユーザーのシーズン設定を読み込み"""
         try:
-            if not self.config_sheet:
-                if not self.connect():
-                    return {}
-            
-            user_id = self.get_user_id()
-            all_records = self.config_sheet.get_all_records()
+            snapshot = self._get_season_snapshot()
             
             seasons = {}
             current_season = ""
             
-            for record in all_records:
-                if record.get('user_id') == user_id:
-                    season_key = record.get('season_key')
-                    if season_key:
-                        seasons[season_key] = {
-                            'name': record.get('season_name', season_key),
-                            'spreadsheet_id': record.get('spreadsheet_id', ''),
-                            'url': record.get('spreadsheet_url', ''),
-                            'created_at': record.get('created_at', ''),
-                            'updated_at': record.get('updated_at', '')
-                        }
-                        
-                        # 現在のシーズンをチェック
-                        if record.get('is_current') in [True, 'TRUE', 'true']:
-                            current_season = season_key
+            for season_key, existing in snapshot.items():
+                values = existing['values']
+                seasons[season_key] = {
+                    'name': values[2] or season_key,
+                    'spreadsheet_id': values[3],
+                    'url': values[4],
+                    'created_at': values[6],
+                    'updated_at': values[7]
+                }
+                
+                # 現在のシーズンをチェック
+                if values[5] in CURRENT_FLAG_VALUES:
+                    current_season = season_key
             
             return {
                 'seasons': seasons,
@@ -367,38 +800,39 @@ class ConfigSpreadsheetManager:
             }
             
         except Exception as e:
-            st.error(f"シーズン設定読み込みエラー: {e}")
+            self._reset_bootstrap()
+            self._report_error(f"シーズン設定読み込みエラー: {e}")
             return {}
     
     def set_current_season(self, season_key: str) -> bool:
-        """現在のシーズンを設定"""
+        """現在のシーズンを設定（フラグの付け替えを1回の一括更新で実行）"""
         try:
             if not self.config_sheet:
                 if not self.connect():
                     return False
             
-            user_id = self.get_user_id()
+            snapshot = self._get_season_snapshot()
+            if season_key not in snapshot:
+                return False
             
-            # まず全ての current フラグを削除
-            self._unset_current_seasons(user_id)
+            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            planned_rows = {}
             
-            # 指定されたシーズンを current に設定
-            all_records = self.config_sheet.get_all_records()
+            # 他の current フラグを外す
+            for key, existing in snapshot.items():
+                if key != season_key and existing['values'][5] in CURRENT_FLAG_VALUES:
+                    planned_rows[key] = existing['values'][:5] + ["FALSE", existing['values'][6], current_time]
             
-            for i, record in enumerate(all_records):
-                if (record.get('user_id') == user_id and 
-                    record.get('season_key') == season_key):
-                    row_index = i + 2  # ヘッダー行を考慮
-                    self.config_sheet.update_cell(row_index, 6, "TRUE")  # is_current列
-                    # 更新日時も更新
-                    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    self.config_sheet.update_cell(row_index, 8, current_time)  # updated_at列
-                    return True
+            # 指定されたシーズンを current に設定（更新日時も更新）
+            target = snapshot[season_key]['values']
+            planned_rows[season_key] = target[:5] + ["TRUE", target[6], current_time]
             
-            return False
+            return self._apply_season_plan(planned_rows, [])
             
         except Exception as e:
-            st.error(f"現在シーズン設定エラー: {e}")
+            self._reset_bootstrap()
+            self.invalidate_season_cache()
+            self._report_error(f"現在シーズン設定エラー: {e}")
             return False
     
     def delete_season(self, season_key: str) -> bool:
@@ -408,20 +842,25 @@ class ConfigSpreadsheetManager:
                 if not self.connect():
                     return False
             
-            user_id = self.get_user_id()
-            all_records = self.config_sheet.get_all_records()
+            snapshot = self._get_season_snapshot()
+            if season_key not in snapshot:
+                return False
             
-            for i, record in enumerate(all_records):
-                if (record.get('user_id') == user_id and 
-                    record.get('season_key') == season_key):
-                    row_index = i + 2  # ヘッダー行を考慮
-                    self.config_sheet.delete_rows(row_index)
-                    return True
+            if not self._verify_season_rows(snapshot, [season_key]):
+                snapshot = self._get_season_snapshot(force_reload=True)
+                if season_key not in snapshot:
+                    return False
             
-            return False
+            self.config_sheet.delete_rows(snapshot[season_key]['row'])
+            
+            # 行番号がずれるためスナップショットを破棄
+            self.invalidate_season_cache()
+            return True
             
         except Exception as e:
-            st.error(f"シーズン削除エラー: {e}")
+            self._reset_bootstrap()
+            self.invalidate_season_cache()
+            self._report_error(f"シーズン削除エラー: {e}")
             return False
     
     def get_season_info(self, season_key: str) -> Optional[Dict]:
@@ -431,7 +870,7 @@ class ConfigSpreadsheetManager:
             return user_seasons.get('seasons', {}).get(season_key)
             
         except Exception as e:
-            st.error(f"シーズン情報取得エラー: {e}")
+            self._report_error(f"シーズン情報取得エラー: {e}")
             return None
     
     def validate_connection(self) -> bool:
@@ -470,5 +909,38 @@ class ConfigSpreadsheetManager:
             }
             
         except Exception as e:
-            st.error(f"統計情報取得エラー: {e}")
-            return {}
\ No newline at end of file
+            self._report_error(f"統計情報取得エラー: {e}")
+            return {}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """共有シートに残っている旧レイアウトの設定を全ユーザー分ユーザー専用シートへ移行"""
+    parser = argparse.ArgumentParser(description="設定スプレッドシートの共有シートからユーザー専用シートへ移行")
+    parser.add_argument('command', choices=['migrate'], help="実行する処理")
+    parser.add_argument('--credentials', default=os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'),
+                        help="サービスアカウントのJSONファイル（既定: GOOGLE_APPLICATION_CREDENTIALS）")
+    args = parser.parse_args(argv)
+    
+    if not args.credentials or not os.path.exists(args.credentials):
+        print("--credentialsまたはGOOGLE_APPLICATION_CREDENTIALSでサービスアカウントのJSONファイルを指定してください", file=sys.stderr)
+        return 2
+    with open(args.credentials, 'r', encoding='utf-8') as f:
+        credentials_dict = json.load(f)
+    
+    manager = ConfigSpreadsheetManager(credentials_dict)
+    if not manager.connect():
+        print("設定スプレッドシートに接続できませんでした", file=sys.stderr)
+        return 1
+    
+    try:
+        migrated_users = manager._migrate_all_users()
+    except Exception as e:
+        print(f"設定データ移行エラー: {e}", file=sys.stderr)
+        return 1
+    
+    for user_id in migrated_users:
+        print(user_id)
+    print(f"{len(migrated_users)}ユーザーの設定を移行しました", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,13 @@
 # data_analyzer.py (新スコア対応版)
-import pandas as pd
 import plotly.graph_objects as go
-from typing import Dict, List
+from typing import Dict, List, Union
 from player_manager import PlayerManager
 
 class MahjongDataAnalyzer:
-    def __init__(self, game_records: List[Dict]):
+    def __init__(self, game_records: Union[List[Dict], Dict[str, list]]):
         self.records = game_records
-        self.df = pd.DataFrame(game_records) if game_records else pd.DataFrame()
         self.player_manager = PlayerManager(game_records)
+        self.df = self.player_manager.df
     
     def create_player_ranking_chart(self) -> go.Figure:
         all_players = self.player_manager.get_all_player_names()
@@ -34,14 +34,32 @@ def show_data_modal():
         # 不要な列を除外
         if 'timestamp' in display_df.columns:
             display_df = display_df.drop('timestamp', axis=1)
+        if 'game_id' in display_df.columns:
+            display_df = display_df.drop('game_id', axis=1)
         
         # データ表示
         st.dataframe(display_df, use_container_width=True, hide_index=True)
         
+        # 記録の削除（行の位置ではなくゲームIDで指定）
+        deletable_records = [record for record in st.session_state['game_records'] if record.get('game_id')]
+        if deletable_records:
+            with st.expander("記録を削除"):
+                record_labels = {record['game_id']: _record_label(record) for record in deletable_records}
+                game_id_to_delete = st.selectbox(
+                    "削除する記録",
+                    options=list(record_labels),
+                    format_func=record_labels.get,
+                    key="delete_record_select"
+                )
+                if st.button("削除実行", key="delete_record_btn"):
+                    from ui_components import delete_game_record
+                    if delete_game_record(game_id_to_delete):
+                        st.rerun()
+        
         # データ削除に関する説明
         with st.expander("データの編集・削除について"):
             st.markdown("""
-            **データの削除方法**:
+            **データの削除方法**（上の「記録を削除」からも削除できます）:
             1. Google Sheetsを直接開く（サイドバーのシーズン管理から確認可能）
             2. 削除したい行を選択して右クリック → 「行を削除」
             3. このアプリで「データ同期」ボタンを押して更新
@@ -80,12 +98,18 @@ def show_data_modal():
             st.session_state['show_data'] = False
             st.rerun()
 
+def _record_label(record) -> str:
+    """削除する記録の選択肢に表示する文字列（対局日時とプレイヤー名）"""
+    names = [str(record[f'player{i}_name']) for i in range(1, 5) if record.get(f'player{i}_name')]
+    return f"{record.get('date', '')} {record.get('time', '')}  {' / '.join(names)}"
+
 def show_statistics_modal():
     """統計表示モーダル（合計スコアランキング + 表で両方併記）"""
     st.subheader("統計分析")
     
     if 'game_records' in st.session_state and st.session_state['game_records']:
-        player_manager = PlayerManager(st.session_state['game_records'])
+        from ui_components import get_season_derived
+        player_manager = get_season_derived('player_manager', PlayerManager)
         
         # 基本統計
         total_games = len(st.session_state['game_records'])
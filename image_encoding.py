@@ -0,0 +1,191 @@
+# image_encoding.py - 解析用画像のエンコード（元画像の再利用・バリエーションごとに1回だけ変換）
+import base64
+import io
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from PIL import Image, ImageEnhance
+
+# Vision API用（OCR精度を優先して既定は可逆のPNG）
+VISION_IMAGE_FORMAT = os.environ.get('MAHJONG_VISION_IMAGE_FORMAT', 'PNG').upper()
+
+# GPT用（元画像をそのまま送れない場合のみ使用）
+GPT_IMAGE_FORMAT = os.environ.get('MAHJONG_GPT_IMAGE_FORMAT', 'JPEG').upper()
+
+# JPEG/WebPの品質
+IMAGE_QUALITY = int(os.environ.get('MAHJONG_IMAGE_QUALITY', '90'))
+
+# そのまま送信できる形式と上限サイズ
+PASSTHROUGH_MIME_TYPES = {'image/png', 'image/jpeg', 'image/webp'}
+MAX_PASSTHROUGH_BYTES = 20 * 1024 * 1024
+
+# Vision APIの認識精度のため、幅がこれより小さい画像は拡大
+VISION_MIN_WIDTH = 1000
+
+# Vision APIに送る画像の最大幅（これより大きい画像は縮小）
+VISION_MAX_WIDTH = int(os.environ.get('MAHJONG_VISION_MAX_WIDTH', '1600'))
+
+# 切り出した結果パネルをGPTに送る際の最大幅（画像トークン数の削減）
+GPT_MAX_WIDTH = int(os.environ.get('MAHJONG_GPT_MAX_WIDTH', '1024'))
+
+FORMAT_MIME_TYPES = {
+    'PNG': 'image/png',
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp'
+}
+
+def _detect_mime_type(data: bytes) -> Optional[str]:
+    """先頭バイトから画像形式を判定"""
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+class ImagePayload:
+    """アップロード画像と、そこから派生したエンコード済みバリエーションを保持"""
+    
+    def __init__(self, original_bytes: Optional[bytes] = None, image: Optional[Image.Image] = None):
+        self.original_bytes = original_bytes
+        self.original_mime = _detect_mime_type(original_bytes) if original_bytes else None
+        self._image = image
+        self._encoded: Dict[Tuple, Tuple] = {}
+        self.stats: List[Dict] = []
+        # 元画像に対する切り出し範囲（左, 上, 右, 下の0〜1の比率、Noneは全体）
+        self.crop_box: Optional[Tuple[float, float, float, float]] = None
+        # 直近にVision API用にエンコードした画像のサイズと切り出し範囲
+        self.vision_size: Optional[Tuple[int, int]] = None
+        self.vision_crop_box: Optional[Tuple[float, float, float, float]] = None
+    
+    @classmethod
+    def from_upload(cls, uploaded_file) -> 'ImagePayload':
+        """Streamlitのアップロードファイル（またはバイト列）から作成"""
+        data = uploaded_file if isinstance(uploaded_file, bytes) else uploaded_file.getvalue()
+        return cls(original_bytes=data)
+    
+    @classmethod
+    def from_image(cls, image) -> 'ImagePayload':
+        """PIL画像またはNumPy配列から作成（元のバイト列は持たない）"""
+        if not isinstance(image, Image.Image):
+            import numpy as np
+            array = np.asarray(image)
+            if array.dtype != np.uint8:
+                array = array.astype(np.uint8)
+            image = Image.fromarray(array)
+        return cls(image=image)
+    
+    def _record(self, stage: str, start: float, size: int):
+        from perf_monitor import record
+        
+        duration = time.perf_counter() - start
+        self.stats.append({'stage': stage, 'bytes': size, 'ms': round(duration * 1000, 1)})
+        record(f"image.{stage}", duration, 'image', bytes=size)
+    
+    @property
+    def image(self) -> Image.Image:
+        """デコード済み画像（初回のみデコード）"""
+        if self._image is None:
+            start = time.perf_counter()
+            self._image = Image.open(io.BytesIO(self.original_bytes))
+            self._image.load()
+            self._record('decode', start, len(self.original_bytes))
+        return self._image
+    
+    def set_crop(self, crop_box: Optional[Tuple[float, float, float, float]]):
+        """以降のエンコードで使う切り出し範囲を設定"""
+        self.crop_box = crop_box
+    
+    def _cropped_image(self) -> Image.Image:
+        """切り出し範囲を適用した画像"""
+        image = self.image
+        if self.crop_box is None:
+            return image
+        width, height = image.size
+        left, top, right, bottom = self.crop_box
+        return image.crop((int(left * width), int(top * height), round(right * width), round(bottom * height)))
+    
+    def to_original_box(self, box: Tuple[float, float, float, float]) -> Tuple[float, float, float, float]:
+        """Vision API用画像上のピクセル座標を、元画像に対する比率に変換"""
+        width, height = self.vision_size
+        left, top, right, bottom = self.vision_crop_box or (0.0, 0.0, 1.0, 1.0)
+        x0, y0, x1, y1 = box
+        return (
+            left + x0 / width * (right - left),
+            top + y0 / height * (bottom - top),
+            left + x1 / width * (right - left),
+            top + y1 / height * (bottom - top)
+        )
+    
+    def _resize_to_width(self, image: Image.Image, target_width: int) -> Image.Image:
+        width, height = image.size
+        try:
+            resample = Image.Resampling.LANCZOS
+        except AttributeError:
+            # 古いPillowバージョン対応
+            resample = Image.LANCZOS
+        return image.resize((target_width, max(1, int(height * target_width / width))), resample)
+    
+    def _encode(self, stage: str, image: Image.Image, image_format: str, quality: int) -> Tuple[bytes, str]:
+        """画像を指定形式でエンコード"""
+        start = time.perf_counter()
+        
+        if image_format in ('JPEG', 'WEBP') and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        
+        buffer = io.BytesIO()
+        save_options = {'quality': quality} if image_format in ('JPEG', 'WEBP') else {}
+        image.save(buffer, format=image_format, **save_options)
+        data = buffer.getvalue()
+        
+        self._record(stage, start, len(data))
+        return data, FORMAT_MIME_TYPES.get(image_format, 'image/png')
+    
+    def vision_bytes(self, image_format: str = VISION_IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> bytes:
+        """Vision API用に切り出し・拡大縮小・補正した画像（バリエーションごとに1回だけエンコード）"""
+        cache_key = ('vision', image_format, quality, self.crop_box)
+        if cache_key not in self._encoded:
+            start = time.perf_counter()
+            pil_image = self._cropped_image()
+            if pil_image.mode not in ('RGB', 'L'):
+                pil_image = pil_image.convert('RGB')
+            
+            # 小さい画像は認識精度のため拡大、大きい画像は送信量削減のため縮小
+            width = pil_image.size[0]
+            if width < VISION_MIN_WIDTH:
+                pil_image = self._resize_to_width(pil_image, VISION_MIN_WIDTH)
+            elif width > VISION_MAX_WIDTH:
+                pil_image = self._resize_to_width(pil_image, VISION_MAX_WIDTH)
+            
+            # コントラスト・明度調整
+            pil_image = ImageEnhance.Contrast(pil_image).enhance(1.3)
+            pil_image = ImageEnhance.Brightness(pil_image).enhance(1.1)
+            self._record('vision_preprocess', start, 0)
+            
+            data, mime_type = self._encode('vision_encode', pil_image, image_format, quality)
+            self._encoded[cache_key] = (data, mime_type, pil_image.size)
+        
+        data, _, size = self._encoded[cache_key]
+        self.vision_size = size
+        self.vision_crop_box = self.crop_box
+        return data
+    
+    def gpt_image(self, image_format: str = GPT_IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> Tuple[bytes, str]:
+        """GPT用の画像（切り出しがなく元のアップロードが使えればそのまま、なければ1回だけエンコード）"""
+        if (self.crop_box is None and self.original_bytes and self.original_mime in PASSTHROUGH_MIME_TYPES and
+                len(self.original_bytes) <= MAX_PASSTHROUGH_BYTES):
+            return self.original_bytes, self.original_mime
+        
+        cache_key = ('gpt', image_format, quality, self.crop_box)
+        if cache_key not in self._encoded:
+            pil_image = self._cropped_image()
+            if self.crop_box is not None and pil_image.size[0] > GPT_MAX_WIDTH:
+                pil_image = self._resize_to_width(pil_image, GPT_MAX_WIDTH)
+            self._encoded[cache_key] = self._encode('gpt_encode', pil_image, image_format, quality)
+        return self._encoded[cache_key]
+    
+    def gpt_data_url(self) -> str:
+        """GPTに渡すdata URL"""
+        data, mime_type = self.gpt_image()
+        return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
@@ -157,6 +157,51 @@ def register_new_player(player_name):
     except Exception as e:
         st.error(f"プレイヤー登録エラー: {e}")
 
+def register_new_players(player_names):
+    """複数の新規プレイヤーをまとめて登録（マスタシートへの書き込みは1回）"""
+    try:
+        existing_players = set(get_registered_players())
+        candidates = []
+        for name in player_names:
+            name = name.strip()
+            if name and name not in existing_players and name not in candidates:
+                candidates.append(name)
+        
+        if not candidates:
+            return []
+        
+        from config_manager import ConfigManager
+        from config_spreadsheet_manager import ConfigSpreadsheetManager
+        
+        config_manager = ConfigManager()
+        sheets_creds = config_manager.load_sheets_credentials()
+        
+        if not sheets_creds:
+            return []
+        
+        config_sheet_manager = ConfigSpreadsheetManager(sheets_creds)
+        if not config_sheet_manager.connect():
+            st.error("プレイヤー登録に失敗しました")
+            return []
+        
+        registered = config_sheet_manager.add_players(candidates)
+        
+        # セッション状態のプレイヤーリストも同じタイミングで更新
+        if 'master_players' not in st.session_state:
+            st.session_state['master_players'] = []
+        for name in registered:
+            if name not in st.session_state['master_players']:
+                st.session_state['master_players'].append(name)
+        
+        if registered:
+            st.success(f"プレイヤーを登録しました: {', '.join(registered)}")
+        
+        return registered
+        
+    except Exception as e:
+        st.error(f"プレイヤー登録エラー: {e}")
+        return []
+
 def save_player_to_config_sheet(player_name):
     """プレイヤーを設定スプレッドシートに保存"""
     try:
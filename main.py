@@ -1,7 +1,13 @@
 # main.py - プレイヤーマスタ管理完全対応版
 import streamlit as st
-from ui_components import setup_sidebar
-from tab_pages import home_tab, screenshot_upload_tab, manual_input_tab, player_management_tab
+import perf_monitor
+from perf_monitor import phase
+
+perf_monitor.begin_run()
+
+with phase('imports'):
+    from ui_components import setup_sidebar
+    from tab_pages import home_tab, screenshot_upload_tab, manual_input_tab, player_management_tab
 
 # ページ設定
 st.set_page_config(
@@ -109,27 +115,30 @@ def main():
     st.title("麻雀点数管理システム")
     
     # 設定とプレイヤーマスタの同期初期化
-    initialize_config_and_players()
+    with phase('startup.config_and_players'):
+        initialize_config_and_players()
     
     # サイドバー設定
-    setup_sidebar()
+    with phase('render.sidebar', 'render'):
+        setup_sidebar()
     
     # セッション状態の初期化とデータ読み込み
-    initialize_session_and_load_data()
+    with phase('startup.session_data'):
+        initialize_session_and_load_data()
     
     # メインコンテンツ - 4つのタブ
     tab1, tab2, tab3, tab4 = st.tabs(["ホーム", "スクショ解析", "手動入力", "プレイヤー管理"])
     
-    with tab1:
+    with tab1, phase('render.home', 'render'):
         home_tab()
     
-    with tab2:
+    with tab2, phase('render.screenshot', 'render'):
         screenshot_upload_tab()
     
-    with tab3:
+    with tab3, phase('render.manual_input', 'render'):
         manual_input_tab()
     
-    with tab4:
+    with tab4, phase('render.players', 'render'):
         player_management_tab()
 
 def initialize_config_and_players():
@@ -141,15 +150,12 @@ def initialize_config_and_players():
             # 設定スプレッドシートからの同期を強制実行
             config_manager = ConfigManager()
             
-            # プレイヤーマスタを先に読み込み
-            load_master_players(config_manager)
+            # プレイヤーマスタと現在のシーズンのデータを並列に読み込み
+            from startup_loader import prefetch_startup_data
+            prefetch_startup_data(config_manager)
             
-            # 設定同期後、現在のシーズンのデータも読み込み
             current_season = config_manager.get_current_season()
             if current_season:
-                from ui_components import load_season_data
-                load_season_data(config_manager, current_season)
-                
                 # 同期時刻を設定
                 import time
                 st.session_state['last_sync_time'] = time.time()
@@ -179,6 +185,15 @@ def load_master_players(config_manager=None):
             from config_manager import ConfigManager
             config_manager = ConfigManager()
         
+        # 起動時に開始済みの取得があれば結果を待って使用
+        players_future = st.session_state.pop('startup_players_future', None)
+        if players_future is not None:
+            players = players_future.result()
+            if players is not None:
+                st.session_state['master_players'] = players
+                st.session_state.pop('force_reload_players', None)
+                return
+        
         from config_spreadsheet_manager import ConfigSpreadsheetManager
         
         sheets_creds = config_manager.load_sheets_credentials()
@@ -327,7 +342,9 @@ def cleanup_session():
         'delete_mode_enabled',
         'force_reload_players',
         'analysis_result',
-        'screenshot_uploader_key'
+        'screenshot_uploader_key',
+        'batch_review_queue',
+        'batch_review_item'
     ]
     
     for key in temporary_keys:
@@ -383,7 +400,8 @@ if __name__ == "__main__":
     # setup_error_handling()
     
     try:
-        main()
+        with perf_monitor.finish_run():
+            main()
     except Exception as e:
         handle_app_error(str(e), "general")
         
@@ -0,0 +1,102 @@
+# ocr_parser.py - Vision APIの単語位置からニックネームと点数を直接抽出（GPTを使わない高速経路）
+import os
+from typing import Dict, List, Optional
+from panel_cropper import parse_score
+
+# 確実に読み取れた場合はGPTでの解析を省略するか
+OCR_FAST_PATH_ENABLED = os.environ.get('MAHJONG_OCR_FAST_PATH', '1').lower() in ('1', 'true', 'yes')
+
+# 人数ごとの終局時の点数合計（4人麻雀: 25000×4、3人麻雀: 35000×3）
+EXPECTED_TOTALS = {4: 100000, 3: 105000}
+
+# GPTを省略できる信頼度
+FAST_PATH_CONFIDENCE = 0.95
+
+# 名前として扱わない語（順位表示など）
+IGNORED_WORDS = {'1位', '2位', '3位', '4位', '1st', '2nd', '3rd', '4th', '位', 'pt', 'PT', '点'}
+
+def _center_y(word: Dict) -> float:
+    return (word['box'][1] + word['box'][3]) / 2
+
+def _height(word: Dict) -> float:
+    return word['box'][3] - word['box'][1]
+
+def _is_name_word(word: Dict) -> bool:
+    """プレイヤー名の一部になり得る語か"""
+    text = word['text'].strip()
+    if not text or text in IGNORED_WORDS:
+        return False
+    # 数値（点数・ポイント・順位）は名前に含めない
+    stripped = text.replace(',', '').replace('.', '').lstrip('+-')
+    return not stripped.isdigit()
+
+def _join_words(words: List[Dict]) -> str:
+    """左から順に単語をつなげる（離れた単語の間だけ空白を入れる）"""
+    words = sorted(words, key=lambda word: word['box'][0])
+    text = words[0]['text']
+    for previous, word in zip(words, words[1:]):
+        gap = word['box'][0] - previous['box'][2]
+        text += (' ' if gap > _height(word) * 0.5 else '') + word['text']
+    return text.strip()
+
+def _find_name(score_word: Dict, words: List[Dict], claimed: set) -> Optional[str]:
+    """点数の左側（同じ行）または真上にあるプレイヤー名を探す"""
+    line_height = _height(score_word)
+    center = _center_y(score_word)
+    candidates = [word for word in words if id(word) not in claimed and _is_name_word(word)]
+    
+    # 同じ行で点数より左にある語
+    same_row = [
+        word for word in candidates
+        if abs(_center_y(word) - center) <= line_height * 0.6 and word['box'][2] <= score_word['box'][0]
+    ]
+    if same_row:
+        # 点数に最も近い語の塊だけを名前とする（順位などの離れた語は除く）
+        same_row.sort(key=lambda word: word['box'][0], reverse=True)
+        group = [same_row[0]]
+        for word in same_row[1:]:
+            if group[-1]['box'][0] - word['box'][2] > line_height * 1.5:
+                break
+            group.append(word)
+        claimed.update(id(word) for word in group)
+        return _join_words(group)
+    
+    # 点数の真上の行にある語
+    above = [
+        word for word in candidates
+        if 0 < center - _center_y(word) <= line_height * 1.8
+        and word['box'][0] < score_word['box'][2] and word['box'][2] > score_word['box'][0]
+    ]
+    if above:
+        row_center = max(_center_y(word) for word in above)
+        group = [word for word in above if abs(_center_y(word) - row_center) <= line_height * 0.6]
+        claimed.update(id(word) for word in group)
+        return _join_words(group)
+    return None
+
+def parse_players(words: List[Dict]) -> Optional[Dict]:
+    """単語の位置からプレイヤー名と点数の組を抽出し、点数合計で検証（確実でなければNone）"""
+    score_words = [word for word in words if parse_score(word['text']) is not None]
+    if len(score_words) not in EXPECTED_TOTALS:
+        return None
+    
+    claimed = set(id(word) for word in score_words)
+    players = []
+    for score_word in sorted(score_words, key=_center_y):
+        name = _find_name(score_word, words, claimed)
+        if not name:
+            return None
+        players.append({'nickname': name, 'score': parse_score(score_word['text'])})
+    
+    total = sum(player['score'] for player in players)
+    if total != EXPECTED_TOTALS[len(players)]:
+        return None
+    if len(set(player['nickname'] for player in players)) != len(players):
+        return None
+    
+    players.sort(key=lambda player: player['score'], reverse=True)
+    return {
+        'players': players,
+        'confidence': FAST_PATH_CONFIDENCE,
+        'notes': f"OCR結果から直接抽出（{len(players)}人・合計{total}点を確認）"
+    }
@@ -0,0 +1,119 @@
+# panel_cropper.py - 雀魂の結果画面から点数パネル部分を切り出す
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+Box = Tuple[float, float, float, float]
+
+# 切り出し範囲の余白（画像サイズに対する比率）
+PANEL_MARGIN = 0.03
+
+# パネルとみなすのに必要な点数の数（3人麻雀でも検出できるよう3）
+MIN_SCORE_WORDS = 3
+
+# 余白の除去で、この標準偏差未満の行・列を単色とみなす
+BORDER_STDDEV_THRESHOLD = 2.0
+
+# 点数表記（例: 35400, -1200, 25,000）
+SCORE_PATTERN = re.compile(r'^[+-]?(\d{1,3}(,\d{3})+|\d{1,6})$')
+
+# 記憶するレイアウトの数（プロセス全体で共有、最近使ったものを残す）
+LAYOUT_MEMORY_SIZE = 64
+
+# 画像サイズ -> 前回検出したパネル位置（同じ端末のスクリーンショットはレイアウトが同じ）
+_layouts: "OrderedDict[Tuple[int, int], Box]" = OrderedDict()
+_lock = threading.Lock()
+
+def parse_score(text: str) -> Optional[int]:
+    """点数表記であれば数値を返す"""
+    text = text.strip().replace('−', '-')
+    if not SCORE_PATTERN.match(text):
+        return None
+    value = int(text.replace(',', ''))
+    # 雀魂の持ち点は100点単位
+    if value % 100 != 0 or abs(value) > 200000:
+        return None
+    return value
+
+def find_score_words(words: List[Dict]) -> List[Dict]:
+    """OCR結果の単語から点数らしいものを抽出"""
+    return [word for word in words if parse_score(word['text']) is not None]
+
+def locate_panel(words: List[Dict]) -> Optional[Box]:
+    """Vision APIの単語の位置から、点数とプレイヤー名を含む範囲を推定（元画像に対する比率）"""
+    score_words = find_score_words(words)
+    if len(score_words) < MIN_SCORE_WORDS:
+        return None
+    
+    # 点数が並ぶ縦方向の範囲を、行の高さ1つ分広げてパネルの範囲とする
+    line_height = max(word['box'][3] - word['box'][1] for word in score_words)
+    top = min(word['box'][1] for word in score_words) - line_height
+    bottom = max(word['box'][3] for word in score_words) + line_height
+    
+    # その範囲にある単語（プレイヤー名など）を全て含める
+    panel_words = [
+        word for word in words
+        if top <= (word['box'][1] + word['box'][3]) / 2 <= bottom
+    ]
+    left = min(word['box'][0] for word in panel_words)
+    right = max(word['box'][2] for word in panel_words)
+    
+    return (
+        max(0.0, left - PANEL_MARGIN),
+        max(0.0, top - PANEL_MARGIN),
+        min(1.0, right + PANEL_MARGIN),
+        min(1.0, bottom + PANEL_MARGIN)
+    )
+
+def trim_borders(image) -> Optional[Box]:
+    """上下左右の単色の余白（黒帯など）を除いた範囲を推定"""
+    import numpy as np
+    
+    small = image.convert('L')
+    small.thumbnail((256, 256))
+    pixels = np.asarray(small, dtype=np.float32)
+    
+    rows = np.where(pixels.std(axis=1) >= BORDER_STDDEV_THRESHOLD)[0]
+    columns = np.where(pixels.std(axis=0) >= BORDER_STDDEV_THRESHOLD)[0]
+    if len(rows) == 0 or len(columns) == 0:
+        return None
+    
+    height, width = pixels.shape
+    box = (
+        max(0.0, float(columns[0]) / width - PANEL_MARGIN),
+        max(0.0, float(rows[0]) / height - PANEL_MARGIN),
+        min(1.0, float(columns[-1] + 1) / width + PANEL_MARGIN),
+        min(1.0, float(rows[-1] + 1) / height + PANEL_MARGIN)
+    )
+    
+    # ほとんど余白がなければ切り出さない
+    if (box[2] - box[0]) * (box[3] - box[1]) > 0.9:
+        return None
+    return box
+
+def remember_layout(image_size: Tuple[int, int], box: Box):
+    """検出したパネル位置を画像サイズごとに記録"""
+    with _lock:
+        _layouts[image_size] = box
+        _layouts.move_to_end(image_size)
+        while len(_layouts) > LAYOUT_MEMORY_SIZE:
+            _layouts.popitem(last=False)
+
+def forget_layout(image_size: Tuple[int, int]):
+    """記録したパネル位置を破棄（レイアウトが合わなかった場合）"""
+    with _lock:
+        _layouts.pop(image_size, None)
+
+def initial_crop(image) -> Tuple[Optional[Box], bool]:
+    """OCR前の切り出し範囲（同じサイズの画像で検出済みならその位置、なければ余白の除去）と、検出済みの位置を使ったか"""
+    with _lock:
+        box = _layouts.get(image.size)
+        if box is not None:
+            _layouts.move_to_end(image.size)
+    if box is not None:
+        return box, True
+    try:
+        return trim_borders(image), False
+    except Exception:
+        return None, False
@@ -0,0 +1,156 @@
+# perf_monitor.py - 起動フェーズ・API呼び出しの計測
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional
+
+# JSON Lines形式の計測ログ（環境変数でファイルを指定した場合のみ出力）
+PERF_LOG_FILE = os.environ.get('MAHJONG_PERF_LOG', '')
+
+# サイドバーに計測パネルを表示するか
+PERF_PANEL_ENABLED = os.environ.get('MAHJONG_PERF_PANEL', '').lower() in ('1', 'true', 'yes')
+
+# セッションID -> 実行中のリラン計測
+_active_runs: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+def _session_id() -> Optional[str]:
+    """現在のスクリプトコンテキストのセッションID（コンテキスト外ではNone）"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        try:
+            ctx = get_script_run_ctx(suppress_warning=True)
+        except TypeError:
+            ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else None
+    except Exception:
+        return None
+
+def begin_run():
+    """リランの計測を開始"""
+    session_id = _session_id()
+    if session_id is None:
+        return
+    with _lock:
+        _active_runs[session_id] = {
+            'started_at': time.time(),
+            'start': time.perf_counter(),
+            'phases': []
+        }
+
+def record(name: str, duration: float, category: str = 'startup', **details):
+    """計測結果を現在のリランに記録"""
+    session_id = _session_id()
+    if session_id is None:
+        return
+    with _lock:
+        run = _active_runs.get(session_id)
+        if run is None:
+            return
+        entry = {
+            'name': name,
+            'category': category,
+            'offset_ms': round((time.perf_counter() - duration - run['start']) * 1000, 1),
+            'duration_ms': round(duration * 1000, 1),
+            'thread': threading.current_thread().name
+        }
+        entry.update(details)
+        run['phases'].append(entry)
+
+@contextmanager
+def phase(name: str, category: str = 'startup', **details):
+    """処理区間の所要時間を計測"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, category, **details)
+
+def timed(name: str, category: str = 'api'):
+    """関数呼び出しの所要時間を計測するデコレータ"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def end_run() -> Optional[Dict]:
+    """リランの計測を終了し、結果をセッション状態とログに保存"""
+    session_id = _session_id()
+    if session_id is None:
+        return None
+    with _lock:
+        run = _active_runs.pop(session_id, None)
+    if run is None:
+        return None
+    
+    result = {
+        'timestamp': run['started_at'],
+        'session_id': session_id,
+        'rerun_ms': round((time.perf_counter() - run['start']) * 1000, 1),
+        'phases': sorted(run['phases'], key=lambda entry: entry['offset_ms'])
+    }
+    
+    import streamlit as st
+    history = st.session_state.setdefault('perf_history', [])
+    history.append(result)
+    del history[:-20]
+    
+    if PERF_LOG_FILE:
+        _append_log(result)
+    
+    return result
+
+@contextmanager
+def finish_run():
+    """リランの残りの処理を囲み、st.rerun()・st.stop()・例外で中断されても計測を終了"""
+    render_panel = True
+    try:
+        yield
+    except Exception:
+        raise
+    except BaseException:
+        # st.rerun()やst.stop()は制御用の例外（すぐに再実行・終了するためパネルは描画しない）
+        render_panel = False
+        raise
+    finally:
+        end_run()
+        if render_panel:
+            render_perf_panel()
+
+def _append_log(result: Dict):
+    """計測結果をJSON Linesとして追記"""
+    try:
+        line = json.dumps(result, ensure_ascii=False)
+        with _lock:
+            with open(PERF_LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+    except Exception:
+        pass
+
+def render_perf_panel():
+    """直近のリランの計測結果をサイドバーに表示"""
+    if not PERF_PANEL_ENABLED:
+        return
+    
+    import streamlit as st
+    history: List[Dict] = st.session_state.get('perf_history', [])
+    if not history:
+        return
+    
+    latest = history[-1]
+    with st.sidebar.expander("パフォーマンス", expanded=False):
+        st.metric("リラン所要時間", f"{latest['rerun_ms']:.0f} ms")
+        if len(history) > 1:
+            st.caption("直近のリラン: " + " / ".join(f"{run['rerun_ms']:.0f}" for run in history[-6:-1]) + " ms")
+        
+        if latest['phases']:
+            import pandas as pd
+            phases_df = pd.DataFrame(latest['phases'])[['name', 'category', 'offset_ms', 'duration_ms', 'thread']]
+            phases_df.columns = ['区間', '種別', '開始(ms)', '所要(ms)', 'スレッド']
+            st.dataframe(phases_df, use_container_width=True, hide_index=True)
@@ -1,13 +1,20 @@
 # player_manager.py
 import pandas as pd
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 from collections import defaultdict
 from scoring_config import calculate_game_score, get_player_count_from_game_type
 
+def records_to_dataframe(game_records: Union[List[Dict], Dict[str, list]]) -> pd.DataFrame:
+    """記録のリスト、またはシートから読み込んだ列データ（行ごとの辞書を経由しない）をDataFrameに変換"""
+    if not game_records:
+        return pd.DataFrame()
+    return pd.DataFrame(game_records)
+
 class PlayerManager:
-    def __init__(self, game_records: List[Dict]):
+    def __init__(self, game_records: Union[List[Dict], Dict[str, list]]):
         self.records = game_records
-        self.df = pd.DataFrame(game_records) if game_records else pd.DataFrame()
+        self.df = records_to_dataframe(game_records)
+        self._statistics_cache: Dict[str, Dict] = {}
     
     def get_all_player_names(self) -> List[str]:
         if self.df.empty:
@@ -87,6 +94,12 @@ class PlayerManager:
         return game_score
     
     def get_player_statistics(self, player_name: str) -> Dict:
+        # 同じ記録に対する統計は1回だけ計算
+        if player_name not in self._statistics_cache:
+            self._statistics_cache[player_name] = self._calculate_player_statistics(player_name)
+        return self._statistics_cache[player_name]
+    
+    def _calculate_player_statistics(self, player_name: str) -> Dict:
         records = self.get_player_records(player_name)
         
         if not records:
@@ -1,8 +1,11 @@
 # player_stats_ui.py
 import streamlit as st
 import pandas as pd
+from typing import TYPE_CHECKING
 from player_manager import PlayerManager
-from data_analyzer import MahjongDataAnalyzer
+
+if TYPE_CHECKING:
+    from data_analyzer import MahjongDataAnalyzer
 
 def show_player_statistics_modal():
     st.subheader("プレイヤー統計")
@@ -11,8 +14,11 @@ def show_player_statistics_modal():
         st.info("統計を表示するデータがありません")
         return
     
-    player_manager = PlayerManager(st.session_state['game_records'])
-    analyzer = MahjongDataAnalyzer(st.session_state['game_records'])
+    from data_analyzer import MahjongDataAnalyzer
+    from ui_components import get_season_derived
+    
+    player_manager = get_season_derived('player_manager', PlayerManager)
+    analyzer = get_season_derived('data_analyzer', MahjongDataAnalyzer)
     
     all_players = player_manager.get_all_player_names()
     
@@ -20,7 +26,7 @@ def show_player_statistics_modal():
         st.info("プレイヤーデータがありません")
         return
     
-    tab1, tab2, tab3 = st.tabs(["ランキング", "個人統計", "対戦成績"])
+    tab1, tab2, tab3, tab4 = st.tabs(["ランキング", "個人統計", "対戦成績", "通算成績"])
     
     with tab1:
         show_ranking_tab(player_manager, analyzer)
@@ -30,8 +36,11 @@ def show_player_statistics_modal():
     
     with tab3:
         show_head_to_head_tab(player_manager, all_players)
+    
+    with tab4:
+        show_career_stats_tab()
 
-def show_ranking_tab(player_manager: PlayerManager, analyzer: MahjongDataAnalyzer):
+def show_ranking_tab(player_manager: PlayerManager, analyzer: "MahjongDataAnalyzer"):
     ranking_df = player_manager.get_ranking_table()
     
     if not ranking_df.empty:
@@ -74,7 +83,7 @@ def show_ranking_tab(player_manager: PlayerManager, analyzer: MahjongDataAnalyze
     else:
         st.info("ランキングデータがありません")
 
-def show_individual_stats_tab(player_manager: PlayerManager, analyzer: MahjongDataAnalyzer, all_players: list):
+def show_individual_stats_tab(player_manager: PlayerManager, analyzer: "MahjongDataAnalyzer", all_players: list):
     selected_player = st.selectbox("プレイヤーを選択", all_players)
     
     if selected_player:
@@ -171,4 +180,63 @@ def show_head_to_head_tab(player_manager: PlayerManager, all_players: list):
                 history_df = pd.DataFrame(history_data)
                 st.dataframe(history_df, hide_index=True, use_container_width=True)
         else:
-            st.info(f"{player1} と {player2} の直接対戦記録はありません")
\ No newline at end of file
+            st.info(f"{player1} と {player2} の直接対戦記録はありません")
+
+def show_career_stats_tab():
+    """全シーズンの通算成績とシーズン別成績"""
+    from config_manager import ConfigManager
+    
+    config_manager = ConfigManager()
+    seasons = config_manager.get_all_seasons()
+    sheets_creds = config_manager.load_sheets_credentials()
+    
+    if not seasons or not sheets_creds:
+        st.info("集計できるシーズンがありません")
+        return
+    
+    st.caption(f"登録済みの{len(seasons)}シーズンを集計します（前回から変更のないシーズンは再取得しません）")
+    
+    if st.button("全シーズンを集計", use_container_width=True, key="career_stats_button"):
+        from career_stats import fetch_all_seasons, build_career_frame, compute_leaderboards
+        
+        progress_bar = st.progress(0)
+        season_data = fetch_all_seasons(
+            sheets_creds, seasons,
+            progress_callback=lambda done, total: progress_bar.progress(done / total)
+        )
+        progress_bar.empty()
+        
+        failed = [seasons[key].get('name', key) for key, data in season_data.items() if data is None]
+        if failed:
+            st.warning(f"読み込めなかったシーズン: {', '.join(failed)}")
+        
+        career_df = build_career_frame(season_data, sheets_creds)
+        st.session_state['career_stats'] = compute_leaderboards(career_df)
+    
+    career_stats = st.session_state.get('career_stats')
+    if not career_stats:
+        return
+    
+    if career_stats['lifetime'].empty:
+        st.info("対局データがありません")
+        return
+    
+    st.subheader("通算ランキング")
+    st.dataframe(career_stats['lifetime'], use_container_width=True)
+    
+    st.subheader("シーズン別ランキング")
+    per_season = career_stats['per_season']
+    season_names = {key: info.get('name', key) for key, info in seasons.items()}
+    season_options = [key for key in seasons if key in set(per_season['シーズン'])]
+    
+    if season_options:
+        selected_season = st.selectbox(
+            "シーズン",
+            options=season_options,
+            format_func=lambda key: season_names.get(key, key),
+            key="career_season_selector"
+        )
+        season_table = per_season[per_season['シーズン'] == selected_season].drop(columns='シーズン')
+        season_table = season_table.reset_index(drop=True)
+        season_table.index = season_table.index + 1
+        st.dataframe(season_table, use_container_width=True)
@@ -0,0 +1,73 @@
+# rate_limiter.py - APIレート制限（トークンバケット）
+import threading
+import time
+from typing import Dict, Optional
+
+# Google Sheetsの読み取り上限（1ユーザーあたり60回/分）に合わせた既定値
+SHEETS_READ_RATE = 1.0
+SHEETS_READ_BURST = 10
+
+# Vision API（既定の上限1,800回/分）
+VISION_REQUEST_RATE = 10.0
+VISION_REQUEST_BURST = 10
+
+# OpenAI（利用枠によって上限が異なるため控えめな既定値）
+OPENAI_REQUEST_RATE = 1.0
+OPENAI_REQUEST_BURST = 4
+
+class TokenBucket:
+    """スレッドセーフなトークンバケット"""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """トークンを取得できるまで待機（タイムアウトした場合False）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_time = (tokens - self._tokens) / self.rate
+            
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_time = min(wait_time, remaining)
+            time.sleep(wait_time)
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(name: str, rate: float, capacity: int) -> TokenBucket:
+    """名前ごとにプロセス全体で共有するレート制限を取得"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = TokenBucket(rate, capacity)
+            _limiters[name] = limiter
+        return limiter
+
+def get_sheets_read_limiter(client_email: str = '') -> TokenBucket:
+    """サービスアカウントごとのSheets読み取りレート制限"""
+    return get_rate_limiter(f"sheets_read:{client_email}", SHEETS_READ_RATE, SHEETS_READ_BURST)
+
+def get_vision_limiter() -> TokenBucket:
+    """Vision API呼び出しのレート制限"""
+    return get_rate_limiter('vision', VISION_REQUEST_RATE, VISION_REQUEST_BURST)
+
+def get_openai_limiter() -> TokenBucket:
+    """OpenAI API呼び出しのレート制限"""
+    return get_rate_limiter('openai', OPENAI_REQUEST_RATE, OPENAI_REQUEST_BURST)
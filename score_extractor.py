@@ -1,14 +1,29 @@
 # score_extractor.py - Streamlit Cloud対応版（スピナー修正）
-import numpy as np
+import os
 import re
 import json
 import base64
 from typing import List, Dict, Optional, Union
 import streamlit as st
-from PIL import Image, ImageEnhance
-import io
-import openai
 import requests
+from analysis_schema import SchemaValidationError
+from image_encoding import ImagePayload
+from perf_monitor import timed
+
+# Vision API（REST）のエンドポイント（ローカルのモックサーバーで試験する場合に変更）
+VISION_ANNOTATE_ENDPOINT = os.environ.get('MAHJONG_VISION_ENDPOINT', 'https://vision.googleapis.com/v1/images:annotate')
+
+# 1回のannotateリクエストにまとめる画像数の上限（APIの上限は16）
+VISION_BATCH_SIZE = 16
+
+# 1回のリクエストに含める画像データの上限（JSONリクエストの上限10MBに収める）
+VISION_BATCH_MAX_BYTES = 8 * 1024 * 1024
+
+# ChatGPTの応答をJSONスキーマで構造化するか（無効にすると応答本文からJSONを抜き出す従来方式）
+STRUCTURED_OUTPUT_ENABLED = os.environ.get('MAHJONG_STRUCTURED_OUTPUT', '1').lower() in ('1', 'true', 'yes')
+
+# 応答がスキーマ検証に失敗した場合の再試行回数
+STRUCTURED_OUTPUT_RETRIES = 1
 
 class MahjongScoreExtractor:
     """雀魂スクリーンショットからニックネームと点数を抽出するクラス"""
@@ -31,146 +46,275 @@ class MahjongScoreExtractor:
     def _initialize_vision_client(self):
         """Google Vision APIクライアントを初期化（サービスアカウント用）"""
         try:
-            from google.cloud import vision
-            from google.oauth2 import service_account
+            # 認証済みのクライアントをプロセス全体で再利用
+            from api_clients import get_vision_client
             
-            credentials = service_account.Credentials.from_service_account_info(
-                self.vision_credentials
-            )
-            self.vision_client = vision.ImageAnnotatorClient(credentials=credentials)
+            self.vision_client = get_vision_client(self.vision_credentials)
         except ImportError:
             st.error("google-cloud-visionライブラリがインストールされていません")
             raise
     
-    def preprocess_image_for_vision(self, image: np.ndarray) -> bytes:
+    def _as_payload(self, image) -> ImagePayload:
+        """解析対象をImagePayloadに変換（元のアップロードがあればそのまま保持）"""
+        if isinstance(image, ImagePayload):
+            return image
+        if isinstance(image, bytes) or hasattr(image, 'getvalue'):
+            return ImagePayload.from_upload(image)
+        return ImagePayload.from_image(image)
+    
+    def preprocess_image_for_vision(self, image) -> bytes:
         """Vision API用に画像を前処理して精度を向上（CV2を使わない版）"""
-        # PILImageに変換
-        if len(image.shape) == 3:
-            pil_image = Image.fromarray(image.astype('uint8'))
-        else:
-            pil_image = Image.fromarray(image.astype('uint8'), mode='L')
+        return self._as_payload(image).vision_bytes()
+    
+    @staticmethod
+    def _build_annotate_body(images_bytes: List[bytes]) -> Dict:
+        """Vision API（REST）のannotateリクエスト本文"""
+        return {
+            "requests": [{
+                "image": {
+                    "content": base64.b64encode(image_bytes).decode('utf-8')
+                },
+                "features": [{
+                    "type": "TEXT_DETECTION",
+                    "maxResults": 50
+                }],
+                "imageContext": {
+                    "languageHints": ["ja", "en"]
+                }
+            } for image_bytes in images_bytes]
+        }
+    
+    def _annotate_with_api_key(self, images_bytes: List[bytes]) -> List[Union[Dict, Exception]]:
+        """Vision API（REST）に複数画像を1リクエストで送信し、画像ごとの結果を返す"""
+        from api_clients import get_http_session
         
-        # 解像度向上（小さい画像の場合は拡大）
-        width, height = pil_image.size
-        if width < 1000:
-            scale_factor = 1000 / width
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            # Streamlit Cloud対応: リサンプリング方法を変更
-            try:
-                pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            except AttributeError:
-                # 古いPillowバージョン対応
-                pil_image = pil_image.resize((new_width, new_height), Image.LANCZOS)
+        try:
+            # keep-alive接続を再利用
+            response = get_http_session().post(
+                VISION_ANNOTATE_ENDPOINT,
+                params={'key': self.vision_api_key},
+                json=self._build_annotate_body(images_bytes),
+                timeout=30 + 10 * (len(images_bytes) - 1)
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Vision API リクエストエラー: {e}")
+        
+        return self._parse_annotate_response(response.json(), len(images_bytes))
+    
+    @classmethod
+    def _parse_annotate_response(cls, result: Dict, image_count: int) -> List[Union[Dict, Exception]]:
+        """annotateのレスポンスを画像ごとの結果（テキストと単語の位置）に分解"""
+        # エラーチェック
+        if 'error' in result:
+            raise Exception(f"Vision API エラー: {result['error']['message']}")
         
-        # コントラスト調整
-        enhancer = ImageEnhance.Contrast(pil_image)
-        pil_image = enhancer.enhance(1.3)
+        # レスポンスはリクエストと同じ順序で返る
+        responses = result.get('responses', [])
+        annotations = []
+        for index in range(image_count):
+            image_response = responses[index] if index < len(responses) else {}
+            if 'error' in image_response:
+                annotations.append(Exception(f"Vision API エラー: {image_response['error'].get('message', '')}"))
+                continue
+            text_annotations = image_response.get('textAnnotations', [])
+            annotations.append({
+                'text': text_annotations[0]['description'] if text_annotations else "",
+                # 先頭は全文なので2件目以降が単語ごとの結果
+                'words': [
+                    {
+                        'text': annotation.get('description', ''),
+                        'box': cls._vertices_to_box([
+                            (vertex.get('x', 0), vertex.get('y', 0))
+                            for vertex in annotation.get('boundingPoly', {}).get('vertices', [])
+                        ])
+                    }
+                    for annotation in text_annotations[1:]
+                ]
+            })
+        return annotations
+    
+    def _annotate_with_client(self, images_bytes: List[bytes]) -> List[Union[Dict, Exception]]:
+        """Vision API（クライアントライブラリ）に複数画像を1リクエストで送信し、画像ごとの結果を返す"""
+        from google.cloud import vision
         
-        # 明度調整
-        brightness_enhancer = ImageEnhance.Brightness(pil_image)
-        pil_image = brightness_enhancer.enhance(1.1)
+        # テキスト検出（日本語と英語対応）
+        requests_list = [
+            vision.AnnotateImageRequest(
+                image=vision.Image(content=image_bytes),
+                features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)],
+                image_context=vision.ImageContext(language_hints=['ja', 'en'])
+            )
+            for image_bytes in images_bytes
+        ]
+        response = self.vision_client.batch_annotate_images(requests=requests_list)
         
-        # バイト形式に変換
-        img_byte_arr = io.BytesIO()
-        pil_image.save(img_byte_arr, format='PNG')
-        return img_byte_arr.getvalue()
+        annotations = []
+        for image_response in response.responses:
+            if image_response.error.message:
+                annotations.append(Exception(f'Vision API エラー: {image_response.error.message}'))
+                continue
+            text_annotations = image_response.text_annotations
+            annotations.append({
+                'text': text_annotations[0].description if text_annotations else "",
+                'words': [
+                    {
+                        'text': annotation.description,
+                        'box': self._vertices_to_box([(vertex.x, vertex.y) for vertex in annotation.bounding_poly.vertices])
+                    }
+                    for annotation in text_annotations[1:]
+                ]
+            })
+        return annotations
     
-    def extract_text_with_vision_api_key(self, image: np.ndarray) -> str:
-        """Google Vision API（APIキー認証）でテキスト抽出"""
+    @staticmethod
+    def _vertices_to_box(vertices: List) -> tuple:
+        """外接多角形の頂点を(左, 上, 右, 下)のピクセル座標に変換"""
+        if not vertices:
+            return (0, 0, 0, 0)
+        xs = [x for x, _ in vertices]
+        ys = [y for _, y in vertices]
+        return (min(xs), min(ys), max(xs), max(ys))
+    
+    def _normalize_annotation(self, payload: ImagePayload, annotation: Dict) -> Dict:
+        """単語の位置を元画像に対する比率に変換"""
+        for word in annotation['words']:
+            word['box'] = payload.to_original_box(word['box'])
+        return annotation
+    
+    def _annotate_payload(self, payload: ImagePayload) -> Dict:
+        """1枚をVision APIで解析（認証方式に応じて分岐）"""
+        annotate = self._annotate_with_api_key if self.use_api_key else self._annotate_with_client
         try:
-            # 画像を前処理
-            image_bytes = self.preprocess_image_for_vision(image)
-            
-            # Base64エンコード
-            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-            
-            # Vision API REST リクエスト
-            url = f"https://vision.googleapis.com/v1/images:annotate?key={self.vision_api_key}"
-            
-            payload = {
-                "requests": [{
-                    "image": {
-                        "content": image_base64
-                    },
-                    "features": [{
-                        "type": "TEXT_DETECTION",
-                        "maxResults": 50
-                    }],
-                    "imageContext": {
-                        "languageHints": ["ja", "en"]
-                    }
-                }]
-            }
-            
-            response = requests.post(url, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            # エラーチェック
-            if 'error' in result:
-                raise Exception(f"Vision API エラー: {result['error']['message']}")
-            
-            # テキスト抽出
-            responses = result.get('responses', [])
-            if responses and 'textAnnotations' in responses[0]:
-                text_annotations = responses[0]['textAnnotations']
-                if text_annotations:
-                    return text_annotations[0]['description']
-            
-            return ""
-            
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Vision API リクエストエラー: {e}")
+            annotation = annotate([payload.vision_bytes()])[0]
         except Exception as e:
             raise Exception(f"Vision API エラー: {e}")
+        if isinstance(annotation, Exception):
+            raise annotation
+        return self._normalize_annotation(payload, annotation)
+    
+    def _prepare_vision_crop(self, payload: ImagePayload) -> bool:
+        """OCR前に切り出し範囲を設定し、過去に検出したパネル位置を使ったかを返す"""
+        import panel_cropper
+        
+        crop_box, from_layout = panel_cropper.initial_crop(payload.image)
+        payload.set_crop(crop_box)
+        return from_layout
     
-    def extract_text_with_vision_client(self, image: np.ndarray) -> str:
+    def extract_text_with_vision_api_key(self, image) -> str:
+        """Google Vision API（APIキー認証）でテキスト抽出"""
+        return self._annotate_payload(self._as_payload(image))['text']
+    
+    def extract_text_with_vision_client(self, image) -> str:
         """Google Vision API（サービスアカウント認証）でテキスト抽出"""
-        try:
-            from google.cloud import vision
-            
-            # 画像を前処理
-            image_bytes = self.preprocess_image_for_vision(image)
-            
-            # Vision APIリクエスト
-            image_obj = vision.Image(content=image_bytes)
-            
-            # テキスト検出（日本語と英語対応）
-            response = self.vision_client.text_detection(
-                image=image_obj,
-                image_context=vision.ImageContext(
-                    language_hints=['ja', 'en']
-                )
-            )
-            
-            # エラーチェック
-            if response.error.message:
-                raise Exception(f'Vision API エラー: {response.error.message}')
-            
-            # テキスト抽出
-            texts = response.text_annotations
-            if texts:
-                return texts[0].description
-            else:
-                return ""
-        except Exception as e:
-            raise Exception(f"Vision API エラー: {e}")
+        return self._annotate_payload(self._as_payload(image))['text']
+    
+    @timed('vision.ocr_batch', 'api')
+    def extract_texts_with_vision_api(self, images: List) -> List[Union[Dict, Exception]]:
+        """複数画像をまとめてテキスト抽出（最大16枚ずつ1リクエスト、結果・エラーは画像ごとに返す）"""
+        import panel_cropper
+        
+        payloads = [self._as_payload(image) for image in images]
+        from_layouts = [self._prepare_vision_crop(payload) for payload in payloads]
+        results = self._annotate_in_chunks(payloads)
+        
+        # 過去のパネル位置で切り出して点数が読めなかった画像は、画像全体で読み直す
+        retry_indexes = [
+            index for index, annotation in enumerate(results)
+            if from_layouts[index] and self._needs_full_image(annotation)
+        ]
+        for index in retry_indexes:
+            panel_cropper.forget_layout(payloads[index].image.size)
+            payloads[index].set_crop(None)
+        if retry_indexes:
+            retried = self._annotate_in_chunks([payloads[index] for index in retry_indexes])
+            for index, annotation in zip(retry_indexes, retried):
+                results[index] = annotation
+        return results
+    
+    def _annotate_in_chunks(self, payloads: List[ImagePayload]) -> List[Union[Dict, Exception]]:
+        """枚数とデータ量の上限に収まるようにリクエストを分割してVision APIで解析"""
+        from rate_limiter import get_vision_limiter
+        
+        annotate = self._annotate_with_api_key if self.use_api_key else self._annotate_with_client
+        
+        chunks: List[List[ImagePayload]] = []
+        chunk_bytes = 0
+        for payload in payloads:
+            encoded_size = len(payload.vision_bytes()) * 4 // 3
+            if not chunks or len(chunks[-1]) >= VISION_BATCH_SIZE or chunk_bytes + encoded_size > VISION_BATCH_MAX_BYTES:
+                chunks.append([])
+                chunk_bytes = 0
+            chunks[-1].append(payload)
+            chunk_bytes += encoded_size
+        
+        results: List[Union[Dict, Exception]] = []
+        for chunk in chunks:
+            # 利用上限は画像単位で数えられるため、含まれる枚数分のトークンを取得
+            for _ in chunk:
+                get_vision_limiter().acquire()
+            try:
+                annotations = annotate([payload.vision_bytes() for payload in chunk])
+            except Exception as e:
+                # リクエスト全体が失敗した場合は含まれる全画像をエラーにする
+                results.extend([Exception(f"Vision API エラー: {e}")] * len(chunk))
+                continue
+            for payload, annotation in zip(chunk, annotations):
+                if not isinstance(annotation, Exception):
+                    annotation = self._normalize_annotation(payload, annotation)
+                results.append(annotation)
+        return results
+    
+    @staticmethod
+    def _needs_full_image(annotation: Union[Dict, Exception]) -> bool:
+        """切り出した範囲に点数が十分に写っていないか"""
+        import panel_cropper
+        
+        if isinstance(annotation, Exception):
+            return False
+        return len(panel_cropper.find_score_words(annotation['words'])) < panel_cropper.MIN_SCORE_WORDS
     
-    def extract_text_with_vision_api(self, image: np.ndarray) -> str:
+    @timed('vision.ocr', 'api')
+    def extract_annotations_with_vision_api(self, image) -> Dict:
+        """Vision APIでテキストと単語ごとの位置を抽出（結果パネルを切り出してから送信）"""
+        import panel_cropper
+        
+        payload = self._as_payload(image)
+        from_layout = self._prepare_vision_crop(payload)
+        annotation = self._annotate_payload(payload)
+        
+        # 過去のパネル位置で切り出して点数が読めなければ、画像全体で読み直す
+        if from_layout and self._needs_full_image(annotation):
+            panel_cropper.forget_layout(payload.image.size)
+            payload.set_crop(None)
+            annotation = self._annotate_payload(payload)
+        return annotation
+    
+    def extract_text_with_vision_api(self, image) -> str:
         """Vision APIでテキスト抽出（認証方式に応じて分岐）"""
-        if self.use_api_key:
-            return self.extract_text_with_vision_api_key(image)
-        else:
-            return self.extract_text_with_vision_client(image)
+        return self.extract_annotations_with_vision_api(image)['text']
     
-    def analyze_with_chatgpt(self, extracted_text: str, image_base64: str) -> Dict:
-        """ChatGPT APIで画像とテキストを解析"""
-        try:
-            client = openai.OpenAI(api_key=self.openai_api_key)
-            
-            prompt = f"""
+    def _prepare_gpt_image(self, payload: ImagePayload, annotation: Dict) -> str:
+        """結果パネルを切り出したGPT用のdata URL"""
+        self.crop_to_panel(payload, annotation)
+        return payload.gpt_data_url()
+    
+    def crop_to_panel(self, payload: ImagePayload, annotation: Dict):
+        """OCR結果の位置から結果パネルを特定し、以降のGPT用画像をその範囲に切り出す"""
+        import panel_cropper
+        
+        panel_box = panel_cropper.locate_panel(annotation['words'])
+        if panel_box is None:
+            # パネルが見つからなければ画像全体を送る
+            payload.set_crop(None)
+            return
+        panel_cropper.remember_layout(payload.image.size, panel_box)
+        payload.set_crop(panel_box)
+    
+    @staticmethod
+    def _build_chatgpt_request(extracted_text: str, image_data_url: str) -> Dict:
+        """ChatGPT APIのリクエスト内容"""
+        prompt = f"""
 麻雀アプリ「雀魂」のスクリーンショットから、4名のプレイヤーのニックネームと点数を抽出してください。
 
 抽出されたテキスト:
@@ -193,105 +337,235 @@ class MahjongScoreExtractor:
 - プレイヤーが4名未満の場合は空のnicknameで埋める
 - JSONのみを返してください
 """
-
-            # ChatGPT APIリクエスト
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}"
-                                }
+        
+        request = {
+            'model': "gpt-4o",
+            'messages': [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": image_data_url
                             }
-                        ]
-                    }
-                ],
-                max_tokens=1000,
-                temperature=0.1  # 一貫性を高めるため低い温度設定
-            )
+                        }
+                    ]
+                }
+            ],
+            'max_tokens': 1000,
+            'temperature': 0.1  # 一貫性を高めるため低い温度設定
+        }
+        
+        if STRUCTURED_OUTPUT_ENABLED:
+            from analysis_schema import ANALYSIS_JSON_SCHEMA
+            request['response_format'] = {'type': 'json_schema', 'json_schema': ANALYSIS_JSON_SCHEMA}
+        return request
+    
+    @staticmethod
+    def _build_retry_request(request: Dict, result_text: str, error: Exception) -> Dict:
+        """検証に失敗した応答とその理由を伝えて出力し直してもらうリクエスト"""
+        return dict(request, messages=request['messages'] + [
+            {"role": "assistant", "content": result_text},
+            {"role": "user", "content": f"前回の応答は形式が正しくありませんでした（{error}）。指定のJSON形式で出力し直してください。"}
+        ])
+    
+    @staticmethod
+    def _read_chatgpt_message(response) -> str:
+        """応答本文を取得（回答を拒否された場合はエラー）"""
+        message = response.choices[0].message
+        if getattr(message, 'refusal', None):
+            raise Exception(f"解析を拒否されました: {message.refusal}")
+        return (message.content or '').strip()
+    
+    @staticmethod
+    def _parse_chatgpt_response(result_text: str) -> Dict:
+        """ChatGPTの応答を検証して結果に変換"""
+        if STRUCTURED_OUTPUT_ENABLED:
+            from analysis_schema import parse_analysis
+            return parse_analysis(result_text).to_dict()
+        
+        try:
+            # JSONブロックを探す
+            json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
+            if json_match:
+                return json.loads(json_match.group())
+            else:
+                raise SchemaValidationError("JSONレスポンスが見つかりません")
+        except json.JSONDecodeError as e:
+            raise SchemaValidationError(f"JSON解析エラー: {e}")
+    
+    @timed('openai.analyze', 'api')
+    def analyze_with_chatgpt(self, extracted_text: str, image_data_url: str) -> Dict:
+        """ChatGPT APIで画像とテキストを解析"""
+        try:
+            from api_clients import get_openai_client
             
-            result_text = response.choices[0].message.content.strip()
+            client = get_openai_client(self.openai_api_key)
+            request = self._build_chatgpt_request(extracted_text, image_data_url)
             
-            # JSON抽出
-            try:
-                # JSONブロックを探す
-                json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-                if json_match:
-                    result_json = json.loads(json_match.group())
-                    return result_json
-                else:
-                    raise Exception("JSONレスポンスが見つかりません")
-            except json.JSONDecodeError as e:
-                raise Exception(f"JSON解析エラー: {e}")
+            # ChatGPT APIリクエスト（形式が不正な応答は1回だけ出力し直してもらう）
+            for attempt in range(STRUCTURED_OUTPUT_RETRIES + 1):
+                response = client.chat.completions.create(**request)
+                result_text = self._read_chatgpt_message(response)
+                try:
+                    return self._parse_chatgpt_response(result_text)
+                except SchemaValidationError as e:
+                    if attempt == STRUCTURED_OUTPUT_RETRIES:
+                        raise
+                    request = self._build_retry_request(request, result_text, e)
         except Exception as e:
             raise Exception(f"ChatGPT API エラー: {e}")
     
-    def image_to_base64(self, image: np.ndarray) -> str:
-        """画像をBase64エンコード"""
-        # numpy配列をPIL Imageに変換
-        if image.dtype != np.uint8:
-            image = image.astype(np.uint8)
+    def image_to_base64(self, image) -> str:
+        """画像をBase64エンコード（元のアップロードが使える場合は再エンコードしない）"""
+        data, _ = self._as_payload(image).gpt_image()
+        return base64.b64encode(data).decode('utf-8')
+    
+    def analyze_image(self, image, use_cache: bool = True, vision_annotation: Optional[Dict] = None) -> Dict:
+        """メイン解析関数（スピナーなし版、一括OCR済みの結果があればVision APIを省略）"""
+        # アップロードのバイト列・PIL画像・NumPy配列のいずれも受け付け、エンコードは各用途1回まで
+        payload = self._as_payload(image)
+        
+        # 同じ画像を解析済みならAPIを呼ばずに返す
+        if use_cache:
+            cached_result = self._lookup_cached_result(payload)
+            if cached_result is not None:
+                return cached_result
+        
+        result = self._analyze_payload(payload, vision_annotation, use_cache)
+        
+        if use_cache:
+            import analysis_cache
+            analysis_cache.store(payload, result)
+        return result
+    
+    def get_cached_result(self, image) -> Optional[Dict]:
+        """解析済みの画像であればキャッシュされた結果を返す"""
+        return self._lookup_cached_result(self._as_payload(image))
+    
+    def _lookup_cached_result(self, payload: ImagePayload) -> Optional[Dict]:
+        """解析結果キャッシュを照合"""
+        import analysis_cache
+        from perf_monitor import phase
+        
+        try:
+            with phase('analysis_cache.lookup', 'cache'):
+                return analysis_cache.lookup(payload)
+        except Exception:
+            return None
+    
+    def _lookup_similar_result(self, payload: ImagePayload, extracted_text: str) -> Optional[Dict]:
+        """再圧縮・リサイズされた同じ画像の解析結果を照合（OCRのテキストが一致する場合のみ）"""
+        import analysis_cache
+        from perf_monitor import phase
         
-        pil_image = Image.fromarray(image)
-        buffer = io.BytesIO()
-        pil_image.save(buffer, format='PNG')
-        return base64.b64encode(buffer.getvalue()).decode('utf-8')
+        if not analysis_cache.ANALYSIS_CACHE_PERCEPTUAL:
+            return None
+        try:
+            with phase('analysis_cache.lookup_similar', 'cache'):
+                return analysis_cache.lookup_similar(payload, extracted_text)
+        except Exception:
+            return None
     
-    def analyze_image(self, image: np.ndarray) -> Dict:
-        """メイン解析関数（スピナーなし版）"""
+    def _analyze_payload(self, payload: ImagePayload, vision_annotation: Optional[Dict] = None,
+                         use_cache: bool = True) -> Dict:
+        """Vision APIとChatGPTで解析"""
+        from rate_limiter import get_openai_limiter, get_vision_limiter
+        
         try:
-            # Step 1: Google Vision APIでテキスト抽出
-            extracted_text = self.extract_text_with_vision_api(image)
+            # Step 1: Google Vision APIでテキスト抽出（一括解析時もプロバイダーごとの上限を守る）
+            if vision_annotation is None:
+                get_vision_limiter().acquire()
+                vision_annotation = self.extract_annotations_with_vision_api(payload)
+            extracted_text = vision_annotation['text']
             
             if not extracted_text.strip():
-                return {
-                    'success': False,
-                    'message': 'テキストが検出されませんでした',
-                    'players': [],
-                    'extracted_text': '',
-                    'confidence': 0.0
-                }
+                return self._no_text_result(payload)
             
-            # Step 2: 画像をBase64エンコード
-            image_base64 = self.image_to_base64(image)
+            if use_cache:
+                similar_result = self._lookup_similar_result(payload, extracted_text)
+                if similar_result is not None:
+                    return similar_result
             
-            # Step 3: ChatGPT APIで解析
-            ai_result = self.analyze_with_chatgpt(extracted_text, image_base64)
+            # Step 2: 単語の位置から名前と点数を組み合わせ、点数合計が合えばGPTを省略
+            ai_result = self._parse_vision_annotation(vision_annotation)
+            method = 'ocr'
             
-            # プレイヤーデータが4名未満の場合は空データで埋める
-            players = ai_result.get('players', [])
-            while len(players) < 4:
-                players.append({'nickname': '', 'score': 25000})
+            if ai_result is None:
+                # Step 3: 結果パネルだけを切り出してdata URLに変換（切り出せない場合は元のアップロードをそのまま使用）
+                image_data_url = self._prepare_gpt_image(payload, vision_annotation)
+                
+                # Step 4: ChatGPT APIで解析
+                get_openai_limiter().acquire()
+                ai_result = self.analyze_with_chatgpt(extracted_text, image_data_url)
+                method = 'gpt'
             
-            # 4名を超える場合は切り詰め
-            players = players[:4]
-            
-            return {
-                'success': True,
-                'message': '解析完了',
-                'players': players,
-                'extracted_text': extracted_text,
-                'confidence': ai_result.get('confidence', 0.8),
-                'notes': ai_result.get('notes', '')
-            }
+            return self._build_result(ai_result, extracted_text, method, payload)
             
         except Exception as e:
-            error_message = str(e)
-            
-            return {
-                'success': False,
-                'message': f'解析エラー: {error_message}',
-                'players': [
-                    {'nickname': '', 'score': 25000},
-                    {'nickname': '', 'score': 25000},
-                    {'nickname': '', 'score': 25000},
-                    {'nickname': '', 'score': 25000}
-                ],
-                'extracted_text': '',
-                'confidence': 0.0
-            }
\ No newline at end of file
+            return self.error_result(e)
+    
+    @staticmethod
+    def _build_result(ai_result: Dict, extracted_text: str, method: str, payload: ImagePayload) -> Dict:
+        """解析結果を画面表示用の形式に整形"""
+        # プレイヤーデータが4名未満の場合は空データで埋める
+        players = ai_result.get('players', [])
+        while len(players) < 4:
+            players.append({'nickname': '', 'score': 25000})
+        
+        # 4名を超える場合は切り詰め
+        players = players[:4]
+        
+        return {
+            'success': True,
+            'message': '解析完了',
+            'players': players,
+            'extracted_text': extracted_text,
+            'confidence': ai_result.get('confidence', 0.8),
+            'notes': ai_result.get('notes', ''),
+            'method': method,
+            'encoding_stats': payload.stats
+        }
+    
+    @staticmethod
+    def _no_text_result(payload: ImagePayload) -> Dict:
+        """テキストが検出されなかった場合の結果"""
+        return {
+            'success': False,
+            'message': 'テキストが検出されませんでした',
+            'players': [],
+            'extracted_text': '',
+            'confidence': 0.0,
+            'encoding_stats': payload.stats
+        }
+    
+    def _parse_vision_annotation(self, vision_annotation: Dict) -> Optional[Dict]:
+        """OCR結果だけで確実に読み取れた場合はその結果を返す"""
+        import ocr_parser
+        from perf_monitor import phase
+        
+        if not ocr_parser.OCR_FAST_PATH_ENABLED:
+            return None
+        try:
+            with phase('ocr.parse', 'analysis'):
+                return ocr_parser.parse_players(vision_annotation['words'])
+        except Exception:
+            return None
+    
+    @staticmethod
+    def error_result(error: Exception) -> Dict:
+        """解析失敗時の結果"""
+        return {
+            'success': False,
+            'message': f'解析エラー: {error}',
+            'players': [
+                {'nickname': '', 'score': 25000},
+                {'nickname': '', 'score': 25000},
+                {'nickname': '', 'score': 25000},
+                {'nickname': '', 'score': 25000}
+            ],
+            'extracted_text': '',
+            'confidence': 0.0
+        }
\ No newline at end of file
@@ -0,0 +1,182 @@
+# season_cache.py - シーズンデータのメモリキャッシュ（LRU・バックグラウンド先読み）
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+# キャッシュ全体のメモリ上限（MB）
+SEASON_CACHE_MAX_BYTES = int(os.environ.get('MAHJONG_SEASON_CACHE_MB', '64')) * 1024 * 1024
+
+# 先読みするシーズン数（最近使ったシーズンと前後のシーズン）
+SEASON_PREFETCH_LIMIT = 3
+
+# 同じシーズンを再度先読みするまでの間隔（秒）
+PREFETCH_INTERVAL_SECONDS = 60
+
+# (サービスアカウント, スプレッドシートID) -> キャッシュエントリ
+_entries: "OrderedDict[tuple, Dict]" = OrderedDict()
+_total_bytes = 0
+_lock = threading.Lock()
+
+_prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='season-prefetch')
+_prefetch_started: Dict[tuple, float] = {}
+
+def _cache_key(sheets_creds: Dict, spreadsheet_id: str) -> tuple:
+    return (sheets_creds.get('client_email', ''), spreadsheet_id)
+
+def _estimate_size(value) -> int:
+    """キャッシュ値のおおよそのメモリ使用量（バイト）"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value.values())
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    df = getattr(value, 'df', value)
+    if hasattr(df, 'memory_usage'):
+        return int(df.memory_usage(deep=True).sum())
+    return sys.getsizeof(value)
+
+def _evict_locked():
+    """メモリ上限を超えた分を古い順に破棄（ロック取得済みで呼ぶ）"""
+    global _total_bytes
+    while _total_bytes > SEASON_CACHE_MAX_BYTES and len(_entries) > 1:
+        _, entry = _entries.popitem(last=False)
+        _total_bytes -= entry['size']
+
+def get_columns(sheets_creds: Dict, spreadsheet_id: str, fingerprint: Optional[str]) -> Optional[Dict[str, list]]:
+    """フィンガープリントが一致するキャッシュ済みの列データを取得"""
+    if fingerprint is None:
+        return None
+    
+    key = _cache_key(sheets_creds, spreadsheet_id)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return None
+        _entries.move_to_end(key)
+        return entry['columns']
+
+def put_columns(sheets_creds: Dict, spreadsheet_id: str, fingerprint: Optional[str], columns: Dict[str, list]):
+    """ダウンロードした列データをキャッシュ（フィンガープリント不明の場合は保存しない）"""
+    global _total_bytes
+    if fingerprint is None:
+        return
+    
+    key = _cache_key(sheets_creds, spreadsheet_id)
+    size = _estimate_size(columns)
+    with _lock:
+        previous = _entries.pop(key, None)
+        if previous is not None:
+            _total_bytes -= previous['size']
+        _entries[key] = {
+            'fingerprint': fingerprint,
+            'columns': columns,
+            'derived': {},
+            'size': size
+        }
+        _total_bytes += size
+        _evict_locked()
+
+def get_derived(sheets_creds: Dict, spreadsheet_id: str, fingerprint: Optional[str],
+                name: str, factory: Callable):
+    """キャッシュ済みシーズンから派生した値（統計など）をメモ化して取得"""
+    global _total_bytes
+    key = _cache_key(sheets_creds, spreadsheet_id)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or fingerprint is None or entry['fingerprint'] != fingerprint:
+            entry = None
+        elif name in entry['derived']:
+            _entries.move_to_end(key)
+            return entry['derived'][name]
+    
+    value = factory()
+    
+    if entry is not None:
+        size = _estimate_size(value)
+        with _lock:
+            # 計算中に差し替えられていなければ保存
+            if _entries.get(key) is entry:
+                entry['derived'][name] = value
+                entry['size'] += size
+                _total_bytes += size
+                _evict_locked()
+    return value
+
+def invalidate(sheets_creds: Dict, spreadsheet_id: str):
+    """シーズンのキャッシュを破棄"""
+    global _total_bytes
+    with _lock:
+        entry = _entries.pop(_cache_key(sheets_creds, spreadsheet_id), None)
+        if entry is not None:
+            _total_bytes -= entry['size']
+
+def fetch_season_columns(sheets_creds: Dict, spreadsheet_id: str, use_cache: bool = True,
+                         limiter=None) -> Optional[Dict]:
+    """シーズンの列データを取得（変更がなければキャッシュから、あればダウンロード。レート制限はAPI呼び出しごと）"""
+    from sheet_change_probe import probe_spreadsheet
+    from spreadsheet_manager import SpreadsheetManager
+    
+    # 読み込み前にフィンガープリントを確認（読み込み中の書き込みは次回検知される）
+    fingerprint = probe_spreadsheet(sheets_creds, spreadsheet_id, limiter=limiter)
+    
+    if use_cache:
+        columns = get_columns(sheets_creds, spreadsheet_id, fingerprint)
+        if columns is not None:
+            return {'columns': columns, 'fingerprint': fingerprint, 'cached': True}
+    
+    # 接続（スプレッドシートのメタデータ取得）と列の読み込みでそれぞれ1回ずつ
+    if limiter is not None:
+        limiter.acquire()
+    sheet_manager = SpreadsheetManager(sheets_creds)
+    if not sheet_manager.connect(spreadsheet_id):
+        return None
+    
+    # 読み込みに失敗した場合は空のシーズンとしてキャッシュしない
+    if limiter is not None:
+        limiter.acquire()
+    columns = sheet_manager.get_record_columns()
+    if columns is None:
+        return None
+    put_columns(sheets_creds, spreadsheet_id, fingerprint, columns)
+    return {'columns': columns, 'fingerprint': fingerprint, 'cached': False}
+
+def prefetch_seasons(sheets_creds: Dict, spreadsheet_ids: List[str]):
+    """指定したシーズンをバックグラウンドで先読み"""
+    now = time.time()
+    for spreadsheet_id in spreadsheet_ids[:SEASON_PREFETCH_LIMIT]:
+        key = _cache_key(sheets_creds, spreadsheet_id)
+        with _lock:
+            if now - _prefetch_started.get(key, 0) < PREFETCH_INTERVAL_SECONDS:
+                continue
+            # 間隔を過ぎた記録は不要なので、追加のついでに削除
+            for expired_key in [k for k, started in _prefetch_started.items() if now - started >= PREFETCH_INTERVAL_SECONDS]:
+                del _prefetch_started[expired_key]
+            _prefetch_started[key] = now
+        _prefetch_executor.submit(_prefetch_one, sheets_creds, spreadsheet_id)
+
+def _prefetch_one(sheets_creds: Dict, spreadsheet_id: str):
+    try:
+        fetch_season_columns(sheets_creds, spreadsheet_id)
+    except Exception:
+        pass
+
+def get_prefetch_targets(seasons: Dict, current_season: str, recent_seasons: List[str]) -> List[str]:
+    """先読み対象のスプレッドシートID（最近使ったシーズン、次に前後のシーズン）"""
+    season_keys = list(seasons.keys())
+    candidates = [key for key in recent_seasons if key != current_season]
+    
+    if current_season in season_keys:
+        index = season_keys.index(current_season)
+        for neighbor in (index - 1, index + 1):
+            if 0 <= neighbor < len(season_keys):
+                candidates.append(season_keys[neighbor])
+    
+    targets = []
+    for season_key in candidates:
+        spreadsheet_id = seasons.get(season_key, {}).get('spreadsheet_id', '')
+        if spreadsheet_id and spreadsheet_id not in targets:
+            targets.append(spreadsheet_id)
+    return targets[:SEASON_PREFETCH_LIMIT]
@@ -0,0 +1,91 @@
+# sheet_change_probe.py - スプレッドシート変更検知（軽量プローブ）
+import os
+import threading
+import time
+from typing import Dict, Optional
+from perf_monitor import timed
+
+# エンドポイント（ローカルのスタブサーバーに向ける場合は環境変数で上書き）
+DRIVE_API_BASE = os.environ.get('GOOGLE_DRIVE_API_BASE', 'https://www.googleapis.com/drive/v3')
+SHEETS_API_BASE = os.environ.get('GOOGLE_SHEETS_API_BASE', 'https://sheets.googleapis.com/v4')
+
+# プローブ結果のキャッシュ有効期間（秒）
+PROBE_TTL_SECONDS = 10
+
+PROBE_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets.readonly',
+    'https://www.googleapis.com/auth/drive.metadata.readonly'
+]
+
+# スプレッドシートID -> (確認時刻, フィンガープリント)
+_probe_cache: Dict[str, tuple] = {}
+_sessions: Dict[str, object] = {}
+_lock = threading.Lock()
+
+def _get_session(credentials_dict: Dict):
+    """サービスアカウントごとの認証済みHTTPセッションを取得"""
+    client_email = credentials_dict.get('client_email', '')
+    with _lock:
+        session = _sessions.get(client_email)
+        if session is None:
+            from google.oauth2.service_account import Credentials
+            from google.auth.transport.requests import AuthorizedSession
+            
+            credentials = Credentials.from_service_account_info(credentials_dict, scopes=PROBE_SCOPES)
+            session = AuthorizedSession(credentials)
+            _sessions[client_email] = session
+        return session
+
+@timed('sheets.probe', 'sheets')
+def probe_spreadsheet(credentials_dict: Dict, spreadsheet_id: str, use_cache: bool = True,
+                      limiter=None) -> Optional[str]:
+    """Driveの更新情報と行数からフィンガープリントを取得（失敗時はNone、レート制限はAPI呼び出しごと）"""
+    if not credentials_dict or not spreadsheet_id:
+        return None
+    
+    now = time.time()
+    if use_cache:
+        with _lock:
+            cached = _probe_cache.get(spreadsheet_id)
+        if cached and now - cached[0] < PROBE_TTL_SECONDS:
+            return cached[1]
+    
+    try:
+        session = _get_session(credentials_dict)
+        
+        # Driveのファイルメタデータ（更新日時とバージョン）
+        if limiter is not None:
+            limiter.acquire()
+        drive_response = session.get(
+            f"{DRIVE_API_BASE}/files/{spreadsheet_id}",
+            params={'fields': 'modifiedTime,version', 'supportsAllDrives': 'true'},
+            timeout=10
+        )
+        drive_response.raise_for_status()
+        metadata = drive_response.json()
+        
+        # 先頭シートのA列だけを読んで行数を確認
+        if limiter is not None:
+            limiter.acquire()
+        values_response = session.get(
+            f"{SHEETS_API_BASE}/spreadsheets/{spreadsheet_id}/values/A:A",
+            params={'majorDimension': 'COLUMNS', 'fields': 'values'},
+            timeout=10
+        )
+        values_response.raise_for_status()
+        values = values_response.json().get('values', [])
+        row_count = len(values[0]) if values else 0
+        
+        fingerprint = f"{metadata.get('version', '')}:{metadata.get('modifiedTime', '')}:{row_count}"
+        
+        with _lock:
+            _probe_cache[spreadsheet_id] = (now, fingerprint)
+        return fingerprint
+    
+    except Exception:
+        return None
+
+def invalidate_probe(spreadsheet_id: str):
+    """ローカルで書き込んだスプレッドシートのプローブ結果を破棄"""
+    with _lock:
+        _probe_cache.pop(spreadsheet_id, None)
@@ -1,8 +1,94 @@
 # spreadsheet_manager.py - プレイヤー名一括更新機能完全版
 import gspread
+import random
+import threading
+import time
+import uuid
 from google.oauth2.service_account import Credentials
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Set, Tuple, Union
+from datetime import datetime
 import streamlit as st
+from perf_monitor import timed
+
+# シートのヘッダーとアプリ内フィールド名の対応（列順）
+RECORD_COLUMNS = [
+    ("対局日", "date"),
+    ("対局時刻", "time"),
+    ("対局タイプ", "game_type"),
+    ("プレイヤー1名", "player1_name"),
+    ("プレイヤー1点数", "player1_score"),
+    ("プレイヤー2名", "player2_name"),
+    ("プレイヤー2点数", "player2_score"),
+    ("プレイヤー3名", "player3_name"),
+    ("プレイヤー3点数", "player3_score"),
+    ("プレイヤー4名", "player4_name"),
+    ("プレイヤー4点数", "player4_score"),
+    ("メモ", "notes"),
+    ("登録日時", "timestamp"),
+    ("ゲームID", "game_id")
+]
+
+# ゲームID列（非表示列、1-based）
+GAME_ID_HEADER = "ゲームID"
+GAME_ID_COLUMN = len(RECORD_COLUMNS)
+
+# 削除対象の行がずれていた場合の再試行回数
+MAX_DELETE_RETRIES = 5
+
+# ゲームID列を確認済みのスプレッドシートID（保存のたびにヘッダーを読み直さない）
+_game_id_ready_sheets: Set[str] = set()
+_game_id_lock = threading.Lock()
+
+# 数値として解析するフィールド
+SCORE_FIELDS = {"player1_score", "player2_score", "player3_score", "player4_score"}
+
+# 対局日として受け付ける日付形式
+DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d', '%Y年%m月%d日']
+
+def parse_score(value) -> Union[int, float]:
+    """点数セルの値を数値に変換（カンマ区切り・空欄対応）"""
+    if isinstance(value, (int, float)):
+        return value
+    text = str(value).strip().replace(',', '')
+    if not text:
+        return 0
+    try:
+        number = float(text)
+    except ValueError:
+        return 0
+    return int(number) if number.is_integer() else number
+
+def parse_date(value) -> str:
+    """対局日セルの値をYYYY-MM-DD形式に正規化"""
+    text = str(value).strip()
+    if not text:
+        return ''
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    # 解析できない形式はそのまま保持
+    return text
+
+def generate_game_id() -> str:
+    """対局記録の安定したIDを生成"""
+    return uuid.uuid4().hex
+
+def record_content_key(record: Dict) -> str:
+    """ゲームIDのない記録の重複判定用キー（対局日・プレイヤー名・点数）"""
+    parts = [parse_date(record.get('date', ''))]
+    for i in range(1, 5):
+        parts.append(str(record.get(f'player{i}_name', '')).strip())
+        parts.append(str(parse_score(record.get(f'player{i}_score', 0))))
+    return 'content:' + '\t'.join(parts)
+
+def record_keys(record: Dict) -> Set[str]:
+    """記録の重複判定用キー（ゲームIDがあればIDと内容の両方）"""
+    keys = {record_content_key(record)}
+    if record.get('game_id'):
+        keys.add(f"id:{record['game_id']}")
+    return keys
 
 class SpreadsheetManager:
     """Google Spreadsheet管理クラス"""
@@ -11,6 +97,8 @@ class SpreadsheetManager:
         self.credentials_dict = credentials_dict
         self.client = None
         self.sheet = None
+        self.spreadsheet_id = None
+        self._game_id_ready = False
         
         # Google Sheets APIのスコープ
         self.scopes = [
@@ -18,6 +106,7 @@ class SpreadsheetManager:
             'https://www.googleapis.com/auth/drive'
         ]
     
+    @timed('sheets.season_connect', 'sheets')
     def connect(self, spreadsheet_id: str) -> bool:
         """スプレッドシートに接続"""
         try:
@@ -35,6 +124,9 @@ class SpreadsheetManager:
             
             # スプレッドシートを開く（最初のシートを使用）
             self.sheet = self.client.open_by_key(spreadsheet_id).sheet1
+            self.spreadsheet_id = spreadsheet_id
+            with _game_id_lock:
+                self._game_id_ready = spreadsheet_id in _game_id_ready_sheets
             
             return True
             
@@ -53,15 +145,10 @@ class SpreadsheetManager:
             
             if not existing_headers:
                 # ヘッダー行を設定
-                headers = [
-                    "対局日", "対局時刻", "対局タイプ",
-                    "プレイヤー1名", "プレイヤー1点数",
-                    "プレイヤー2名", "プレイヤー2点数", 
-                    "プレイヤー3名", "プレイヤー3点数",
-                    "プレイヤー4名", "プレイヤー4点数",
-                    "メモ", "登録日時"
-                ]
+                headers = [header for header, _ in RECORD_COLUMNS]
                 self.sheet.append_row(headers)
+                self._hide_game_id_column()
+                self._mark_game_id_ready()
                 
             return True
             
@@ -69,39 +156,156 @@ class SpreadsheetManager:
             st.error(f"ヘッダー初期化エラー: {e}")
             return False
     
+    def ensure_game_id_column(self) -> bool:
+        """ゲームID列を用意し、IDのない既存行にIDを付与"""
+        if self._game_id_ready:
+            return True
+        
+        try:
+            if not self.sheet:
+                return False
+            
+            self.initialize_headers()
+            if self._game_id_ready:
+                return True
+            
+            headers = self.sheet.row_values(1)
+            id_letter = self._column_index_to_letter(GAME_ID_COLUMN)
+            
+            if len(headers) < GAME_ID_COLUMN or headers[GAME_ID_COLUMN - 1] != GAME_ID_HEADER:
+                self.sheet.update_acell(f"{id_letter}1", GAME_ID_HEADER)
+                self._hide_game_id_column()
+            
+            # IDが空の行だけを埋める（他の書き込みと衝突しないようセル単位）
+            row_count = len(self.sheet.col_values(1))
+            ids = self.sheet.col_values(GAME_ID_COLUMN)
+            updates = []
+            for row_number in range(2, row_count + 1):
+                if row_number > len(ids) or not ids[row_number - 1]:
+                    updates.append({
+                        'range': f"{id_letter}{row_number}",
+                        'values': [[generate_game_id()]]
+                    })
+            
+            if updates:
+                self.sheet.batch_update(updates)
+            
+            self._mark_game_id_ready()
+            return True
+            
+        except Exception as e:
+            st.error(f"ゲームID列初期化エラー: {e}")
+            return False
+    
+    def _mark_game_id_ready(self):
+        """ゲームID列の確認済みを記録（同じスプレッドシートへの以降の接続では確認しない）"""
+        self._game_id_ready = True
+        if self.spreadsheet_id:
+            with _game_id_lock:
+                _game_id_ready_sheets.add(self.spreadsheet_id)
+    
+    def _hide_game_id_column(self):
+        """ゲームID列を非表示にする"""
+        try:
+            self.sheet.spreadsheet.batch_update({
+                'requests': [{
+                    'updateDimensionProperties': {
+                        'range': {
+                            'sheetId': self.sheet.id,
+                            'dimension': 'COLUMNS',
+                            'startIndex': GAME_ID_COLUMN - 1,
+                            'endIndex': GAME_ID_COLUMN
+                        },
+                        'properties': {'hiddenByUser': True},
+                        'fields': 'hiddenByUser'
+                    }
+                }]
+            })
+        except Exception:
+            # 非表示にできなくてもIDの保存には影響しない
+            pass
+    
     def add_record(self, game_data: Dict) -> bool:
         """対局記録を追加"""
         try:
             if not self.sheet:
                 return False
             
-            # ヘッダーが存在しない場合は初期化
-            self.initialize_headers()
+            # ヘッダーとゲームID列を用意（接続後の初回のみ確認）
+            self.ensure_game_id_column()
             
-            # 記録データを行として追加
-            row_data = [
-                game_data.get('date', ''),
-                game_data.get('time', ''),
-                game_data.get('game_type', ''),
-                game_data.get('player1_name', ''),
-                game_data.get('player1_score', 0),
-                game_data.get('player2_name', ''),
-                game_data.get('player2_score', 0),
-                game_data.get('player3_name', ''),
-                game_data.get('player3_score', 0),
-                game_data.get('player4_name', ''),
-                game_data.get('player4_score', 0),
-                game_data.get('notes', ''),
-                game_data.get('timestamp', '')
-            ]
+            if not game_data.get('game_id'):
+                game_data['game_id'] = generate_game_id()
             
-            self.sheet.append_row(row_data)
+            # 記録データを行として追加（INSERT_ROWSで同時に追加された行を上書きしない）
+            row_data = self._record_to_row(game_data)
+            self.sheet.append_row(row_data, value_input_option='RAW', insert_data_option='INSERT_ROWS')
             return True
             
         except Exception as e:
             st.error(f"記録追加エラー: {e}")
             return False
     
+    def get_existing_record_keys(self) -> Set[str]:
+        """登録済みの記録の重複判定用キー（記録の列を1回で読み込む、失敗時は例外）"""
+        self.ensure_game_id_column()
+        columns = self._read_record_columns()
+        fields = list(columns.keys())
+        keys = set()
+        for values in zip(*columns.values()):
+            keys.update(record_keys(dict(zip(fields, values))))
+        return keys
+    
+    def add_records(self, records: List[Dict], chunk_size: int = 500,
+                    existing_keys: Optional[Set[str]] = None) -> Dict:
+        """複数の対局記録をまとめて追加し、追加件数・重複件数・未追加の記録を返す（append_rowsでチャンク単位）"""
+        result = {'added': 0, 'duplicates': 0, 'failed_records': [], 'error': None}
+        if not self.sheet or not records:
+            return result
+        
+        # 既存記録のキーを渡された場合は読み込みを省略（追加した記録のキーはそこに加える）
+        try:
+            if existing_keys is None:
+                existing_keys = self.get_existing_record_keys()
+        except Exception as e:
+            result['failed_records'] = list(records)
+            result['error'] = f"既存記録の取得に失敗しました: {e}"
+            return result
+        
+        # ゲームIDまたは内容が一致する記録はスキップ（IDのないログの再インポート対策）
+        new_records = []
+        for record in records:
+            keys = record_keys(record)
+            if keys & existing_keys:
+                result['duplicates'] += 1
+                continue
+            if not record.get('game_id'):
+                record['game_id'] = generate_game_id()
+                keys = record_keys(record)
+            existing_keys.update(keys)
+            new_records.append(record)
+        
+        for start in range(0, len(new_records), chunk_size):
+            chunk = new_records[start:start + chunk_size]
+            try:
+                rows = [self._record_to_row(record) for record in chunk]
+                self.sheet.append_rows(rows, value_input_option='RAW', insert_data_option='INSERT_ROWS')
+            except Exception as e:
+                # 途中のチャンクで失敗しても、それまでに追加した件数は正しく返す
+                result['failed_records'] = new_records[start:]
+                result['error'] = str(e)
+                break
+            result['added'] += len(rows)
+        
+        return result
+    
+    def _record_to_row(self, game_data: Dict) -> List:
+        """アプリ形式の記録をシートの行データに変換"""
+        return [
+            game_data.get(field, 0 if field in SCORE_FIELDS else '')
+            for _, field in RECORD_COLUMNS
+        ]
+    
     def get_all_records(self) -> list:
         """全ての記録を取得"""
         try:
@@ -116,41 +320,103 @@ class SpreadsheetManager:
             st.error(f"記録取得エラー: {e}")
             return []
     
-    def delete_record(self, row_number: int) -> bool:
-        """指定した行の記録を削除"""
+    def _read_raw_columns(self) -> List[List]:
+        """A列からゲームID列までを列単位で取得（各列の先頭はヘッダー、末尾の空セルは省略される）"""
+        last_letter = self._column_index_to_letter(GAME_ID_COLUMN)
+        value_ranges = self.sheet.batch_get([f"A:{last_letter}"], major_dimension='COLUMNS')
+        return [list(column) for column in value_ranges[0]] if value_ranges else []
+    
+    def _read_record_columns(self) -> Dict[str, list]:
+        """記録に必要な列だけを読み込み、列ごとの型付きリストに変換（失敗時は例外）"""
+        raw_columns = self._read_raw_columns()
+        row_count = max((len(column) for column in raw_columns), default=1) - 1
+        columns = {field: [] for _, field in RECORD_COLUMNS}
+        if row_count < 1:
+            return columns
+        
+        header_positions = {column[0]: i for i, column in enumerate(raw_columns) if column}
+        
+        for header, field in RECORD_COLUMNS:
+            col_idx = header_positions.get(header)
+            if col_idx is None:
+                # 列がない場合は既定値で埋める
+                default = 0 if field in SCORE_FIELDS else ''
+                columns[field] = [default] * row_count
+                continue
+            
+            raw_values = raw_columns[col_idx][1:]
+            raw_values.extend([''] * (row_count - len(raw_values)))
+            if field in SCORE_FIELDS:
+                columns[field] = [parse_score(value) for value in raw_values]
+            elif field == 'date':
+                columns[field] = [parse_date(value) for value in raw_values]
+            else:
+                columns[field] = raw_values
+        
+        return columns
+    
+    @timed('sheets.season_records', 'sheets')
+    def get_record_columns(self) -> Optional[Dict[str, list]]:
+        """全ての記録を列ごとの型付きリストとして取得（辞書変換なし、読み込みに失敗した場合はNone）"""
         try:
             if not self.sheet:
+                return None
+            
+            return self._read_record_columns()
+            
+        except Exception as e:
+            st.error(f"記録取得エラー: {e}")
+            return None
+    
+    def delete_record(self, game_id: str) -> bool:
+        """ゲームIDで記録を削除（削除直前に行のIDを照合し、ずれていれば探し直す）"""
+        try:
+            if not self.sheet or not game_id:
                 return False
             
-            # 行を削除（ヘッダー行を考慮して+2）
-            self.sheet.delete_rows(row_number + 2)
-            return True
+            id_letter = self._column_index_to_letter(GAME_ID_COLUMN)
+            
+            for attempt in range(MAX_DELETE_RETRIES):
+                ids = self.sheet.col_values(GAME_ID_COLUMN)
+                if game_id not in ids:
+                    st.error("記録削除エラー: 指定された記録が見つかりません")
+                    return False
+                
+                row_number = ids.index(game_id) + 1
+                
+                # 削除対象の行がまだ同じ記録か確認してから削除
+                if self.sheet.acell(f"{id_letter}{row_number}").value == game_id:
+                    self.sheet.delete_rows(row_number)
+                    return True
+                
+                # 他の書き込みで行がずれたので探し直す
+                self._backoff(attempt)
+            
+            st.error("記録削除エラー: 他の書き込みとの競合が解消しませんでした")
+            return False
             
         except Exception as e:
             st.error(f"記録削除エラー: {e}")
             return False
     
+    def _backoff(self, attempt: int):
+        """競合時の待機（指数バックオフ＋ジッター）"""
+        time.sleep(min(2.0, 0.1 * (2 ** attempt)) * random.uniform(0.5, 1.5))
+    
     def batch_update_player_names(self, old_name: str, new_name: str) -> Tuple[bool, int]:
         """指定されたプレイヤー名を一括で新しい名前に更新"""
         try:
             if not self.sheet:
                 return False, 0
             
-            # シートの全データを取得
-            all_values = self.sheet.get_all_values()
+            # 記録の列を列単位で取得
+            raw_columns = self._read_raw_columns()
             
-            if not all_values:
+            if not raw_columns:
                 return False, 0
             
-            # ヘッダー行を除いて処理
-            headers = all_values[0] if all_values else []
-            data_rows = all_values[1:] if len(all_values) > 1 else []
-            
             # プレイヤー名のカラムインデックスを特定
-            player_name_columns = []
-            for i, header in enumerate(headers):
-                if any(keyword in header for keyword in ["プレイヤー1名", "プレイヤー2名", "プレイヤー3名", "プレイヤー4名"]):
-                    player_name_columns.append(i)
+            player_name_columns = self._player_name_column_indexes(raw_columns)
             
             if not player_name_columns:
                 return False, 0
@@ -159,9 +425,9 @@ class SpreadsheetManager:
             updates = []
             update_count = 0
             
-            for row_idx, row in enumerate(data_rows):
-                for col_idx in player_name_columns:
-                    if col_idx < len(row) and row[col_idx] == old_name:
+            for col_idx in player_name_columns:
+                for row_idx, value in enumerate(raw_columns[col_idx][1:]):
+                    if value == old_name:
                         # セルの位置を計算（1-based index + ヘッダー行考慮）
                         cell_address = f"{self._column_index_to_letter(col_idx + 1)}{row_idx + 2}"
                         updates.append({
@@ -190,6 +456,14 @@ class SpreadsheetManager:
             st.error(f"プレイヤー名一括更新エラー: {e}")
             return False, 0
     
+    @staticmethod
+    def _player_name_column_indexes(raw_columns: List[List]) -> List[int]:
+        """列単位のデータからプレイヤー名の列のインデックスを特定"""
+        return [
+            i for i, column in enumerate(raw_columns)
+            if column and any(keyword in column[0] for keyword in ["プレイヤー1名", "プレイヤー2名", "プレイヤー3名", "プレイヤー4名"])
+        ]
+    
     def _column_index_to_letter(self, column_index: int) -> str:
         """カラムインデックス（1-based）をアルファベットに変換"""
         column_letter = ""
@@ -228,26 +502,17 @@ class SpreadsheetManager:
             if not self.sheet:
                 return {}
             
-            all_values = self.sheet.get_all_values()
+            raw_columns = self._read_raw_columns()
             
-            if not all_values:
+            if not raw_columns:
                 return {}
             
-            headers = all_values[0] if all_values else []
-            data_rows = all_values[1:] if len(all_values) > 1 else []
-            
-            # プレイヤー名のカラムインデックスを特定
-            player_name_columns = []
-            for i, header in enumerate(headers):
-                if any(keyword in header for keyword in ["プレイヤー1名", "プレイヤー2名", "プレイヤー3名", "プレイヤー4名"]):
-                    player_name_columns.append(i)
-            
             # プレイヤー名の出現回数をカウント
             player_counts = {}
-            for row in data_rows:
-                for col_idx in player_name_columns:
-                    if col_idx < len(row) and row[col_idx].strip():
-                        player_name = row[col_idx].strip()
+            for col_idx in self._player_name_column_indexes(raw_columns):
+                for value in raw_columns[col_idx][1:]:
+                    if value.strip():
+                        player_name = value.strip()
                         player_counts[player_name] = player_counts.get(player_name, 0) + 1
             
             return player_counts
@@ -0,0 +1,68 @@
+# startup_loader.py - 起動時データの並列プリフェッチ
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+_startup_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='startup-prefetch')
+
+def submit_prefetch(fn, *args):
+    """プリフェッチ処理をスレッドプールで開始（エラー表示のためスクリプトコンテキストを引き継ぐ）"""
+    ctx = get_script_run_ctx()
+    
+    def run():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+    
+    return _startup_executor.submit(run)
+
+def fetch_master_players(sheets_creds: Dict) -> Optional[List[str]]:
+    """プレイヤーマスタを取得（接続できない場合はNone）"""
+    from config_spreadsheet_manager import ConfigSpreadsheetManager
+    
+    config_sheet_manager = ConfigSpreadsheetManager(sheets_creds)
+    if not config_sheet_manager.connect():
+        return None
+    return config_sheet_manager.get_all_players()
+
+def prefetch_startup_data(config_manager):
+    """プレイヤーマスタと現在シーズンの対局データを並列取得し、揃ってからセッション状態に反映"""
+    sheets_creds = config_manager.load_sheets_credentials()
+    spreadsheet_id = config_manager.get_spreadsheet_id()
+    
+    # シーズン設定の読み込み中に開始済みの取得があれば引き継ぐ
+    players_future = st.session_state.pop('startup_players_future', None)
+    records_future = None
+    
+    if sheets_creds:
+        if players_future is None and 'master_players' not in st.session_state:
+            players_future = submit_prefetch(fetch_master_players, sheets_creds)
+        if spreadsheet_id:
+            from season_cache import fetch_season_columns
+            records_future = submit_prefetch(fetch_season_columns, sheets_creds, spreadsheet_id)
+    
+    wait([future for future in (players_future, records_future) if future is not None])
+    
+    # セッション状態への書き込みはメインスレッドでのみ行う
+    if players_future is not None:
+        try:
+            players = players_future.result()
+        except Exception:
+            players = None
+        st.session_state['master_players'] = players if players is not None else []
+    elif 'master_players' not in st.session_state:
+        st.session_state['master_players'] = []
+    
+    try:
+        season_data = records_future.result() if records_future is not None else None
+    except Exception:
+        season_data = None
+    
+    if season_data is not None:
+        from ui_components import apply_season_columns, prefetch_related_seasons
+        apply_season_columns(spreadsheet_id, season_data)
+        prefetch_related_seasons(config_manager, config_manager.get_current_season())
+    else:
+        st.session_state['game_records'] = []
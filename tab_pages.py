@@ -1,7 +1,6 @@
 # tab_pages.py - 完全版（不要な警告メッセージのみ削除）
 import streamlit as st
 import pandas as pd
-from PIL import Image
 from datetime import datetime, date
 from input_forms import (
     create_player_input_fields_simple,
@@ -12,16 +11,21 @@ from input_forms import (
     save_game_record,
     show_player_management
 )
-from ui_components import extract_data_from_image, display_extraction_results
+from ui_components import (
+    extract_data_from_image,
+    display_extraction_results,
+    create_score_extractor,
+    warm_up_score_extractor
+)
 from data_modals import show_data_modal, show_statistics_modal
-from player_stats_ui import show_player_statistics_modal
 
 def home_tab():
     st.header("ダッシュボード")
     
     if 'game_records' in st.session_state and st.session_state['game_records']:
         from player_manager import PlayerManager
-        player_manager = PlayerManager(st.session_state['game_records'])
+        from ui_components import get_season_derived
+        player_manager = get_season_derived('player_manager', PlayerManager)
         all_players = player_manager.get_all_player_names()
         
         # 基本統計情報
@@ -152,6 +156,8 @@ def home_tab():
         show_data_modal()
     
     if st.session_state.get('show_player_stats', False):
+        # グラフ描画（plotly）は統計表示時にのみ読み込む
+        from player_stats_ui import show_player_statistics_modal
         show_player_statistics_modal()
         if st.button("統計を閉じる", use_container_width=True):
             st.session_state['show_player_stats'] = False
@@ -164,6 +170,23 @@ def screenshot_upload_tab():
     if 'screenshot_uploader_key' not in st.session_state:
         st.session_state['screenshot_uploader_key'] = 0
     
+    # 画像を選んでいる間に接続・認証を済ませておく
+    warm_up_score_extractor()
+    
+    mode = st.radio("解析モード", ["1枚ずつ", "一括"], horizontal=True, key="screenshot_mode")
+    if mode == "一括":
+        batch_upload_section()
+    else:
+        single_upload_section()
+    
+    # 解析結果がある場合のみフォームを表示
+    if 'analysis_result' in st.session_state and st.session_state['analysis_result'] is not None:
+        result = st.session_state['analysis_result']
+        if result.get('success', False):
+            st.divider()
+            create_extraction_form()
+
+def single_upload_section():
     uploaded_file = st.file_uploader(
         "雀魂のスクリーンショットを選択",
         type=['png', 'jpg', 'jpeg'],
@@ -171,27 +194,129 @@ def screenshot_upload_tab():
     )
     
     if uploaded_file is not None:
-        image = Image.open(uploaded_file)
-        
         col1, col2 = st.columns([1, 1])
         
         with col1:
             st.subheader("アップロード画像")
-            st.image(image, use_container_width=True)
+            st.image(uploaded_file.getvalue(), use_container_width=True)
             
             if st.button("解析開始", type="primary", use_container_width=True):
-                extract_data_from_image(image)
+                # デコード済み画像ではなくアップロードされたバイト列をそのまま渡す
+                extract_data_from_image(uploaded_file)
                 st.rerun()
         
         with col2:
             pass
+
+def batch_upload_section():
+    """複数画像をまとめて解析し、完了したものから確認キューに追加"""
+    uploaded_files = st.file_uploader(
+        "雀魂のスクリーンショットを選択（複数可）",
+        type=['png', 'jpg', 'jpeg'],
+        accept_multiple_files=True,
+        key=f"batch_uploader_{st.session_state['screenshot_uploader_key']}"
+    )
     
-    # 解析結果がある場合のみフォームを表示
-    if 'analysis_result' in st.session_state and st.session_state['analysis_result'] is not None:
-        result = st.session_state['analysis_result']
-        if result.get('success', False):
-            st.divider()
-            create_extraction_form()
+    if uploaded_files and st.button(f"{len(uploaded_files)}枚を一括解析", type="primary", use_container_width=True):
+        extractor = create_score_extractor()
+        if extractor is not None:
+            from batch_analysis import submit_batch
+            
+            files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+            queue = st.session_state.setdefault('batch_review_queue', [])
+            queue.extend(submit_batch(extractor, files))
+            st.session_state['screenshot_uploader_key'] += 1
+            st.rerun()
+    
+    queue = st.session_state.get('batch_review_queue', [])
+    if not queue:
+        return
+    
+    from batch_analysis import collect_finished, pending_count
+    
+    collect_finished(queue)
+    if pending_count(queue) > 0:
+        _watch_batch_progress()
+    
+    show_batch_review_queue(queue)
+
+def _watch_batch_progress():
+    """解析中のジョブを監視し、完了した結果を順次表示（全件完了したら画面全体を再描画）"""
+    from batch_analysis import collect_finished, pending_count
+    
+    queue = st.session_state.get('batch_review_queue', [])
+    collect_finished(queue)
+    pending = pending_count(queue)
+    if pending == 0:
+        st.rerun()
+    
+    finished = len(queue) - pending
+    st.progress(finished / len(queue), text=f"解析中... {finished}/{len(queue)}枚完了")
+    for item in queue:
+        if item['status'] == 'done':
+            st.caption(f"✅ {item['name']}（{item['result'].get('elapsed_ms', 0) / 1000:.1f}秒）")
+        elif item['status'] == 'failed':
+            st.caption(f"❌ {item['name']}: {item['result'].get('message', '')}")
+
+# 対応バージョンでは解析の進捗を定期的に確認（それ以外は次回の操作時に反映）
+if hasattr(st, 'fragment'):
+    _watch_batch_progress = st.fragment(run_every=1)(_watch_batch_progress)
+
+def show_batch_review_queue(queue):
+    """解析が完了した画像を1枚ずつ確認・保存"""
+    reviewable = [item for item in queue if item['status'] != 'pending']
+    if not reviewable:
+        return
+    
+    st.subheader(f"確認待ち（{len(reviewable)}枚）")
+    labels = {
+        item['id']: f"{'✅' if item['status'] == 'done' else '❌'} {item['name']}"
+        for item in reviewable
+    }
+    
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        selected_id = st.selectbox(
+            "確認する画像",
+            list(labels.keys()),
+            format_func=lambda item_id: labels[item_id],
+            key="batch_review_select"
+        )
+    selected = next(item for item in reviewable if item['id'] == selected_id)
+    with col2:
+        if st.button("確認", use_container_width=True, disabled=selected['status'] != 'done'):
+            st.session_state['analysis_result'] = selected['result']
+            st.session_state['batch_review_item'] = selected['id']
+            # 別の画像の入力値が残らないようフォームを作り直す
+            st.session_state['screenshot_uploader_key'] += 1
+            st.rerun()
+    with col3:
+        if st.button("除外", use_container_width=True):
+            _remove_batch_item(selected['id'])
+            st.rerun()
+    
+    with st.expander("画像を表示", expanded=selected['id'] == st.session_state.get('batch_review_item')):
+        try:
+            st.image(selected['image_bytes'], use_container_width=True)
+        except Exception:
+            st.caption("画像を表示できません")
+        if selected['status'] == 'failed':
+            st.error(selected['result'].get('message', '解析に失敗しました'))
+
+def _remove_batch_item(item_id):
+    """確認キューから画像を削除"""
+    queue = st.session_state.get('batch_review_queue', [])
+    st.session_state['batch_review_queue'] = [item for item in queue if item['id'] != item_id]
+    if st.session_state.get('batch_review_item') == item_id:
+        st.session_state.pop('batch_review_item', None)
+        st.session_state['analysis_result'] = None
+
+def _finish_extraction_review():
+    """確認中の解析結果を閉じる（一括解析の場合はキューからも削除）"""
+    st.session_state['analysis_result'] = None
+    st.session_state['screenshot_uploader_key'] += 1
+    if 'batch_review_item' in st.session_state:
+        _remove_batch_item(st.session_state.pop('batch_review_item'))
 
 def create_extraction_form():
     if ('analysis_result' not in st.session_state or 
@@ -233,25 +358,21 @@ def create_extraction_form():
             clear_clicked = st.form_submit_button("クリア", use_container_width=True)
         
         if clear_clicked:
-            st.session_state['analysis_result'] = None
-            st.session_state['screenshot_uploader_key'] += 1
+            _finish_extraction_review()
             st.rerun()
         
         if submitted:
-            # 新規プレイヤーがある場合は自動登録
+            # 新規プレイヤーがある場合はまとめて自動登録
             if 'pending_new_players' in st.session_state:
-                for new_player in st.session_state['pending_new_players']:
-                    if new_player.strip():
-                        from input_forms import register_new_player
-                        register_new_player(new_player.strip())
+                from input_forms import register_new_players
+                register_new_players(st.session_state['pending_new_players'])
                 # 登録後にpending_new_playersをクリア
                 del st.session_state['pending_new_players']
             
             valid_players = [name for name in player_names if name.strip()]
             if len(valid_players) >= 1:
                 if save_game_record(player_names, scores, game_date, game_time, game_type, notes):
-                    st.session_state['analysis_result'] = None
-                    st.session_state['screenshot_uploader_key'] += 1
+                    _finish_extraction_review()
                     st.rerun()
             else:
                 st.error("少なくとも1名のプレイヤーを選択してください")
@@ -282,25 +403,113 @@ def manual_input_tab():
         submitted = st.form_submit_button("記録を保存", type="primary", use_container_width=True)
         
         if submitted:
-            # 新規プレイヤーがある場合は自動登録
-            if 'pending_new_players' in st.session_state:
-                for new_player in st.session_state['pending_new_players']:
-                    if new_player.strip():
-                        from input_forms import register_new_player
-                        register_new_player(new_player.strip())
-                # 登録後にpending_new_playersをクリア
-                del st.session_state['pending_new_players']
+            # 保留中の新規プレイヤー
+            new_players = st.session_state.pop('pending_new_players', [])
             
             # プレイヤー名の入力チェック
             valid_players = [name for name in player_names if name.strip()]
             if len(valid_players) >= 1:
-                # 新しいプレイヤー名があれば自動登録
-                register_new_players_if_needed(player_names)
+                # 保留分と入力された未登録の名前を1回の書き込みでまとめて自動登録
+                register_new_players_if_needed(new_players + valid_players)
                 
                 if save_game_record(player_names, scores, game_date, game_time, game_type, notes):
                     st.rerun()
             else:
+                register_new_players_if_needed(new_players)
                 st.error("少なくとも1名のプレイヤーを入力してください")
+    
+    st.divider()
+    bulk_import_section()
+
+def bulk_import_section():
+    """過去の対局ログ（CSV/JSON Lines）の一括インポート"""
+    with st.expander("過去データの一括インポート"):
+        st.caption("CSV / JSON Lines 形式の対局ログをまとめて現在のシーズンに登録します（JSON配列は1行1記録のJSON Linesに変換してください）")
+        
+        import_file = st.file_uploader(
+            "対局ログファイルを選択",
+            type=['csv', 'jsonl'],
+            key="bulk_import_uploader"
+        )
+        
+        if import_file is None:
+            return
+        
+        if not st.button("インポート開始", type="primary", key="bulk_import_button"):
+            return
+        
+        from config_manager import ConfigManager
+        from config_spreadsheet_manager import ConfigSpreadsheetManager
+        from spreadsheet_manager import SpreadsheetManager
+        from bulk_importer import import_game_logs
+        
+        config_manager = ConfigManager()
+        sheets_creds = config_manager.load_sheets_credentials()
+        spreadsheet_id = config_manager.get_spreadsheet_id()
+        
+        if not sheets_creds or not spreadsheet_id:
+            st.error("シーズンを作成してください")
+            return
+        
+        sheet_manager = SpreadsheetManager(sheets_creds)
+        if not sheet_manager.connect(spreadsheet_id):
+            st.error("スプレッドシートへの接続に失敗しました")
+            return
+        
+        progress_text = st.empty()
+        
+        def show_progress(progress):
+            progress_text.text(
+                f"{progress['imported']}件登録済み "
+                f"({progress['rows_per_sec']:.0f}件/秒, 無効 {progress['invalid']}件)"
+            )
+        
+        try:
+            result = import_game_logs(
+                import_file,
+                import_file.name,
+                sheet_manager,
+                ConfigSpreadsheetManager(sheets_creds),
+                default_game_type=config_manager.get_default_game_type(),
+                progress_callback=show_progress
+            )
+        except Exception as e:
+            st.error(f"インポートエラー: {e}")
+            return
+        
+        progress_text.empty()
+        if result['error']:
+            st.error(
+                f"書き込みエラーのためインポートを中断しました: {result['error']}\n\n"
+                f"{result['failed']}件が未処理です（行: {format_row_numbers(result['failed_rows'], result['failed'])}）。"
+                "登録済みの記録は再インポート時にスキップされます"
+            )
+        st.success(
+            f"{result['imported']}件をインポートしました "
+            f"({result['elapsed']:.1f}秒, {result['rows_per_sec']:.0f}件/秒)"
+        )
+        if result['duplicates']:
+            st.info(f"{result['duplicates']}件は登録済みのためスキップしました")
+        if result['invalid']:
+            st.warning(
+                f"{result['invalid']}件は日付またはプレイヤー名が不正なためスキップしました"
+                f"（行: {format_row_numbers(result['invalid_rows'], result['invalid'])}）"
+            )
+        if result['registered_players']:
+            st.info(f"新規プレイヤーを登録: {', '.join(result['registered_players'])}")
+            if 'master_players' in st.session_state:
+                del st.session_state['master_players']
+        
+        # 取り込んだデータを反映
+        from ui_components import load_season_data
+        load_season_data(config_manager, config_manager.get_current_season(), force=True)
+
+def format_row_numbers(row_numbers, total):
+    """インポート結果の行番号を表示用に整形（多い場合は先頭のみ）"""
+    text = ', '.join(str(row_number) for row_number in row_numbers)
+    if total > len(row_numbers):
+        text += f" ほか{total - len(row_numbers)}件"
+    return text
 
 def create_manual_player_input_fields(prefix="default"):
     """手動プレイヤー入力フィールド（プレイヤー未登録時用）"""
@@ -320,19 +529,14 @@ def create_manual_player_input_fields(prefix="default"):
     return player_names
 
 def register_new_players_if_needed(player_names):
-    """新しいプレイヤー名があれば自動登録"""
-    from input_forms import get_registered_players, register_new_player
-    
-    existing_players = get_registered_players()
+    """新しいプレイヤー名があれば1回の書き込みでまとめて自動登録"""
+    from input_forms import register_new_players
     
-    for name in player_names:
-        if name.strip() and name.strip() not in existing_players:
-            try:
-                # プレイヤーを自動登録（エラーメッセージは表示しない）
-                register_new_player(name.strip())
-            except:
-                # 登録に失敗してもプロセスを継続
-                pass
+    try:
+        register_new_players(player_names)
+    except:
+        # 登録に失敗してもプロセスを継続
+        pass
 
 def player_management_tab():
     """プレイヤー管理タブ"""
@@ -0,0 +1,126 @@
+# fake_gspread.py - 設定スプレッドシートのテスト用のメモリ上のgspread偽物（API呼び出し回数を記録）
+import threading
+from collections import Counter
+from typing import Dict, List
+
+import gspread
+
+def _parse_cell(label: str) -> tuple:
+    """'B5' -> (行, 列)（1-based）"""
+    return gspread.utils.a1_to_rowcol(label)
+
+class FakeWorksheet:
+    """行の値を保持するワークシート"""
+    
+    def __init__(self, spreadsheet: 'FakeSpreadsheet', title: str, rows: List[List[str]] = None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = [list(row) for row in rows or []]
+        self.col_count = 26
+    
+    def _call(self, name: str):
+        self.spreadsheet.calls[name] += 1
+    
+    def row_values(self, row: int) -> List[str]:
+        self._call('row_values')
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+    
+    def get_all_values(self) -> List[List[str]]:
+        self._call('get_all_values')
+        return [list(row) for row in self.rows]
+    
+    def _appended_range(self, first_row: int, count: int) -> Dict:
+        return {'updates': {'updatedRange': f"'{self.title}'!A{first_row}:D{first_row + count - 1}"}}
+    
+    def append_row(self, values, insert_data_option=None) -> Dict:
+        self._call('append_row')
+        self.rows.append([str(value) for value in values])
+        return self._appended_range(len(self.rows), 1)
+    
+    def append_rows(self, rows, insert_data_option=None) -> Dict:
+        self._call('append_rows')
+        first_row = len(self.rows) + 1
+        self.rows.extend([str(value) for value in row] for row in rows)
+        return self._appended_range(first_row, len(rows))
+    
+    def insert_row(self, values, index: int = 1):
+        self._call('insert_row')
+        self.rows.insert(index - 1, [str(value) for value in values])
+    
+    def delete_rows(self, row: int):
+        self._call('delete_rows')
+        del self.rows[row - 1]
+    
+    def batch_update(self, updates: List[Dict]):
+        self._call('batch_update')
+        for update in updates:
+            start_row, start_col = _parse_cell(update['range'].split(':')[0])
+            for row_offset, values in enumerate(update['values']):
+                row_index = start_row + row_offset - 1
+                while len(self.rows) <= row_index:
+                    self.rows.append([])
+                row = self.rows[row_index]
+                for col_offset, value in enumerate(values):
+                    col_index = start_col + col_offset - 1
+                    row.extend([''] * (col_index + 1 - len(row)))
+                    row[col_index] = str(value)
+    
+    def batch_get(self, ranges: List[str]) -> List[List[List[str]]]:
+        self._call('batch_get')
+        results = []
+        for cell_range in ranges:
+            start, end = cell_range.split(':')
+            start_row, start_col = _parse_cell(start)
+            end_row, end_col = _parse_cell(end)
+            values = []
+            for row in self.rows[start_row - 1:end_row]:
+                values.append(row[start_col - 1:end_col])
+            results.append(values)
+        return results
+
+class FakeSpreadsheet:
+    """ワークシートの一覧と、ワークシートごとのAPI呼び出し回数"""
+    
+    def __init__(self):
+        self.sheets: List[FakeWorksheet] = []
+        self.calls: Counter = Counter()
+    
+    def worksheets(self) -> List[FakeWorksheet]:
+        self.calls['worksheets'] += 1
+        return list(self.sheets)
+    
+    def add_worksheet(self, title: str, rows: int, cols: int) -> FakeWorksheet:
+        self.calls['add_worksheet'] += 1
+        worksheet = FakeWorksheet(self, title)
+        self.sheets.append(worksheet)
+        return worksheet
+
+class FakeClient:
+    """open_by_keyで同じスプレッドシートを返すクライアント"""
+    
+    def __init__(self, spreadsheet: FakeSpreadsheet):
+        self.spreadsheet = spreadsheet
+        self.opened = 0
+        self._lock = threading.Lock()
+    
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        with self._lock:
+            self.opened += 1
+        return self.spreadsheet
+
+def reset_caches():
+    """ConfigSpreadsheetManagerのプロセス共有キャッシュを空にする"""
+    import config_spreadsheet_manager as module
+    
+    for cache in (module._player_cache, module._season_cache, module._bootstrap_cache, module._bootstrap_key_locks):
+        cache.clear()
+
+def install(monkeypatch) -> FakeClient:
+    """ConfigSpreadsheetManagerの接続先をメモリ上の偽物に差し替え"""
+    import config_spreadsheet_manager as module
+    
+    client = FakeClient(FakeSpreadsheet())
+    monkeypatch.setattr(module.Credentials, 'from_service_account_info', lambda info, scopes=None: object())
+    monkeypatch.setattr(module.gspread, 'authorize', lambda credentials: client)
+    reset_caches()
+    return client
@@ -0,0 +1,116 @@
+# stub_google_api.py - 変更検知プローブ用のDrive / Sheets APIのローカルスタブサーバー
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+STUB_ACCESS_TOKEN = 'stub-access-token'
+
+class StubGoogleApiServer:
+    """Driveのファイルメタデータ・SheetsのA列・OAuthトークンだけを返すHTTPサーバー"""
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.files: Dict[str, Dict] = {}
+        self.requests: List[str] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    @property
+    def drive_api_base(self) -> str:
+        return f"{self.base_url}/drive/v3"
+    
+    @property
+    def sheets_api_base(self) -> str:
+        return f"{self.base_url}/v4"
+    
+    @property
+    def token_uri(self) -> str:
+        return f"{self.base_url}/token"
+    
+    def set_file(self, spreadsheet_id: str, modified_time: str, version: int, row_count: int):
+        """スプレッドシートの状態を設定（row_countはヘッダー行を含むA列の行数）"""
+        with self._lock:
+            self.files[spreadsheet_id] = {
+                'modifiedTime': modified_time,
+                'version': str(version),
+                'rows': [f"row{i}" for i in range(row_count)]
+            }
+    
+    def start(self) -> 'StubGoogleApiServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self) -> 'StubGoogleApiServer':
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    def _make_handler(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def _send_json(self, status: int, body: Dict):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def do_POST(self):
+                # サービスアカウントのトークン取得（署名は検証しない）
+                length = int(self.headers.get('Content-Length', 0))
+                self.rfile.read(length)
+                if urlsplit(self.path).path != '/token':
+                    self._send_json(404, {'error': 'not found'})
+                    return
+                self._send_json(200, {'access_token': STUB_ACCESS_TOKEN, 'expires_in': 3600, 'token_type': 'Bearer'})
+            
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                with stub._lock:
+                    stub.requests.append(path)
+                    if self.headers.get('Authorization') != f"Bearer {STUB_ACCESS_TOKEN}":
+                        self._send_json(401, {'error': 'unauthorized'})
+                        return
+                    
+                    drive_match = re.fullmatch(r'/drive/v3/files/([^/]+)', path)
+                    values_match = re.fullmatch(r'/v4/spreadsheets/([^/]+)/values/A:A', path)
+                    spreadsheet_id = (drive_match or values_match).group(1) if (drive_match or values_match) else None
+                    file = stub.files.get(spreadsheet_id)
+                    if file is None:
+                        self._send_json(404, {'error': 'not found'})
+                        return
+                    
+                    if drive_match:
+                        self._send_json(200, {'modifiedTime': file['modifiedTime'], 'version': file['version']})
+                    else:
+                        self._send_json(200, {'values': [list(file['rows'])]} if file['rows'] else {})
+        
+        return Handler
+
+if __name__ == '__main__':
+    # 手動確認用: python tests/stub_google_api.py
+    with StubGoogleApiServer(port=8765) as server:
+        server.set_file('stub-sheet', '2024-01-01T00:00:00.000Z', 1, 1)
+        print(f"GOOGLE_DRIVE_API_BASE={server.drive_api_base}")
+        print(f"GOOGLE_SHEETS_API_BASE={server.sheets_api_base}")
+        print(f"token_uri={server.token_uri}")
+        threading.Event().wait()
@@ -0,0 +1,101 @@
+# stub_vision_api.py - Vision API（REST）のimages:annotateのローカルスタブサーバー
+import base64
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+class StubVisionApiServer:
+    """画像ごとに「幅x高さ」をテキストとして返すannotateエンドポイント"""
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        # 受け取ったリクエストごとの画像枚数とAPIキー、接続元のポート（keep-aliveの確認用）
+        self.batches: List[int] = []
+        self.api_keys: List[str] = []
+        self.client_ports: List[int] = []
+        # 画像単位でエラーを返す画像サイズ（エンコード後の幅, 高さ）
+        self.failing_sizes: Set[Tuple[int, int]] = set()
+        # リクエスト全体を失敗させる残り回数
+        self.failing_requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+    
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/images:annotate"
+    
+    def start(self) -> 'StubVisionApiServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self) -> 'StubVisionApiServer':
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    def _annotate(self, request: Dict) -> Dict:
+        """1枚分の応答（全文と、単語として幅と高さを返す）"""
+        image = Image.open(io.BytesIO(base64.b64decode(request['image']['content'])))
+        width, height = image.size
+        if (width, height) in self.failing_sizes:
+            return {'error': {'code': 3, 'message': f"bad image {width}x{height}"}}
+        
+        box = {'vertices': [{'x': 0, 'y': 0}, {'x': width, 'y': 0}, {'x': width, 'y': height}, {'x': 0, 'y': height}]}
+        return {
+            'textAnnotations': [
+                {'description': f"{width}x{height}", 'boundingPoly': box},
+                {'description': str(width), 'boundingPoly': box},
+                {'description': str(height), 'boundingPoly': box}
+            ]
+        }
+    
+    def _make_handler(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            # Content-Lengthを返すので接続を維持できる
+            protocol_version = 'HTTP/1.1'
+            
+            def log_message(self, *args):
+                pass
+            
+            def _send_json(self, status: int, body: Dict):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def do_POST(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if parts.path != '/v1/images:annotate':
+                    self._send_json(404, {'error': {'code': 404, 'message': 'not found'}})
+                    return
+                
+                with stub._lock:
+                    stub.batches.append(len(body.get('requests', [])))
+                    stub.api_keys.append(parse_qs(parts.query).get('key', [''])[0])
+                    stub.client_ports.append(self.client_address[1])
+                    if stub.failing_requests > 0:
+                        stub.failing_requests -= 1
+                        self._send_json(503, {'error': {'code': 503, 'message': 'unavailable'}})
+                        return
+                
+                self._send_json(200, {'responses': [stub._annotate(request) for request in body['requests']]})
+        
+        return Handler
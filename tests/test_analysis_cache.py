@@ -0,0 +1,57 @@
+# test_analysis_cache.py - 解析結果のディスクキャッシュ（最終利用時刻の更新）のテスト
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analysis_cache
+from image_encoding import ImagePayload
+
+OLD_MTIME = 1_000_000_000
+
+def _payload(width: int) -> ImagePayload:
+    """単色画像（サイズが違えば内容ハッシュは異なるが知覚ハッシュは同じ）"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, 50), 'white').save(buffer, 'PNG')
+    return ImagePayload.from_upload(buffer.getvalue())
+
+def _result(text: str):
+    return {'success': True, 'extracted_text': text, 'players': []}
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_cache, 'ANALYSIS_CACHE_PERCEPTUAL', True)
+    cache_dir = str(tmp_path / 'cache')
+    for width, text in ((100, '対局A'), (110, '対局B'), (120, '対局C')):
+        assert analysis_cache.store(_payload(width), _result(text), cache_dir)
+    for name in os.listdir(cache_dir):
+        os.utime(os.path.join(cache_dir, name), (OLD_MTIME, OLD_MTIME))
+    return cache_dir
+
+def _mtimes(cache_dir: str):
+    return {name: os.stat(os.path.join(cache_dir, name)).st_mtime for name in os.listdir(cache_dir)}
+
+def test_similar_lookup_touches_only_returned_entry(cache_dir):
+    matched = analysis_cache._entry_path(analysis_cache.content_hash(_payload(110)), cache_dir)
+    
+    result = analysis_cache.lookup_similar(_payload(130), '対局 B', cache_dir)
+    
+    assert result['extracted_text'] == '対局B'
+    assert result['cache_match'] == 'perceptual'
+    touched = [name for name, mtime in _mtimes(cache_dir).items() if mtime != OLD_MTIME]
+    assert touched == [os.path.basename(matched)]
+
+def test_similar_lookup_miss_touches_nothing(cache_dir):
+    assert analysis_cache.lookup_similar(_payload(130), '対局D', cache_dir) is None
+    assert set(_mtimes(cache_dir).values()) == {OLD_MTIME}
+
+def test_exact_lookup_touches_its_entry(cache_dir):
+    result = analysis_cache.lookup(_payload(100), cache_dir)
+    
+    assert result['cache_match'] == 'exact'
+    touched = [name for name, mtime in _mtimes(cache_dir).items() if mtime != OLD_MTIME]
+    assert touched == [os.path.basename(analysis_cache._entry_path(analysis_cache.content_hash(_payload(100)), cache_dir))]
@@ -0,0 +1,103 @@
+# test_analysis_schema.py - 解析結果のスキーマ検証とChatGPTへの再出力依頼のテスト
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_clients
+import score_extractor
+from analysis_schema import ANALYSIS_JSON_SCHEMA, SchemaValidationError, parse_analysis
+from score_extractor import MahjongScoreExtractor
+
+VALID_RESULT = {
+    'players': [{'nickname': ' Aさん ', 'score': 42000}, {'nickname': 'Bさん', 'score': -2000}],
+    'confidence': 0.9,
+    'notes': ''
+}
+
+class FakeCompletions:
+    """応答本文を順に返すchat.completionsの偽物"""
+    
+    def __init__(self, contents, refusal=None):
+        self.contents = list(contents)
+        self.refusal = refusal
+        self.requests = []
+    
+    def create(self, **request):
+        self.requests.append(request)
+        message = SimpleNamespace(content=self.contents.pop(0), refusal=self.refusal)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def _with(**changes) -> str:
+    return json.dumps(dict(VALID_RESULT, **changes), ensure_ascii=False)
+
+def test_valid_result_is_typed():
+    analysis = parse_analysis(_with())
+    
+    assert analysis.players[0].nickname == 'Aさん'
+    assert analysis.to_dict() == {
+        'players': [{'nickname': 'Aさん', 'score': 42000}, {'nickname': 'Bさん', 'score': -2000}],
+        'confidence': 0.9,
+        'notes': ''
+    }
+
+@pytest.mark.parametrize('content, message', [
+    ('not json', 'JSONとして解析できません'),
+    ('[]', 'トップレベル'),
+    (json.dumps({'players': []}), '必須項目がありません: confidence, notes'),
+    (_with(players=[]), '人数が不正'),
+    (_with(players=[{'nickname': f'P{i}', 'score': 0} for i in range(5)]), '人数が不正'),
+    (_with(players=[{'nickname': 'Aさん', 'score': '25000'}]), 'scoreが整数ではありません'),
+    (_with(players=[{'nickname': 'Aさん', 'score': True}]), 'scoreが整数ではありません'),
+    (_with(players=[{'nickname': 'Aさん', 'score': 250000}]), '範囲外'),
+    (_with(players=[{'nickname': ' ', 'score': 25000}]), 'プレイヤー名が1つも'),
+    (_with(confidence=1.5), 'confidence'),
+    (_with(notes=None), 'notes'),
+])
+def test_invalid_results_are_rejected(content, message):
+    with pytest.raises(SchemaValidationError, match=message):
+        parse_analysis(content)
+
+@pytest.fixture
+def completions(monkeypatch):
+    monkeypatch.setattr(score_extractor, 'STRUCTURED_OUTPUT_ENABLED', True)
+    fake = FakeCompletions([])
+    client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+    monkeypatch.setattr(api_clients, 'get_openai_client', lambda api_key: client)
+    return fake
+
+@pytest.fixture
+def extractor():
+    return MahjongScoreExtractor('stub-vision-key', 'stub-openai-key')
+
+def test_invalid_response_is_retried_once(completions, extractor):
+    completions.contents = [_with(confidence=2), _with()]
+    
+    result = extractor.analyze_with_chatgpt('Aさん 42000', 'data:image/png;base64,')
+    
+    assert result['players'][0] == {'nickname': 'Aさん', 'score': 42000}
+    assert len(completions.requests) == 2
+    assert completions.requests[0]['response_format'] == {'type': 'json_schema', 'json_schema': ANALYSIS_JSON_SCHEMA}
+    # 再依頼には前回の応答と検証エラーの理由を含める
+    retry_messages = completions.requests[1]['messages']
+    assert retry_messages[-2] == {'role': 'assistant', 'content': _with(confidence=2)}
+    assert 'confidence' in retry_messages[-1]['content']
+
+def test_gives_up_after_retry(completions, extractor):
+    completions.contents = ['not json', 'still not json']
+    
+    with pytest.raises(Exception, match='ChatGPT API エラー'):
+        extractor.analyze_with_chatgpt('', 'data:image/png;base64,')
+    assert len(completions.requests) == score_extractor.STRUCTURED_OUTPUT_RETRIES + 1
+
+def test_refusal_is_not_retried(completions, extractor):
+    completions.contents = ['']
+    completions.refusal = 'cannot help'
+    
+    with pytest.raises(Exception, match='解析を拒否されました'):
+        extractor.analyze_with_chatgpt('', 'data:image/png;base64,')
+    assert len(completions.requests) == 1
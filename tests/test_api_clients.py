@@ -0,0 +1,67 @@
+# test_api_clients.py - 外部APIクライアントとHTTPセッションの共有のテスト
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_clients
+import rate_limiter
+import score_extractor
+from score_extractor import MahjongScoreExtractor
+from stub_vision_api import StubVisionApiServer
+
+class NoLimiter:
+    def acquire(self, tokens: int = 1, timeout=None) -> bool:
+        return True
+
+def _image(height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (100, height), 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+@pytest.fixture
+def stub_vision(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'get_vision_limiter', lambda: NoLimiter())
+    with StubVisionApiServer() as server:
+        monkeypatch.setattr(score_extractor, 'VISION_ANNOTATE_ENDPOINT', server.endpoint)
+        yield server
+
+def test_http_session_is_shared_and_pooled():
+    session = api_clients.get_http_session()
+    
+    assert api_clients.get_http_session() is session
+    assert session.get_adapter('https://vision.googleapis.com/')._pool_maxsize == api_clients.HTTP_POOL_SIZE
+
+def test_extractors_reuse_one_keep_alive_connection(stub_vision):
+    for height in (10, 20, 30):
+        # 解析ごとに新しい抽出器を作っても接続は共有のプールから再利用する
+        extractor = MahjongScoreExtractor('stub-vision-key', 'stub-openai-key')
+        assert extractor.extract_texts_with_vision_api([_image(height)])[0]['text']
+    
+    assert len(stub_vision.client_ports) == 3
+    assert len(set(stub_vision.client_ports)) == 1
+
+def test_openai_clients_are_cached_per_key(monkeypatch):
+    monkeypatch.setattr(api_clients, '_openai_clients', {})
+    
+    first = api_clients.get_openai_client('sk-first')
+    
+    assert api_clients.get_openai_client('sk-first') is first
+    assert api_clients.get_openai_client('sk-second') is not first
+    # キャッシュのキーにAPIキーそのものは残さない
+    assert not any(key.startswith('sk-') for key in api_clients._openai_clients)
+
+def test_warm_up_runs_once_per_credential(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(api_clients, '_warmed_up', set())
+    monkeypatch.setattr(api_clients._warmup_executor, 'submit', lambda fn, *args: submitted.append(fn.__name__))
+    
+    api_clients.warm_up('vision-key', 'sk-openai')
+    api_clients.warm_up('vision-key', 'sk-openai')
+    api_clients.warm_up({'client_email': 'vision@example.com', 'private_key_id': 'key-1'}, 'sk-openai')
+    
+    assert submitted == ['_warm_up_vision', '_warm_up_openai', '_warm_up_vision']
@@ -0,0 +1,77 @@
+# test_async_extractor.py - 非同期版の抽出クラスのテスト（ローカルのVisionスタブサーバーを使用）
+import asyncio
+import inspect
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_extractor
+import panel_cropper
+import score_extractor
+from async_extractor import AsyncMahjongScoreExtractor
+from score_extractor import MahjongScoreExtractor
+from stub_vision_api import StubVisionApiServer
+
+def _image(height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (100, height), 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+@pytest.fixture
+def stub_vision(monkeypatch):
+    with StubVisionApiServer() as server:
+        monkeypatch.setattr(score_extractor, 'VISION_ANNOTATE_ENDPOINT', server.endpoint)
+        monkeypatch.setattr(async_extractor, 'VISION_ANNOTATE_ENDPOINT', server.endpoint)
+        panel_cropper._layouts.clear()
+        yield server
+
+def test_sync_methods_are_not_overridden_with_coroutines():
+    # 同期版として渡された場合に、継承したメソッドがコルーチンを返さない
+    for name, member in vars(MahjongScoreExtractor).items():
+        override = inspect.getattr_static(AsyncMahjongScoreExtractor, name)
+        if callable(member) and not name.startswith('__'):
+            assert not inspect.iscoroutinefunction(override), name
+
+def test_sync_and_async_paths_share_one_instance(stub_vision):
+    async def run():
+        async with AsyncMahjongScoreExtractor('stub-vision-key', 'stub-openai-key') as extractor:
+            annotation = await extractor.aextract_annotations_with_vision_api(_image(20))
+            # 継承した同期版の一括抽出も同じインスタンスで動く
+            batch = await asyncio.to_thread(extractor.extract_texts_with_vision_api, [_image(30), _image(40)])
+            return annotation, batch
+    
+    annotation, batch = asyncio.run(run())
+    
+    assert annotation['text'] == '1000x200'
+    assert [result['text'] for result in batch] == ['1000x300', '1000x400']
+    assert stub_vision.batches == [1, 2]
+
+def test_service_account_prepares_sync_client():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    info = {
+        'type': 'service_account',
+        'project_id': 'stub-project',
+        'private_key_id': 'stub-key',
+        'private_key': private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ).decode('utf-8'),
+        'client_email': 'async-test@stub-project.iam.gserviceaccount.com',
+        'client_id': '0',
+        'token_uri': 'http://127.0.0.1:9/token'
+    }
+    
+    extractor = AsyncMahjongScoreExtractor(info, 'stub-openai-key')
+    
+    # 同期版のメソッドが使うクライアントと、非同期版の認証情報の両方を用意する
+    assert extractor.vision_client is not None
+    assert extractor._google_credentials is not None
@@ -0,0 +1,121 @@
+# test_batch_analysis.py - 複数スクリーンショットの並列解析とレート制限のテスト
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import wait
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_analysis
+from rate_limiter import TokenBucket
+from score_extractor import MahjongScoreExtractor, VISION_BATCH_SIZE
+
+class FakeExtractor:
+    """画像の高さで結果を決める解析器の偽物"""
+    
+    def __init__(self, cached_heights=(), failing_heights=(), fail_vision=False):
+        self.cached_heights = set(cached_heights)
+        self.failing_heights = set(failing_heights)
+        self.fail_vision = fail_vision
+        self.vision_batches = []
+        self.analyzed_threads = set()
+        self._lock = threading.Lock()
+    
+    def get_cached_result(self, payload):
+        height = payload.image.size[1]
+        if height in self.cached_heights:
+            return {'success': True, 'height': height, 'cached': True}
+        return None
+    
+    def extract_texts_with_vision_api(self, payloads):
+        if self.fail_vision:
+            raise RuntimeError('vision down')
+        with self._lock:
+            self.vision_batches.append(len(payloads))
+        return [
+            Exception(f"bad image {payload.image.size[1]}") if payload.image.size[1] in self.failing_heights
+            else {'text': str(payload.image.size[1]), 'words': []}
+            for payload in payloads
+        ]
+    
+    def analyze_image(self, payload, vision_annotation=None):
+        with self._lock:
+            self.analyzed_threads.add(threading.current_thread().name)
+        return {'success': True, 'height': int(vision_annotation['text'])}
+    
+    error_result = staticmethod(MahjongScoreExtractor.error_result)
+
+def _image(height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (100, height), 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def _run(extractor, heights):
+    queue = batch_analysis.submit_batch(extractor, [(f"{height}.png", _image(height)) for height in heights])
+    wait([item['future'] for item in queue], timeout=10)
+    assert batch_analysis.collect_finished(queue) == len(heights)
+    return queue
+
+def test_results_are_routed_to_their_images():
+    extractor = FakeExtractor(cached_heights={20}, failing_heights={30})
+    
+    queue = _run(extractor, [10, 20, 30, 40])
+    
+    assert [item['status'] for item in queue] == ['done', 'done', 'failed', 'done']
+    assert [item['result'].get('height') for item in queue] == [10, 20, None, 40]
+    assert queue[1]['result']['cached'] is True
+    assert 'bad image 30' in queue[2]['result']['message']
+    # キャッシュ済みの画像はVision APIに送らない
+    assert extractor.vision_batches == [3]
+    assert all(item['result']['elapsed_ms'] >= 0 for item in queue)
+    assert batch_analysis.pending_count(queue) == 0
+
+def test_vision_requests_follow_batch_size():
+    extractor = FakeExtractor()
+    
+    _run(extractor, list(range(10, 10 + VISION_BATCH_SIZE + 3)))
+    
+    assert sorted(extractor.vision_batches) == [3, VISION_BATCH_SIZE]
+    assert all(name.startswith('batch-analysis') for name in extractor.analyzed_threads)
+
+def test_failed_vision_request_fails_its_chunk():
+    queue = _run(FakeExtractor(fail_vision=True), [10, 20])
+    
+    assert [item['status'] for item in queue] == ['failed', 'failed']
+    assert 'vision down' in queue[0]['result']['message']
+
+def test_pending_items_stay_in_queue():
+    queue = [{'status': 'pending', 'future': batch_analysis.Future()}]
+    
+    assert batch_analysis.collect_finished(queue) == 0
+    assert batch_analysis.pending_count(queue) == 1
+
+def test_token_bucket_allows_burst_then_waits():
+    bucket = TokenBucket(rate=50.0, capacity=3)
+    
+    started = time.monotonic()
+    for _ in range(3):
+        assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0)
+    
+    assert bucket.acquire(timeout=1)
+    assert time.monotonic() - started >= 0.015
+
+def test_token_bucket_is_shared_between_threads():
+    bucket = TokenBucket(rate=0.001, capacity=5)
+    granted = []
+    
+    def take():
+        granted.append(bucket.acquire(timeout=0.05))
+    
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert granted.count(True) == 5
@@ -0,0 +1,113 @@
+# test_bulk_importer.py - 過去対局データ一括インポートのテスト
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk_importer
+import season_cache
+import sheet_change_probe
+from bulk_importer import import_game_logs, iter_import_rows, normalize_batch
+
+CREDS = {'client_email': 'import-test@stub-project.iam.gserviceaccount.com'}
+SPREADSHEET_ID = 'import-sheet'
+
+CSV_TEXT = (
+    "対局日,対局タイプ,プレイヤー1名,プレイヤー1点数,プレイヤー2名,プレイヤー2点数\n"
+    "2024-01-01,四麻半荘,Aさん,\"40,000\",Bさん,10000\n"
+    "2024年1月2日,三麻東風,Cさん,35000,Aさん,35000\n"
+)
+
+class FakeSheetManager:
+    """追記した記録を保持するシーズンシートの偽物"""
+    
+    def __init__(self):
+        self.spreadsheet_id = SPREADSHEET_ID
+        self.credentials_dict = CREDS
+        self.records = []
+    
+    def get_existing_record_keys(self):
+        return set()
+    
+    def add_records(self, records, chunk_size=None, existing_keys=None):
+        self.records.extend(records)
+        return {'added': len(records), 'duplicates': 0, 'error': None, 'failed_records': []}
+
+def _jsonl(rows) -> bytes:
+    return '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows).encode('utf-8')
+
+def test_csv_rows_stream_without_closing_caller_file():
+    upload = io.BytesIO(CSV_TEXT.encode('utf-8-sig'))
+    
+    rows = list(iter_import_rows(upload, 'log.csv'))
+    
+    assert [row['プレイヤー1名'] for row in rows] == ['Aさん', 'Cさん']
+    # ラッパーを切り離しているので呼び出し元のファイルは開いたまま
+    assert not upload.closed
+    assert upload.read() == b''
+
+def test_jsonl_rows_skip_blank_lines():
+    upload = io.BytesIO(_jsonl([{'date': '2024-01-01'}]) + b'\n\n' + _jsonl([{'date': '2024-01-02'}]))
+    
+    assert [row['date'] for row in iter_import_rows(upload, 'log.JSONL')] == ['2024-01-01', '2024-01-02']
+    assert not upload.closed
+
+def test_json_array_is_rejected():
+    with pytest.raises(ValueError, match='JSON Lines'):
+        list(iter_import_rows(b'[{"date": "2024-01-01"}]', 'log.json'))
+
+def test_normalize_batch_converts_scores_dates_and_game_types():
+    rows = list(iter_import_rows(CSV_TEXT.encode('utf-8'), 'log.csv'))
+    rows.append({'対局日': '2024-01-03', '対局タイプ': '不明', 'プレイヤー1名': 'Dさん', 'プレイヤー1点数': ''})
+    
+    normalized = normalize_batch(rows, default_game_type='四麻東風', first_row=11)
+    
+    records = normalized['records']
+    assert [record['date'] for record in records] == ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert [record['player1_score'] for record in records] == [40000, 35000, 0]
+    assert [record['game_type'] for record in records] == ['四麻半荘', '三麻東風', '四麻東風']
+    assert [record['source_row'] for record in records] == [11, 12, 13]
+    assert all(record['timestamp'] for record in records)
+    assert sorted(normalized['player_names']) == ['Aさん', 'Bさん', 'Cさん', 'Dさん']
+    assert normalized['invalid_count'] == 0
+
+def test_normalize_batch_reports_invalid_rows():
+    rows = [
+        {'date': '2024-01-01', 'player1_name': 'Aさん', 'player1_score': 25000},
+        {'date': 'not a date', 'player1_name': 'Bさん'},
+        {'date': '2024-01-02', 'player1_name': '  '},
+    ]
+    
+    normalized = normalize_batch(rows, first_row=5)
+    
+    assert [record['source_row'] for record in normalized['records']] == [5]
+    assert normalized['invalid_count'] == 2
+    assert normalized['invalid_rows'] == [6, 7]
+
+def test_import_invalidates_probe_and_season_cache(monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(sheet_change_probe, 'invalidate_probe', lambda spreadsheet_id: invalidated.append(('probe', spreadsheet_id)))
+    monkeypatch.setattr(season_cache, 'invalidate', lambda creds, spreadsheet_id: invalidated.append(('season', spreadsheet_id)))
+    monkeypatch.setattr(bulk_importer, 'APPEND_CHUNK_SIZE', 2)
+    sheet_manager = FakeSheetManager()
+    rows = [{'date': f'2024-01-{day:02d}', 'player1_name': 'Aさん', 'player1_score': 25000} for day in range(1, 6)]
+    
+    result = import_game_logs(io.BytesIO(_jsonl(rows)), 'log.jsonl', sheet_manager)
+    
+    assert result['imported'] == 5
+    assert len(sheet_manager.records) == 5
+    assert invalidated == [('probe', SPREADSHEET_ID), ('season', SPREADSHEET_ID)]
+
+def test_import_without_new_rows_keeps_caches(monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(sheet_change_probe, 'invalidate_probe', lambda spreadsheet_id: invalidated.append(spreadsheet_id))
+    
+    result = import_game_logs(io.BytesIO(_jsonl([{'date': 'bad'}])), 'log.jsonl', FakeSheetManager())
+    
+    assert result['imported'] == 0
+    assert result['invalid_rows'] == [1]
+    assert invalidated == []
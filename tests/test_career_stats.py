@@ -0,0 +1,87 @@
+# test_career_stats.py - 通算成績の集計（点数計算とレート制限）のテスト
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import season_cache
+import spreadsheet_manager
+from career_stats import build_season_frame
+from scoring_config import calculate_game_score, get_player_count_from_game_type
+
+CREDS = {'client_email': 'career-test@stub-project.iam.gserviceaccount.com'}
+SPREADSHEET_ID = 'career-sheet'
+
+COLUMNS = {
+    'date': ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04'],
+    'game_type': ['四麻半荘', '三麻東風', '四麻東風', '不明なタイプ'],
+    'player1_name': ['Aさん', 'Aさん', 'Cさん', 'Aさん'],
+    'player1_score': [42000, 50000, 25000, 30000],
+    'player2_name': ['Bさん', 'Bさん', 'Dさん', 'Bさん'],
+    'player2_score': [30000, 35000, 25000, 30000],
+    'player3_name': ['Cさん', 'Cさん', 'Aさん', 'Cさん'],
+    'player3_score': [18000, 20000, 30000, 20000],
+    'player4_name': ['Dさん', '', 'Bさん', 'Dさん'],
+    'player4_score': [10000, 0, 20000, 20000]
+}
+
+class CountingLimiter:
+    """取得したトークン数を数えるだけのレート制限"""
+    
+    def __init__(self):
+        self.tokens = 0
+    
+    def acquire(self, tokens: int = 1, timeout=None) -> bool:
+        self.tokens += tokens
+        return True
+
+class FakeSpreadsheetManager:
+    """接続と列の読み込みだけを行う偽物"""
+    
+    def __init__(self, credentials_dict):
+        pass
+    
+    def connect(self, spreadsheet_id):
+        return True
+    
+    def get_record_columns(self):
+        return COLUMNS
+
+def test_game_score_matches_scoring_config():
+    frame = build_season_frame('season1', COLUMNS)
+    
+    assert len(frame) == 15
+    for row in frame.itertuples():
+        expected = calculate_game_score(
+            int(row.score), row.game_type, int(row.rank), get_player_count_from_game_type(row.game_type)
+        )
+        assert row.game_score == pytest.approx(expected)
+
+def test_each_api_call_takes_a_token(monkeypatch):
+    import sheet_change_probe
+    
+    probe_calls = []
+    
+    def fake_probe(creds, spreadsheet_id, limiter=None):
+        # プローブはDriveのメタデータとA列の2回呼び出す
+        limiter.acquire()
+        limiter.acquire()
+        probe_calls.append(spreadsheet_id)
+        return 'fingerprint-1'
+    
+    monkeypatch.setattr(sheet_change_probe, 'probe_spreadsheet', fake_probe)
+    monkeypatch.setattr(spreadsheet_manager, 'SpreadsheetManager', FakeSpreadsheetManager)
+    season_cache.invalidate(CREDS, SPREADSHEET_ID)
+    
+    limiter = CountingLimiter()
+    result = season_cache.fetch_season_columns(CREDS, SPREADSHEET_ID, limiter=limiter)
+    # プローブ2回 + 接続1回 + 読み込み1回
+    assert result['cached'] is False
+    assert limiter.tokens == 4
+    
+    limiter.tokens = 0
+    assert season_cache.fetch_season_columns(CREDS, SPREADSHEET_ID, limiter=limiter)['cached'] is True
+    assert limiter.tokens == 2
+    season_cache.invalidate(CREDS, SPREADSHEET_ID)
@@ -0,0 +1,87 @@
+# test_config_bootstrap.py - 設定スプレッドシートへの接続ブートストラップのテスト（メモリ上のgspread偽物を使用）
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_gspread
+from config_spreadsheet_manager import (
+    PLAYER_HEADERS, SEASON_HEADERS, USER_INDEX_SHEET_TITLE, ConfigSpreadsheetManager
+)
+
+CREDS = {'client_email': 'bootstrap@stub-project.iam.gserviceaccount.com'}
+OTHER_CREDS = {'client_email': 'other@stub-project.iam.gserviceaccount.com'}
+
+@pytest.fixture
+def client(monkeypatch):
+    client = fake_gspread.install(monkeypatch)
+    yield client
+    fake_gspread.reset_caches()
+
+def test_first_connect_creates_partition_with_headers(client):
+    manager = ConfigSpreadsheetManager(CREDS)
+    
+    assert manager.connect()
+    
+    titles = [sheet.title for sheet in client.spreadsheet.sheets]
+    assert titles[0] == USER_INDEX_SHEET_TITLE
+    assert manager.config_sheet.rows == [SEASON_HEADERS]
+    assert manager.player_sheet.rows == [PLAYER_HEADERS]
+
+def test_later_connects_reuse_verified_handles(client):
+    first = ConfigSpreadsheetManager(CREDS)
+    assert first.connect()
+    client.spreadsheet.calls.clear()
+    
+    second = ConfigSpreadsheetManager(CREDS)
+    assert second.connect()
+    
+    assert client.opened == 1
+    assert second.config_sheet is first.config_sheet
+    # ヘッダーの検証もワークシート一覧の取得も繰り返さない
+    assert sum(client.spreadsheet.calls.values()) == 0
+
+def test_concurrent_connects_bootstrap_once(client):
+    barrier = threading.Barrier(8)
+    results = []
+    
+    def connect():
+        barrier.wait()
+        results.append(ConfigSpreadsheetManager(CREDS).connect())
+    
+    threads = [threading.Thread(target=connect) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert results == [True] * 8
+    assert client.opened == 1
+    # 同じユーザーの専用シートは1組だけ作られる
+    assert client.spreadsheet.calls['add_worksheet'] == 3
+
+def test_each_user_is_bootstrapped_separately(client):
+    assert ConfigSpreadsheetManager(CREDS).connect()
+    assert ConfigSpreadsheetManager(OTHER_CREDS).connect()
+    
+    assert client.opened == 2
+    index_rows = client.spreadsheet.sheets[0].rows[1:]
+    assert [row[0] for row in index_rows] == [CREDS['client_email'], OTHER_CREDS['client_email']]
+
+def test_failed_write_resets_bootstrap(client):
+    manager = ConfigSpreadsheetManager(CREDS, error_sink=[])
+    assert manager.connect()
+    
+    def fail(*args, **kwargs):
+        raise RuntimeError('sheet was deleted')
+    
+    manager.player_sheet.append_rows = fail
+    assert manager.add_players(['Aさん']) == []
+    assert manager.error_sink == ["プレイヤー一括追加エラー: sheet was deleted"]
+    
+    # 次の接続では検証し直す
+    assert ConfigSpreadsheetManager(CREDS).connect()
+    assert client.opened == 2
@@ -0,0 +1,106 @@
+# test_config_snapshot.py - 設定スナップショットとバックグラウンド照合の反映のテスト
+import os
+import sys
+import threading
+from concurrent.futures import Future
+
+import pytest
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config_manager
+import config_snapshot
+import config_spreadsheet_manager
+from config_manager import ConfigManager
+
+SEASONS = {'season1': {'name': 'シーズン1', 'spreadsheet_id': 'sheet-1'}}
+
+class FakeConfigSpreadsheetManager:
+    """プレイヤー一覧の取得だけ失敗する設定スプレッドシートの偽物"""
+    
+    def __init__(self, credentials_dict=None, error_sink=None):
+        self.error_sink = error_sink
+    
+    def connect(self):
+        return True
+    
+    def load_user_seasons(self):
+        return {'seasons': SEASONS, 'current_season': 'season1'}
+    
+    def get_all_players(self):
+        self.error_sink.append("プレイヤー一覧取得エラー: quota exceeded")
+        return []
+
+@pytest.fixture
+def snapshot_file(tmp_path):
+    return str(tmp_path / 'snapshot.json')
+
+@pytest.fixture
+def session_state():
+    st.session_state.clear()
+    yield st.session_state
+    st.session_state.clear()
+
+def test_concurrent_saves_keep_every_user(snapshot_file):
+    users = [f"user{i}@example.com" for i in range(20)]
+    barrier = threading.Barrier(len(users))
+    
+    def save(user_id):
+        barrier.wait()
+        assert config_snapshot.save_snapshot(user_id, SEASONS, 'season1', [user_id], snapshot_file=snapshot_file)
+    
+    threads = [threading.Thread(target=save, args=(user_id,)) for user_id in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    for user_id in users:
+        assert config_snapshot.load_snapshot(user_id, snapshot_file=snapshot_file)['master_players'] == [user_id]
+    # 一時ファイルは残らない
+    assert sorted(os.listdir(os.path.dirname(snapshot_file))) == ['snapshot.json', 'snapshot.json.lock']
+
+def test_save_without_players_keeps_previous_players(snapshot_file):
+    config_snapshot.save_snapshot('user@example.com', SEASONS, 'season1', ['Aさん', 'Bさん'], snapshot_file=snapshot_file)
+    config_snapshot.save_snapshot('user@example.com', {}, 'season2', None, snapshot_file=snapshot_file)
+    
+    snapshot = config_snapshot.load_snapshot('user@example.com', snapshot_file=snapshot_file)
+    assert snapshot['current_season'] == 'season2'
+    assert snapshot['master_players'] == ['Aさん', 'Bさん']
+
+def test_reconcile_returns_errors_and_marks_players_unloaded(monkeypatch):
+    monkeypatch.setattr(config_spreadsheet_manager, 'ConfigSpreadsheetManager', FakeConfigSpreadsheetManager)
+    
+    reconciled = config_manager._reconcile_user_config({'client_email': 'user@example.com'})
+    
+    assert reconciled['errors'] == ["プレイヤー一覧取得エラー: quota exceeded"]
+    assert reconciled['config']['seasons'] == SEASONS
+    assert reconciled['config']['master_players'] is None
+
+def test_apply_keeps_snapshot_players_when_players_failed(monkeypatch, session_state, snapshot_file):
+    monkeypatch.setattr(config_snapshot, 'SNAPSHOT_FILE', snapshot_file)
+    saved = []
+    monkeypatch.setattr(config_manager, 'save_snapshot', lambda *args: saved.append(args))
+    shown = []
+    monkeypatch.setattr(st, 'error', shown.append)
+    
+    future = Future()
+    future.set_result({
+        'config': {'seasons': SEASONS, 'current_season': 'season1', 'master_players': None},
+        'errors': ["プレイヤー一覧取得エラー: quota exceeded"]
+    })
+    session_state['config_reconcile_future'] = future
+    session_state['master_players'] = ['Aさん', 'Bさん']
+    
+    manager = object.__new__(ConfigManager)
+    manager.config = {'google_sheets': {'seasons': SEASONS, 'current_season': 'season1'}}
+    monkeypatch.setattr(manager, '_get_sheets_credentials_dict', lambda config: {'client_email': 'user@example.com'})
+    
+    assert manager.apply_reconciled_config() is False
+    assert session_state['master_players'] == ['Aさん', 'Bさん']
+    # 取得できなかった項目があるので古い可能性ありの表示を継続
+    assert session_state['config_snapshot_stale'] is True
+    assert shown == ["プレイヤー一覧取得エラー: quota exceeded"]
+    # スナップショットにはNoneを渡して前回のプレイヤー一覧を維持させる
+    assert saved == [('user@example.com', SEASONS, 'season1', None)]
@@ -0,0 +1,71 @@
+# test_google_service.py - Google APIサービス構築（認証情報とディスカバリ文書の共有）のテスト
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config_manager
+
+def _service_account_info() -> dict:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode('utf-8')
+    return {
+        'type': 'service_account',
+        'project_id': 'stub-project',
+        'private_key_id': 'stub-key',
+        'private_key': pem,
+        'client_email': f"service-test-{os.getpid()}@stub-project.iam.gserviceaccount.com",
+        'client_id': '0',
+        'token_uri': 'https://oauth2.googleapis.com/token'
+    }
+
+@pytest.fixture
+def creds_dict(monkeypatch):
+    monkeypatch.setattr(config_manager, '_google_credentials', {})
+    monkeypatch.setattr(config_manager, '_discovery_documents', {})
+    return _service_account_info()
+
+def test_services_share_credentials_across_threads(creds_dict, monkeypatch):
+    from googleapiclient import discovery_cache
+    
+    loads = []
+    original = discovery_cache.get_static_doc
+    
+    def counting_get_static_doc(api, version):
+        loads.append((api, version))
+        return original(api, version)
+    
+    monkeypatch.setattr(discovery_cache, 'get_static_doc', counting_get_static_doc)
+    services = [config_manager._get_google_service(creds_dict, 'drive', 'v3')]
+    # Streamlitの再実行と同じく別スレッドから呼び出す
+    thread = threading.Thread(
+        target=lambda: services.append(config_manager._get_google_service(creds_dict, 'drive', 'v3'))
+    )
+    thread.start()
+    thread.join()
+    
+    assert loads == [('drive', 'v3')]
+    # HTTPトランスポートは共有しないのでサービスは別々、認証情報は同じもの
+    assert services[0] is not services[1]
+    assert services[0]._http is not services[1]._http
+    assert services[0]._http.credentials is services[1]._http.credentials
+    assert services[0].files is not None
+
+def test_each_api_gets_its_own_document(creds_dict):
+    sheets_service = config_manager._get_google_service(creds_dict, 'sheets', 'v4')
+    drive_service = config_manager._get_google_service(creds_dict, 'drive', 'v3')
+    
+    assert hasattr(sheets_service, 'spreadsheets')
+    assert hasattr(drive_service, 'permissions')
+    assert set(config_manager._discovery_documents) == {('sheets', 'v4'), ('drive', 'v3')}
+    assert len(config_manager._google_credentials) == 1
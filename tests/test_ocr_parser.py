@@ -0,0 +1,79 @@
+# test_ocr_parser.py - OCRの単語位置からのニックネーム・点数抽出のテスト
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_parser import FAST_PATH_CONFIDENCE, parse_players
+
+LINE_HEIGHT = 0.04
+
+def _word(text: str, left: float, top: float, width: float = 0.1) -> dict:
+    return {'text': text, 'box': (left, top, left + width, top + LINE_HEIGHT)}
+
+def _rows(entries, top: float = 0.2, gap: float = 0.15):
+    """1行に「順位・名前・点数」が並ぶ結果画面"""
+    words = []
+    for index, (name, score) in enumerate(entries):
+        row_top = top + index * gap
+        words.append(_word(f"{index + 1}位", 0.05, row_top, 0.05))
+        words.append(_word(name, 0.3, row_top))
+        words.append(_word(score, 0.6, row_top))
+    return words
+
+def test_names_left_of_scores():
+    words = _rows([('Aさん', '18,000'), ('Bさん', '42,000'), ('Cさん', '30,000'), ('Dさん', '10,000')])
+    
+    result = parse_players(words)
+    
+    assert result['players'] == [
+        {'nickname': 'Bさん', 'score': 42000},
+        {'nickname': 'Cさん', 'score': 30000},
+        {'nickname': 'Aさん', 'score': 18000},
+        {'nickname': 'Dさん', 'score': 10000}
+    ]
+    assert result['confidence'] == FAST_PATH_CONFIDENCE
+
+def test_names_above_scores():
+    words = []
+    for index, (name, score) in enumerate([('Aさん', '50000'), ('Bさん', '35000'), ('Cさん', '20000')]):
+        words.append(_word(name, 0.2 + index * 0.25, 0.30))
+        words.append(_word(score, 0.2 + index * 0.25, 0.36))
+    
+    result = parse_players(words)
+    
+    assert [player['nickname'] for player in result['players']] == ['Aさん', 'Bさん', 'Cさん']
+    assert '3人' in result['notes']
+
+def test_split_name_words_are_joined():
+    words = _rows([('X', '25000'), ('Y', '25000'), ('Cさん', '25000'), ('Dさん', '25000')])
+    # 名前が2つの単語に分かれて読み取られた場合（離れていれば空白を入れ、接していればそのままつなげる）
+    words[1] = _word('雀士', 0.20, 0.2, 0.06)
+    words.insert(2, _word('太郎', 0.30, 0.2, 0.06))
+    words[5] = _word('麻雀', 0.24, 0.35, 0.06)
+    words.insert(6, _word('花子', 0.30, 0.35, 0.06))
+    
+    result = parse_players(words)
+    
+    nicknames = [player['nickname'] for player in result['players']]
+    assert '雀士 太郎' in nicknames
+    assert '麻雀花子' in nicknames
+
+def test_total_mismatch_returns_none():
+    words = _rows([('Aさん', '40000'), ('Bさん', '30000'), ('Cさん', '20000'), ('Dさん', '9000')])
+    
+    assert parse_players(words) is None
+
+def test_unexpected_score_count_returns_none():
+    assert parse_players(_rows([('Aさん', '50000'), ('Bさん', '50000')])) is None
+
+def test_duplicate_names_return_none():
+    words = _rows([('Aさん', '25000'), ('Aさん', '25000'), ('Cさん', '25000'), ('Dさん', '25000')])
+    
+    assert parse_players(words) is None
+
+def test_missing_name_returns_none():
+    words = _rows([('Aさん', '25000'), ('Bさん', '25000'), ('Cさん', '25000'), ('Dさん', '25000')])
+    words = [word for word in words if word['text'] != 'Dさん']
+    
+    assert parse_players(words) is None
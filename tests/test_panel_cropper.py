@@ -0,0 +1,118 @@
+# test_panel_cropper.py - 点数パネルの切り出しとレイアウトの記憶のテスト
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import panel_cropper
+import rate_limiter
+import score_extractor
+from image_encoding import VISION_MIN_WIDTH
+from score_extractor import MahjongScoreExtractor
+from stub_vision_api import StubVisionApiServer
+
+class NoLimiter:
+    def acquire(self, tokens: int = 1, timeout=None) -> bool:
+        return True
+
+def _word(text: str, top: float, left: float = 0.4) -> dict:
+    return {'text': text, 'box': (left, top, left + 0.2, top + 0.05)}
+
+def _image(height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (100, height), 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+@pytest.fixture(autouse=True)
+def layouts():
+    panel_cropper._layouts.clear()
+    yield panel_cropper._layouts
+    panel_cropper._layouts.clear()
+
+@pytest.mark.parametrize('text, expected', [
+    ('35400', 35400), ('25,000', 25000), ('-1200', -1200), ('−3,000', -3000),
+    ('35450', None), ('1位', None), ('250000', None), ('12,34', None)
+])
+def test_parse_score(text, expected):
+    assert panel_cropper.parse_score(text) == expected
+
+def test_locate_panel_spans_scores_and_names():
+    words = [
+        _word('タイトル', 0.02),
+        _word('Aさん', 0.40, left=0.1), _word('42000', 0.40),
+        _word('Bさん', 0.50, left=0.1), _word('30000', 0.50),
+        _word('Cさん', 0.60, left=0.1), _word('28000', 0.60),
+        _word('次へ', 0.95)
+    ]
+    
+    left, top, right, bottom = panel_cropper.locate_panel(words)
+    
+    assert left == pytest.approx(0.1 - panel_cropper.PANEL_MARGIN)
+    assert right == pytest.approx(0.6 + panel_cropper.PANEL_MARGIN)
+    # 点数の並ぶ範囲を行の高さ1つ分広げた範囲（タイトルとボタンは含まない）
+    assert top == pytest.approx(0.35 - panel_cropper.PANEL_MARGIN)
+    assert bottom == pytest.approx(0.70 + panel_cropper.PANEL_MARGIN)
+
+def test_locate_panel_needs_enough_scores():
+    assert panel_cropper.locate_panel([_word('42000', 0.4), _word('30000', 0.5)]) is None
+
+def test_trim_borders_removes_solid_bands():
+    image = Image.new('RGB', (200, 400), 'black')
+    draw = ImageDraw.Draw(image)
+    # 中央だけに格子模様（余白は上下左右とも単色）
+    for offset in range(0, 200, 10):
+        draw.line([(50, 100 + offset), (149, 100 + offset)], fill='white')
+        draw.line([(50 + offset // 2, 100), (50 + offset // 2, 299)], fill='white')
+    
+    left, top, right, bottom = panel_cropper.trim_borders(image)
+    
+    assert left == pytest.approx(0.25 - panel_cropper.PANEL_MARGIN, abs=0.01)
+    assert right == pytest.approx(0.75 + panel_cropper.PANEL_MARGIN, abs=0.01)
+    assert top == pytest.approx(0.25 - panel_cropper.PANEL_MARGIN, abs=0.01)
+    assert bottom == pytest.approx(0.75 + panel_cropper.PANEL_MARGIN, abs=0.01)
+
+def test_trim_borders_keeps_images_without_borders():
+    image = Image.new('RGB', (100, 100), 'white')
+    ImageDraw.Draw(image).line([(0, 0), (99, 99)], fill='black', width=3)
+    
+    assert panel_cropper.trim_borders(image) is None
+
+def test_initial_crop_prefers_remembered_layout():
+    image = Image.new('RGB', (100, 200), 'white')
+    assert panel_cropper.initial_crop(image) == (None, False)
+    
+    panel_cropper.remember_layout(image.size, (0.1, 0.2, 0.9, 0.8))
+    assert panel_cropper.initial_crop(image) == ((0.1, 0.2, 0.9, 0.8), True)
+    
+    panel_cropper.forget_layout(image.size)
+    assert panel_cropper.initial_crop(image) == (None, False)
+
+def test_layout_memory_is_bounded_lru(monkeypatch, layouts):
+    monkeypatch.setattr(panel_cropper, 'LAYOUT_MEMORY_SIZE', 3)
+    for width in (100, 200, 300):
+        panel_cropper.remember_layout((width, 100), (0.0, 0.0, 1.0, 1.0))
+    
+    # 使ったレイアウトは最近使ったものとして残る
+    panel_cropper.initial_crop(Image.new('RGB', (100, 100)))
+    panel_cropper.remember_layout((400, 100), (0.0, 0.0, 1.0, 1.0))
+    
+    assert list(layouts) == [(300, 100), (100, 100), (400, 100)]
+
+def test_batch_retries_failed_layout_crops_on_full_image(monkeypatch, layouts):
+    monkeypatch.setattr(rate_limiter, 'get_vision_limiter', lambda: NoLimiter())
+    with StubVisionApiServer() as stub_vision:
+        monkeypatch.setattr(score_extractor, 'VISION_ANNOTATE_ENDPOINT', stub_vision.endpoint)
+        extractor = MahjongScoreExtractor('stub-vision-key', 'stub-openai-key')
+        # 1枚目だけ前回のレイアウトで切り出される（スタブの応答には点数がないので読み直しになる）
+        panel_cropper.remember_layout((100, 30), (0.0, 0.0, 0.5, 0.5))
+        
+        results = extractor.extract_texts_with_vision_api([_image(30), _image(40)])
+    
+    assert stub_vision.batches == [2, 1]
+    full_height = round(30 * VISION_MIN_WIDTH / 100)
+    assert results[0]['text'] == f"{VISION_MIN_WIDTH}x{full_height}"
+    assert (100, 30) not in layouts
@@ -0,0 +1,33 @@
+# test_player_manager.py - 列データからの統計計算のテスト
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from player_manager import PlayerManager
+from ui_components import convert_sheets_columns
+
+COLUMNS = {
+    'date': ['2024-01-01', '2024-01-02', '2024-01-03'],
+    'game_type': ['四麻東風', '四麻半荘', '三麻東風'],
+    'player1_name': ['A', 'B', 'A'],
+    'player1_score': [40000, 35000, 45000],
+    'player2_name': ['B', 'A', 'C'],
+    'player2_score': [30000, 30000, 35000],
+    'player3_name': ['C', 'C', 'B'],
+    'player3_score': [20000, 20000, 25000],
+    'player4_name': ['D', 'D', ''],
+    'player4_score': [10000, 15000, 0],
+    'game_id': ['g1', 'g2', 'g3']
+}
+
+def test_columns_and_records_give_same_statistics():
+    from_columns = PlayerManager(COLUMNS)
+    from_records = PlayerManager(convert_sheets_columns(COLUMNS))
+    
+    assert from_columns.get_all_player_names() == from_records.get_all_player_names()
+    for player_name in from_records.get_all_player_names():
+        assert from_columns.get_player_statistics(player_name) == from_records.get_player_statistics(player_name)
+
+def test_empty_columns():
+    assert PlayerManager({field: [] for field in COLUMNS}).get_all_player_names() == []
@@ -0,0 +1,79 @@
+# test_player_master.py - プレイヤーマスタの索引とTTLキャッシュのテスト（メモリ上のgspread偽物を使用）
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config_spreadsheet_manager
+import fake_gspread
+from config_spreadsheet_manager import ConfigSpreadsheetManager
+
+CREDS = {'client_email': 'player-master@stub-project.iam.gserviceaccount.com'}
+
+@pytest.fixture
+def client(monkeypatch):
+    client = fake_gspread.install(monkeypatch)
+    yield client
+    fake_gspread.reset_caches()
+
+@pytest.fixture
+def player_sheet(client):
+    manager = ConfigSpreadsheetManager(CREDS, error_sink=[])
+    assert manager.connect()
+    manager.add_players(['Aさん', 'Bさん', 'Cさん'])
+    client.spreadsheet.calls.clear()
+    return manager.player_sheet
+
+def test_index_is_shared_across_managers(client, player_sheet):
+    first = ConfigSpreadsheetManager(CREDS)
+    second = ConfigSpreadsheetManager(CREDS)
+    
+    assert first.get_all_players() == ['Aさん', 'Bさん', 'Cさん']
+    assert second.player_exists('Bさん')
+    assert second.get_player_info('Cさん')['name'] == 'Cさん'
+    # 追加時に索引へ反映済みなので、シートは読み直さない
+    assert client.spreadsheet.calls['get_all_values'] == 0
+
+def test_names_match_after_normalization(player_sheet):
+    manager = ConfigSpreadsheetManager(CREDS)
+    
+    assert manager.player_exists('Ａさん')
+    assert manager.player_exists(' Bさん ')
+    assert manager.add_players(['Ｃさん', 'Dさん', 'Dさん']) == ['Dさん']
+
+def test_expired_index_is_reloaded(client, player_sheet, monkeypatch):
+    manager = ConfigSpreadsheetManager(CREDS)
+    # 他のプロセスが追加した行はTTLが切れるまで見えない
+    player_sheet.rows.append([CREDS['client_email'], 'Eさん', '', ''])
+    assert 'Eさん' not in manager.get_all_players()
+    
+    monkeypatch.setattr(config_spreadsheet_manager, 'PLAYER_CACHE_TTL_SECONDS', 0)
+    assert 'Eさん' in manager.get_all_players()
+    assert client.spreadsheet.calls['get_all_values'] == 1
+
+def test_other_users_rows_are_ignored(player_sheet):
+    player_sheet.rows.append(['someone-else@example.com', 'Zさん', '', ''])
+    manager = ConfigSpreadsheetManager(CREDS)
+    manager.invalidate_player_cache()
+    
+    assert manager.get_all_players() == ['Aさん', 'Bさん', 'Cさん']
+
+def test_shifted_row_is_found_again_before_update(client, player_sheet):
+    manager = ConfigSpreadsheetManager(CREDS)
+    manager.get_all_players()
+    # 別のセッションが先頭のプレイヤーを削除して行がずれた
+    del player_sheet.rows[1]
+    
+    assert manager.update_player('Cさん', 'Cくん')
+    
+    assert [row[1] for row in player_sheet.rows[1:]] == ['Bさん', 'Cくん']
+    assert manager.get_all_players() == ['Bさん', 'Cくん']
+
+def test_delete_invalidates_index(client, player_sheet):
+    manager = ConfigSpreadsheetManager(CREDS)
+    
+    assert manager.delete_player('Aさん')
+    assert manager.get_all_players() == ['Bさん', 'Cさん']
+    assert client.spreadsheet.calls['get_all_values'] == 1
@@ -0,0 +1,59 @@
+# test_season_cache.py - シーズンデータのキャッシュ（読み込み失敗時の扱い）のテスト
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import season_cache
+import sheet_change_probe
+import spreadsheet_manager
+
+CREDS = {'client_email': 'season-cache-test@stub-project.iam.gserviceaccount.com'}
+SPREADSHEET_ID = 'season-sheet'
+
+class FakeSpreadsheetManager:
+    """get_record_columnsの戻り値を順に返す偽物"""
+    
+    results = []
+    reads = 0
+    
+    def __init__(self, credentials_dict):
+        pass
+    
+    def connect(self, spreadsheet_id):
+        return True
+    
+    def get_record_columns(self):
+        FakeSpreadsheetManager.reads += 1
+        return FakeSpreadsheetManager.results.pop(0)
+
+@pytest.fixture
+def fake_sheets(monkeypatch):
+    monkeypatch.setattr(sheet_change_probe, 'probe_spreadsheet', lambda creds, spreadsheet_id, limiter=None: 'fingerprint-1')
+    monkeypatch.setattr(spreadsheet_manager, 'SpreadsheetManager', FakeSpreadsheetManager)
+    FakeSpreadsheetManager.reads = 0
+    season_cache.invalidate(CREDS, SPREADSHEET_ID)
+    yield FakeSpreadsheetManager
+    season_cache.invalidate(CREDS, SPREADSHEET_ID)
+
+def test_failed_read_is_not_cached(fake_sheets):
+    columns = {'date': ['2024-01-01'], 'player1_score': [25000]}
+    fake_sheets.results = [None, columns]
+    
+    assert season_cache.fetch_season_columns(CREDS, SPREADSHEET_ID) is None
+    
+    # 同じフィンガープリントでも、失敗した読み込みは再試行される
+    result = season_cache.fetch_season_columns(CREDS, SPREADSHEET_ID)
+    assert result['columns'] == columns
+    assert result['cached'] is False
+    assert fake_sheets.reads == 2
+
+def test_successful_read_is_cached(fake_sheets):
+    columns = {'date': [], 'player1_score': []}
+    fake_sheets.results = [columns]
+    
+    assert season_cache.fetch_season_columns(CREDS, SPREADSHEET_ID)['cached'] is False
+    assert season_cache.fetch_season_columns(CREDS, SPREADSHEET_ID)['cached'] is True
+    assert fake_sheets.reads == 1
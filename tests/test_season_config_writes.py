@@ -0,0 +1,80 @@
+# test_season_config_writes.py - シーズン設定・プレイヤーの一括書き込みのテスト（メモリ上のgspread偽物を使用）
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_gspread
+from config_spreadsheet_manager import ConfigSpreadsheetManager
+
+CREDS = {'client_email': 'season-writes@stub-project.iam.gserviceaccount.com'}
+
+SEASONS = {
+    'season1': {'name': 'シーズン1', 'spreadsheet_id': 'sheet-1', 'url': 'https://example.com/1'},
+    'season2': {'name': 'シーズン2', 'spreadsheet_id': 'sheet-2', 'url': 'https://example.com/2'}
+}
+
+@pytest.fixture
+def client(monkeypatch):
+    client = fake_gspread.install(monkeypatch)
+    yield client
+    fake_gspread.reset_caches()
+
+@pytest.fixture
+def manager(client):
+    manager = ConfigSpreadsheetManager(CREDS, error_sink=[])
+    assert manager.connect()
+    assert manager.save_season_configs(SEASONS, 'season1')
+    client.spreadsheet.calls.clear()
+    return manager
+
+def _flags(manager) -> dict:
+    return {row[1]: row[5] for row in manager.config_sheet.rows[1:]}
+
+def test_new_seasons_are_appended_in_one_call(client):
+    manager = ConfigSpreadsheetManager(CREDS)
+    assert manager.connect()
+    client.spreadsheet.calls.clear()
+    
+    assert manager.save_season_configs(SEASONS, 'season1')
+    
+    assert client.spreadsheet.calls['append_rows'] == 1
+    assert _flags(manager) == {'season1': 'TRUE', 'season2': 'FALSE'}
+
+def test_unchanged_seasons_write_nothing(client, manager):
+    assert manager.save_season_configs(SEASONS, 'season1')
+    
+    assert client.spreadsheet.calls['batch_update'] == 0
+    assert client.spreadsheet.calls['append_rows'] == 0
+
+def test_switching_current_season_is_one_batch_update(client, manager):
+    assert manager.set_current_season('season2')
+    
+    # 旧シーズンのフラグを外す行と新しいシーズンの行を1回で更新（行の照合も1回の読み取り）
+    assert client.spreadsheet.calls['batch_update'] == 1
+    assert client.spreadsheet.calls['batch_get'] == 1
+    assert _flags(manager) == {'season1': 'FALSE', 'season2': 'TRUE'}
+    assert manager.load_user_seasons()['current_season'] == 'season2'
+
+def test_shifted_rows_are_replanned(client, manager):
+    # 別のセッションが先頭に行を挿入して行番号がずれた
+    manager.config_sheet.rows.insert(1, ['someone-else@example.com', 'other', '', '', '', 'FALSE', '', ''])
+    
+    assert manager.set_current_season('season2')
+    
+    assert client.spreadsheet.calls['get_all_values'] == 1
+    assert manager.config_sheet.rows[1][1] == 'other'
+    assert _flags(manager) == {'other': 'FALSE', 'season1': 'FALSE', 'season2': 'TRUE'}
+
+def test_player_rename_updates_both_cells_at_once(client, manager):
+    manager.add_players(['Aさん'])
+    client.spreadsheet.calls.clear()
+    
+    assert manager.update_player('Aさん', 'Aくん')
+    
+    assert client.spreadsheet.calls['batch_update'] == 1
+    row = manager.player_sheet.rows[1]
+    assert row[1] == 'Aくん'
+    assert row[3] >= row[2]
@@ -0,0 +1,109 @@
+# test_sheet_change_probe.py - 変更検知プローブのテスト（ローカルのスタブサーバーを使用）
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sheet_change_probe
+from stub_google_api import StubGoogleApiServer
+
+SPREADSHEET_ID = 'season-sheet'
+
+def _service_account_info(token_uri: str) -> dict:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode('utf-8')
+    return {
+        'type': 'service_account',
+        'project_id': 'stub-project',
+        'private_key_id': 'stub-key',
+        'private_key': pem,
+        'client_email': f"probe-test-{os.getpid()}@stub-project.iam.gserviceaccount.com",
+        'client_id': '0',
+        'token_uri': token_uri
+    }
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    with StubGoogleApiServer() as server:
+        monkeypatch.setattr(sheet_change_probe, 'DRIVE_API_BASE', server.drive_api_base)
+        monkeypatch.setattr(sheet_change_probe, 'SHEETS_API_BASE', server.sheets_api_base)
+        sheet_change_probe.invalidate_probe(SPREADSHEET_ID)
+        yield server
+        sheet_change_probe.invalidate_probe(SPREADSHEET_ID)
+
+@pytest.fixture
+def credentials(stub_server):
+    info = _service_account_info(stub_server.token_uri)
+    yield info
+    sheet_change_probe._sessions.pop(info['client_email'], None)
+
+def test_fingerprint_unchanged(stub_server, credentials):
+    stub_server.set_file(SPREADSHEET_ID, '2024-01-01T00:00:00.000Z', 10, 5)
+    
+    first = sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID, use_cache=False)
+    second = sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID, use_cache=False)
+    
+    assert first is not None
+    assert first == second
+
+def test_modified_time_changed(stub_server, credentials):
+    stub_server.set_file(SPREADSHEET_ID, '2024-01-01T00:00:00.000Z', 10, 5)
+    before = sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID, use_cache=False)
+    
+    stub_server.set_file(SPREADSHEET_ID, '2024-01-02T09:30:00.000Z', 10, 5)
+    after = sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID, use_cache=False)
+    
+    assert before is not None and after is not None
+    assert before != after
+
+def test_row_count_changed(stub_server, credentials):
+    stub_server.set_file(SPREADSHEET_ID, '2024-01-01T00:00:00.000Z', 10, 5)
+    before = sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID, use_cache=False)
+    
+    stub_server.set_file(SPREADSHEET_ID, '2024-01-01T00:00:00.000Z', 10, 6)
+    after = sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID, use_cache=False)
+    
+    assert before is not None and after is not None
+    assert before != after
+
+def test_cached_probe_until_invalidated(stub_server, credentials):
+    stub_server.set_file(SPREADSHEET_ID, '2024-01-01T00:00:00.000Z', 10, 5)
+    before = sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID)
+    request_count = len(stub_server.requests)
+    
+    # TTL内はAPIを呼ばずに前回の結果を返す
+    stub_server.set_file(SPREADSHEET_ID, '2024-01-01T00:00:00.000Z', 10, 6)
+    assert sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID) == before
+    assert len(stub_server.requests) == request_count
+    
+    # ローカルで書き込んだ後は最新の状態を取得
+    sheet_change_probe.invalidate_probe(SPREADSHEET_ID)
+    assert sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID) != before
+
+def test_probe_failure_returns_none(stub_server, credentials):
+    assert sheet_change_probe.probe_spreadsheet(credentials, 'missing-sheet', use_cache=False) is None
+
+def test_probe_takes_a_token_per_request(stub_server, credentials):
+    stub_server.set_file(SPREADSHEET_ID, '2024-01-01T00:00:00.000Z', 10, 5)
+    tokens = []
+    
+    class Limiter:
+        def acquire(self, tokens_needed: int = 1, timeout=None) -> bool:
+            tokens.append(tokens_needed)
+            return True
+    
+    sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID, limiter=Limiter())
+    assert tokens == [1, 1]
+    
+    # キャッシュから返す場合はAPIを呼ばないのでトークンも取らない
+    sheet_change_probe.probe_spreadsheet(credentials, SPREADSHEET_ID, limiter=Limiter())
+    assert tokens == [1, 1]
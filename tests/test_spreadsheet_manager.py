@@ -0,0 +1,197 @@
+# test_spreadsheet_manager.py - 対局記録シートへの書き込み（ID指定の削除・重複除外）のテスト
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spreadsheet_manager
+from spreadsheet_manager import GAME_ID_COLUMN, RECORD_COLUMNS, SpreadsheetManager
+
+HEADERS = [header for header, _ in RECORD_COLUMNS]
+
+class FakeSheet:
+    """gspreadのWorksheetのうち記録の追加・削除で使う部分だけを持つ偽物"""
+    
+    def __init__(self, rows):
+        self.rows = [list(HEADERS)] + [list(row) for row in rows]
+        self.deleted = []
+        self.appended = []
+        self.before_acell = None
+    
+    def col_values(self, col):
+        return [row[col - 1] if col <= len(row) else '' for row in self.rows]
+    
+    def acell(self, label):
+        # 照合の直前に他の書き込みが割り込む状況を再現
+        if self.before_acell:
+            self.before_acell(self)
+        row_number = int(''.join(ch for ch in label if ch.isdigit()))
+        row = self.rows[row_number - 1] if row_number <= len(self.rows) else []
+        return SimpleNamespace(value=row[GAME_ID_COLUMN - 1] if len(row) >= GAME_ID_COLUMN else None)
+    
+    def delete_rows(self, row_number):
+        self.deleted.append(self.rows.pop(row_number - 1)[GAME_ID_COLUMN - 1])
+    
+    def batch_get(self, ranges, major_dimension=None):
+        # A列からゲームID列までを列単位で返す（末尾の空セルは省略）
+        assert ranges == ['A:N']
+        assert major_dimension == 'COLUMNS'
+        columns = []
+        for col in range(1, GAME_ID_COLUMN + 1):
+            column = self.col_values(col)
+            while column and column[-1] in ('', None):
+                column.pop()
+            columns.append(column)
+        return [columns]
+    
+    def append_rows(self, rows, **kwargs):
+        self.appended.extend(rows)
+        self.rows.extend(list(row) for row in rows)
+    
+    def batch_update(self, updates):
+        self.updates = updates
+
+def _row(game_id, date='2024-01-01', names=('A', 'B', 'C', 'D'), scores=(40000, 30000, 20000, 10000)):
+    record = {'date': date, 'game_id': game_id}
+    for i, (name, score) in enumerate(zip(names, scores), start=1):
+        record[f'player{i}_name'] = name
+        record[f'player{i}_score'] = score
+    return [record.get(field, '') for _, field in RECORD_COLUMNS]
+
+def _record(game_id='', **kwargs):
+    return dict(zip([field for _, field in RECORD_COLUMNS], _row(game_id, **kwargs)))
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(SpreadsheetManager, '_backoff', lambda self, attempt: None)
+    manager = SpreadsheetManager({})
+    manager._game_id_ready = True
+    return manager
+
+def test_delete_record_by_game_id(manager):
+    manager.sheet = FakeSheet([_row('g1'), _row('g2'), _row('g3')])
+    
+    assert manager.delete_record('g2')
+    assert manager.sheet.deleted == ['g2']
+    assert manager.sheet.col_values(GAME_ID_COLUMN)[1:] == ['g1', 'g3']
+
+def test_delete_record_relocates_after_concurrent_insert(manager):
+    sheet = FakeSheet([_row('g1'), _row('g2')])
+    
+    def insert_once(sheet):
+        # 1回目の照合の直前に、別の記録が先頭に挿入されて行がずれる
+        sheet.before_acell = None
+        sheet.rows.insert(1, _row('other'))
+    
+    sheet.before_acell = insert_once
+    manager.sheet = sheet
+    
+    assert manager.delete_record('g2')
+    assert sheet.deleted == ['g2']
+    assert sheet.col_values(GAME_ID_COLUMN)[1:] == ['other', 'g1']
+
+def test_delete_record_gives_up_after_retries(manager):
+    sheet = FakeSheet([_row('g1'), _row('g2')])
+    attempts = []
+    
+    def keep_shifting(sheet):
+        attempts.append(1)
+        sheet.rows.insert(1, _row(f"other{len(attempts)}"))
+    
+    sheet.before_acell = keep_shifting
+    manager.sheet = sheet
+    
+    assert not manager.delete_record('g2')
+    assert sheet.deleted == []
+    assert len(attempts) == spreadsheet_manager.MAX_DELETE_RETRIES
+
+def test_delete_record_missing_id(manager):
+    manager.sheet = FakeSheet([_row('g1')])
+    
+    assert not manager.delete_record('missing')
+    assert manager.sheet.deleted == []
+
+def test_add_records_skips_duplicates_by_id_and_content(manager):
+    manager.sheet = FakeSheet([_row('g1'), _row('', date='2024-01-02')])
+    records = [
+        _record('g1', date='2024-02-01'),      # 同じゲームID
+        _record('', date='2024/01/02'),        # IDなし・内容が同じ（日付の表記違い）
+        _record('', date='2024-01-03'),        # 新規
+        _record('', date='2024-01-03')         # 同じインポート内での重複
+    ]
+    
+    result = manager.add_records(records)
+    
+    assert result['added'] == 1
+    assert result['duplicates'] == 3
+    assert result['failed_records'] == [] and result['error'] is None
+    assert len(manager.sheet.appended) == 1
+    assert manager.sheet.appended[0][GAME_ID_COLUMN - 1]
+
+def test_add_records_reports_unwritten_chunks(manager):
+    sheet = FakeSheet([])
+    calls = []
+    
+    def append_rows(rows, **kwargs):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise RuntimeError('quota exceeded')
+    
+    sheet.append_rows = append_rows
+    manager.sheet = sheet
+    records = [_record('', date=f"2024-01-{day:02d}") for day in range(1, 6)]
+    
+    result = manager.add_records(records, chunk_size=2, existing_keys=set())
+    
+    assert result['added'] == 2
+    assert result['failed_records'] == records[2:]
+    assert result['error'] == 'quota exceeded'
+
+def test_record_columns_are_typed_and_padded(manager):
+    # 2行目のゲームIDは空欄（列単位の取得では末尾の空セルが省略される）
+    sheet = FakeSheet([
+        _row('g1', date='2024/01/05', scores=('40,000', '30000', '', '10000')),
+        _row('', date='2024-01-06')
+    ])
+    manager.sheet = sheet
+    
+    columns = manager.get_record_columns()
+    
+    assert columns['date'] == ['2024-01-05', '2024-01-06']
+    assert columns['player1_score'] == [40000, 40000]
+    assert columns['player3_score'] == [0, 20000]
+    assert columns['game_id'] == ['g1', '']
+    assert columns['notes'] == ['', '']
+
+def test_record_columns_use_header_positions(manager):
+    sheet = FakeSheet([_row('g1')])
+    # 古いシートでプレイヤー1の名前と点数の列が入れ替わっている場合
+    for row in sheet.rows:
+        row[3], row[4] = row[4], row[3]
+    manager.sheet = sheet
+    
+    columns = manager.get_record_columns()
+    
+    assert columns['player1_name'] == ['A']
+    assert columns['player1_score'] == [40000]
+
+def test_record_columns_read_failure_returns_none(manager):
+    sheet = FakeSheet([_row('g1')])
+    
+    def fail(*args, **kwargs):
+        raise RuntimeError('503 unavailable')
+    
+    sheet.batch_get = fail
+    manager.sheet = sheet
+    
+    assert manager.get_record_columns() is None
+
+def test_batch_update_player_names_addresses_cells(manager):
+    manager.sheet = FakeSheet([_row('g1'), _row('g2', names=('B', 'A', 'C', 'D'))])
+    
+    assert manager.batch_update_player_names('A', 'Z') == (True, 2)
+    assert sorted(update['range'] for update in manager.sheet.updates) == ['D2', 'F3']
+    assert manager.get_player_name_statistics() == {'A': 2, 'B': 2, 'C': 2, 'D': 2}
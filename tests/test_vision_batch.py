@@ -0,0 +1,104 @@
+# test_vision_batch.py - Vision APIの一括テキスト抽出のテスト（ローカルのスタブサーバーを使用）
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import panel_cropper
+import rate_limiter
+import score_extractor
+from image_encoding import ImagePayload, VISION_MIN_WIDTH
+from score_extractor import MahjongScoreExtractor
+from stub_vision_api import StubVisionApiServer
+
+API_KEY = 'stub-vision-key'
+
+class CountingLimiter:
+    """取得したトークン数を数えるだけのレート制限"""
+    
+    def __init__(self):
+        self.tokens = 0
+    
+    def acquire(self, tokens: int = 1, timeout=None) -> bool:
+        self.tokens += tokens
+        return True
+
+def _image(height: int) -> bytes:
+    """幅100・指定した高さの単色画像（Vision用の拡大後は高さが10倍になる）"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (100, height), 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def _encoded_height(height: int) -> int:
+    return round(height * VISION_MIN_WIDTH / 100)
+
+@pytest.fixture
+def stub_vision(monkeypatch):
+    with StubVisionApiServer() as server:
+        monkeypatch.setattr(score_extractor, 'VISION_ANNOTATE_ENDPOINT', server.endpoint)
+        yield server
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = CountingLimiter()
+    monkeypatch.setattr(rate_limiter, 'get_vision_limiter', lambda: limiter)
+    return limiter
+
+@pytest.fixture
+def extractor(stub_vision, limiter):
+    panel_cropper._layouts.clear()
+    return MahjongScoreExtractor(API_KEY, 'stub-openai-key')
+
+def test_results_keep_input_order(extractor, stub_vision):
+    heights = [30, 10, 50, 20, 40]
+    
+    results = extractor.extract_texts_with_vision_api([_image(height) for height in heights])
+    
+    assert [result['text'] for result in results] == [f"{VISION_MIN_WIDTH}x{_encoded_height(height)}" for height in heights]
+    assert stub_vision.batches == [len(heights)]
+    assert stub_vision.api_keys == [API_KEY]
+
+def test_chunks_at_sixteen_images(extractor, stub_vision, limiter):
+    heights = list(range(10, 30))
+    
+    results = extractor.extract_texts_with_vision_api([_image(height) for height in heights])
+    
+    assert stub_vision.batches == [16, 4]
+    assert [result['text'] for result in results] == [f"{VISION_MIN_WIDTH}x{_encoded_height(height)}" for height in heights]
+    # レート制限は画像1枚につき1トークン
+    assert limiter.tokens == len(heights)
+
+def test_chunks_at_byte_limit(extractor, stub_vision, monkeypatch):
+    payloads = [ImagePayload.from_upload(_image(height)) for height in (10, 11, 12, 13, 14)]
+    encoded_size = max(len(payload.vision_bytes()) * 4 // 3 for payload in payloads)
+    # 2枚分のデータ量で1リクエストの上限に達するようにする
+    monkeypatch.setattr(score_extractor, 'VISION_BATCH_MAX_BYTES', encoded_size * 2 + 1)
+    
+    results = extractor.extract_texts_with_vision_api(payloads)
+    
+    assert stub_vision.batches == [2, 2, 1]
+    assert all(isinstance(result, dict) for result in results)
+
+def test_per_image_errors_are_mapped_to_their_image(extractor, stub_vision):
+    stub_vision.failing_sizes = {(VISION_MIN_WIDTH, _encoded_height(20))}
+    
+    results = extractor.extract_texts_with_vision_api([_image(10), _image(20), _image(30)])
+    
+    assert results[0]['text'] == f"{VISION_MIN_WIDTH}x{_encoded_height(10)}"
+    assert isinstance(results[1], Exception)
+    assert 'bad image' in str(results[1])
+    assert results[2]['text'] == f"{VISION_MIN_WIDTH}x{_encoded_height(30)}"
+
+def test_failed_request_fails_only_its_chunk(extractor, stub_vision):
+    stub_vision.failing_requests = 1
+    heights = list(range(10, 28))
+    
+    results = extractor.extract_texts_with_vision_api([_image(height) for height in heights])
+    
+    assert stub_vision.batches == [16, 2]
+    assert all(isinstance(result, Exception) for result in results[:16])
+    assert [result['text'] for result in results[16:]] == [f"{VISION_MIN_WIDTH}x{_encoded_height(height)}" for height in heights[16:]]
@@ -1,10 +1,6 @@
 # ui_components.py - 完全版（自動同期対応）
 import streamlit as st
-import pandas as pd
-import numpy as np
-from PIL import Image
 from datetime import datetime, date
-from score_extractor import MahjongScoreExtractor
 from spreadsheet_manager import SpreadsheetManager
 from config_manager import ConfigManager
 
@@ -14,6 +10,7 @@ def setup_sidebar():
     
     config_manager = ConfigManager()
     display_config_status(config_manager)
+    display_config_freshness(config_manager)
     
     st.sidebar.divider()
     
@@ -57,6 +54,27 @@ def setup_sidebar():
     else:
         st.sidebar.info("記録なし")
 
+def display_config_freshness(config_manager: ConfigManager):
+    """スナップショット表示中（スプレッドシートと未照合）であることを表示"""
+    if not st.session_state.get('config_snapshot_stale', False):
+        return
+    
+    if config_manager.is_reconcile_pending():
+        with st.sidebar:
+            _watch_config_reconcile()
+    else:
+        st.sidebar.warning("前回保存した設定を表示中（スプレッドシートと同期できませんでした）")
+
+def _watch_config_reconcile():
+    """照合の完了を待ち、完了したら画面全体を再描画"""
+    if not ConfigManager().is_reconcile_pending():
+        st.rerun()
+    st.caption("前回保存した設定を表示中（スプレッドシートと同期中...）")
+
+# 対応バージョンでは照合完了を定期的に確認（それ以外は次回の操作時に反映）
+if hasattr(st, 'fragment'):
+    _watch_config_reconcile = st.fragment(run_every=1)(_watch_config_reconcile)
+
 def display_config_status(config_manager: ConfigManager):
     """設定状況を表示"""
     st.sidebar.subheader("Google Sheets設定")
@@ -312,26 +330,39 @@ def delete_season_sync(config_manager: ConfigManager, season_key: str) -> bool:
         st.error(f"シーズン削除エラー: {e}")
         return False
 
-def load_season_data(config_manager: ConfigManager, season_key: str):
-    """シーズンデータを読み込み"""
+def load_season_data(config_manager: ConfigManager, season_key: str, force: bool = False):
+    """シーズンデータを読み込み（変更がなければダウンロードを省略）"""
     try:
+        sheets_creds = config_manager.load_sheets_credentials()
+        spreadsheet_id = config_manager.get_spreadsheet_id()
+        
+        # 軽量プローブで前回同期時から変更がないか確認
+        fingerprint = None
+        if sheets_creds and spreadsheet_id:
+            from sheet_change_probe import probe_spreadsheet
+            fingerprint = probe_spreadsheet(sheets_creds, spreadsheet_id)
+            
+            synced = st.session_state.get('season_fingerprints', {})
+            if (not force and fingerprint is not None and
+                'game_records' in st.session_state and
+                st.session_state.get('loaded_spreadsheet_id') == spreadsheet_id and
+                synced.get(spreadsheet_id) == fingerprint):
+                return
+        
         # 既存のデータをクリア
         if 'game_records' in st.session_state:
             del st.session_state['game_records']
-        
-        sheets_creds = config_manager.load_sheets_credentials()
-        spreadsheet_id = config_manager.get_spreadsheet_id()
+        st.session_state.pop('game_records_fingerprint', None)
         
         if sheets_creds and spreadsheet_id:
             try:
-                sheet_manager = SpreadsheetManager(sheets_creds)
-                if sheet_manager.connect(spreadsheet_id):
-                    records = sheet_manager.get_all_records()
-                    if records:
-                        converted_records = convert_sheets_records(records)
-                        st.session_state['game_records'] = converted_records
-                    else:
-                        st.session_state['game_records'] = []
+                from season_cache import fetch_season_columns
+                
+                # 切り替え先がキャッシュ済みならメモリから、なければダウンロード
+                season_data = fetch_season_columns(sheets_creds, spreadsheet_id, use_cache=not force)
+                if season_data is not None:
+                    apply_season_columns(spreadsheet_id, season_data)
+                    prefetch_related_seasons(config_manager, season_key)
                 else:
                     st.session_state['game_records'] = []
             except Exception as e:
@@ -342,9 +373,58 @@ def load_season_data(config_manager: ConfigManager, season_key: str):
     except Exception as e:
         st.session_state['game_records'] = []
 
+def apply_season_columns(spreadsheet_id: str, season_data: dict):
+    """取得したシーズンデータをセッション状態に反映"""
+    st.session_state['game_records'] = convert_sheets_columns(season_data['columns'])
+    st.session_state['loaded_spreadsheet_id'] = spreadsheet_id
+    
+    # 同期済みフィンガープリントを記録
+    fingerprint = season_data['fingerprint']
+    if fingerprint is not None:
+        st.session_state.setdefault('season_fingerprints', {})[spreadsheet_id] = fingerprint
+        st.session_state['game_records_fingerprint'] = fingerprint
+
+def prefetch_related_seasons(config_manager: ConfigManager, season_key: str):
+    """最近使ったシーズンと前後のシーズンをバックグラウンドで先読み"""
+    import season_cache
+    
+    recent_seasons = [season_key] + [
+        key for key in st.session_state.get('recent_seasons', []) if key != season_key
+    ]
+    st.session_state['recent_seasons'] = recent_seasons[:season_cache.SEASON_PREFETCH_LIMIT + 1]
+    
+    sheets_creds = config_manager.load_sheets_credentials()
+    if sheets_creds:
+        season_cache.prefetch_seasons(
+            sheets_creds,
+            season_cache.get_prefetch_targets(
+                config_manager.get_all_seasons(), season_key, st.session_state['recent_seasons']
+            )
+        )
+
+def get_season_derived(name: str, factory):
+    """現在のシーズンの記録から派生した値を取得（未変更ならシーズンキャッシュでメモ化）"""
+    records = st.session_state.get('game_records', [])
+    fingerprint = st.session_state.get('game_records_fingerprint')
+    if fingerprint is None:
+        return factory(records)
+    
+    import season_cache
+    config_manager = ConfigManager()
+    sheets_creds = config_manager.load_sheets_credentials() or {}
+    spreadsheet_id = st.session_state.get('loaded_spreadsheet_id', '')
+    
+    def build():
+        # 読み込んだ列データが残っていれば、行ごとの辞書を経由せずに渡す
+        columns = season_cache.get_columns(sheets_creds, spreadsheet_id, fingerprint)
+        return factory(columns if columns is not None else records)
+    
+    return season_cache.get_derived(sheets_creds, spreadsheet_id, fingerprint, name, build)
+
 def initialize_new_season_data():
     """新シーズンのデータを初期化"""
     st.session_state['game_records'] = []
+    st.session_state.pop('game_records_fingerprint', None)
 
 def sync_data_from_sheets(config_manager: ConfigManager):
     """Google Sheetsからデータを手動同期"""
@@ -357,6 +437,9 @@ def sync_data_from_sheets(config_manager: ConfigManager):
         
         with st.sidebar:
             with st.spinner("同期中..."):
+                # 手動同期ではプローブのキャッシュを使わず最新の状態で判定
+                from sheet_change_probe import invalidate_probe
+                invalidate_probe(config_manager.get_spreadsheet_id())
                 load_season_data(config_manager, current_season)
                 
                 # 同期時刻を更新
@@ -389,30 +472,16 @@ def check_sheets_sync_status(config_manager: ConfigManager) -> dict:
     except Exception:
         return {'configured': True, 'can_connect': False}
 
-def convert_sheets_records(sheets_records: list) -> list:
-    """Google Sheetsの記録をアプリ形式に変換"""
-    converted = []
-    for record in sheets_records:
-        converted_record = {
-            'date': record.get('対局日', ''),
-            'time': record.get('対局時刻', ''),
-            'game_type': record.get('対局タイプ', ''),
-            'player1_name': record.get('プレイヤー1名', ''),
-            'player1_score': record.get('プレイヤー1点数', 0),
-            'player2_name': record.get('プレイヤー2名', ''),
-            'player2_score': record.get('プレイヤー2点数', 0),
-            'player3_name': record.get('プレイヤー3名', ''),
-            'player3_score': record.get('プレイヤー3点数', 0),
-            'player4_name': record.get('プレイヤー4名', ''),
-            'player4_score': record.get('プレイヤー4点数', 0),
-            'notes': record.get('メモ', ''),
-            'timestamp': record.get('登録日時', '')
-        }
-        converted.append(converted_record)
-    return converted
+def convert_sheets_columns(columns: dict) -> list:
+    """列形式の記録（型変換済み）をアプリ形式の記録リストに変換"""
+    if not columns:
+        return []
+    
+    fields = list(columns.keys())
+    return [dict(zip(fields, values)) for values in zip(*columns.values())]
 
-def extract_data_from_image(image):
-    """画像からデータを抽出"""
+def create_score_extractor():
+    """認証情報を確認して解析クラスを作成（未設定の場合はNone）"""
     config_manager = ConfigManager()
     
     openai_key = config_manager.get_openai_api_key()
@@ -420,21 +489,44 @@ def extract_data_from_image(image):
     
     if not openai_key or openai_key == "your-openai-api-key-here":
         st.error("OpenAI API Keyが正しく設定されていません")
-        return
+        return None
     
     if not vision_creds:
         st.error("Google Vision APIの認証情報が設定されていません")
+        return None
+    
+    # 解析機能を使うときだけOpenAI/Vision関連を読み込む
+    from score_extractor import MahjongScoreExtractor
+    
+    return MahjongScoreExtractor(
+        vision_credentials=vision_creds,
+        openai_api_key=openai_key
+    )
+
+def warm_up_score_extractor():
+    """解析ボタンが押される前にAPIクライアントの準備を始める（認証情報が未設定なら何もしない）"""
+    if st.session_state.get('api_warm_up_requested'):
         return
+    st.session_state['api_warm_up_requested'] = True
     
+    config_manager = ConfigManager()
+    openai_key = config_manager.get_openai_api_key()
+    vision_creds = config_manager.load_vision_credentials()
+    if not openai_key or openai_key == "your-openai-api-key-here" or not vision_creds:
+        return
+    
+    from api_clients import warm_up
+    warm_up(vision_creds, openai_key)
+
+def extract_data_from_image(image):
+    """画像からデータを抽出（アップロードファイル・PIL画像のどちらも可）"""
     with st.spinner("AI解析中..."):
         try:
-            extractor = MahjongScoreExtractor(
-                vision_credentials=vision_creds,
-                openai_api_key=openai_key
-            )
+            extractor = create_score_extractor()
+            if extractor is None:
+                return
             
-            image_array = np.array(image)
-            result = extractor.analyze_image(image_array)
+            result = extractor.analyze_image(image)
             
             st.session_state['analysis_result'] = result
             
@@ -473,6 +565,10 @@ def display_extraction_results():
         return
     
     st.success("解析完了")
+    if result.get('cached'):
+        st.caption("以前に解析した画像のため、保存済みの解析結果を表示しています")
+    elif result.get('method') == 'ocr':
+        st.caption(result.get('notes', 'OCR結果から直接抽出しました'))
 
 def save_game_record_with_names(players_data, game_date, game_time, game_type, notes):
     """対局記録をGoogle Sheetsに保存（自動同期対応版）"""
@@ -517,10 +613,14 @@ def save_game_record_with_names(players_data, game_date, game_time, game_type, n
                 return False
             
             if sheet_manager.add_record(game_data):
-                # ローカルセッション状態に即座に追加
+                from sheet_change_probe import invalidate_probe
+                invalidate_probe(spreadsheet_id)
+                
+                # ローカルセッション状態に即座に追加（読み込み時の状態ではなくなる）
                 if 'game_records' not in st.session_state:
                     st.session_state['game_records'] = []
                 st.session_state['game_records'].append(game_data)
+                st.session_state.pop('game_records_fingerprint', None)
                 
                 # 同期時刻を更新
                 import time
@@ -542,4 +642,30 @@ def save_game_record_with_names(players_data, game_date, game_time, game_type, n
             service_email = sheets_creds.get('client_email', 'N/A')
             st.info(f"権限エラー: スプレッドシートを {service_email} と共有し、編集者権限を付与してください")
         
-        return False
\ No newline at end of file
+        return False
+
+def delete_game_record(game_id: str) -> bool:
+    """ゲームIDで対局記録をGoogle Sheetsから削除"""
+    config_manager = ConfigManager()
+    sheets_creds = config_manager.load_sheets_credentials()
+    spreadsheet_id = config_manager.get_spreadsheet_id()
+    
+    if not sheets_creds or not spreadsheet_id:
+        st.error("Google Sheetsの設定を確認してください")
+        return False
+    
+    with st.spinner("記録を削除中..."):
+        sheet_manager = SpreadsheetManager(sheets_creds)
+        if not sheet_manager.connect(spreadsheet_id) or not sheet_manager.delete_record(game_id):
+            return False
+    
+    from sheet_change_probe import invalidate_probe
+    invalidate_probe(spreadsheet_id)
+    
+    # ローカルセッション状態からも削除（読み込み時の状態ではなくなる）
+    st.session_state['game_records'] = [
+        record for record in st.session_state.get('game_records', [])
+        if record.get('game_id') != game_id
+    ]
+    st.session_state.pop('game_records_fingerprint', None)
+    return True
\ No newline at end of file